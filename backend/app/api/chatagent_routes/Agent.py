@@ -1,6 +1,5 @@
 from phi.model.ollama import Ollama
 from phi.tools.calculator import Calculator
-from phi.tools.exa import ExaTools
 from phi.tools.file import FileTools
 from phi.tools.googlesearch import GoogleSearch
 from phi.tools.pandas import PandasTools
@@ -11,15 +10,32 @@ from dotenv import load_dotenv
 from cdp import *
 from phi.model.openai.like import OpenAILike
 import os
-import json
+import time
+import base64
+from functools import lru_cache
 from phi.agent import Agent, RunResponse
 from cdp.errors import UnsupportedAssetError
 from .Creator import ChatbotAnalyzer
 from .schemas import *
-from phi.model.google import Gemini
+from ...services.log_service import get_logger
+from ...services.keystore import get_wallet_keystore, load_wallet_record, save_wallet_record
+from ...services.journal import JournaledStore
+from ...services.agent_config_cache import agent_configs
+from ...services.cdp_service import ensure_cdp_configured, fetch_balance
+from ...services.agent_pool import AgentPool
+from ...services.wallet_pool import wallet_pool
+from ...services.client_pool import clients, gemini_model
+from ...services.intent_router import intent_router
+from ...services.serialization import DecodeError, read_file
+from ...services.search_index import search_index, index_agent, index_turn, remove_turn
+from ...services.agent_memory import AgentMemory
+from ...services.snapshot import cache_snapshot
+from ...services import metrics
 
 load_dotenv()
 
+logger = get_logger(__name__)
+
 class OnChainAgents:
     def __init__(self, Wallet_Id=None):
         """
@@ -32,14 +48,18 @@ class OnChainAgents:
         Wallet_Id (str): Optional; If provided, attempts to load an existing wallet. 
                          If None, creates a new wallet.
         """
-        self.WalletStorage = "wallet_storage"
-
-        if not os.path.exists(self.WalletStorage):
-            os.makedirs(self.WalletStorage)
-            print(f"Directory '{self.WalletStorage}' created successfully.")
+        if not ensure_cdp_configured():
+            raise ValueError("CDP configuration failed. Check your credentials.")
 
+        # Pooled wallets are already exported and saved; only inline ones need persisting.
+        self.persisted = Wallet_Id is not None
         if Wallet_Id is None:
-            self.wallet = Wallet.create()
+            claimed = wallet_pool.claim()
+            if claimed is not None:
+                self.wallet = claimed[1]
+                self.persisted = True
+            else:
+                self.wallet = Wallet.create()
         else:
             fetched_data = self.fetch(Wallet_Id)
             if fetched_data:
@@ -50,10 +70,10 @@ class OnChainAgents:
 
     def fetch(self, wallet_id):
         """
-        Fetches the wallet data from a JSON file.
+        Fetches the wallet data from the wallet keystore.
 
-        This method constructs the file path for the specified wallet ID and attempts to read
-        the corresponding JSON file. If the file exists, it loads the data and returns it as a dictionary.
+        Wallets still stored in the legacy per-wallet JSON layout are imported into
+        the keystore on first access.
 
         Parameters:
         wallet_id (str): The ID of the wallet to fetch.
@@ -61,61 +81,25 @@ class OnChainAgents:
         Returns:
         dict or None: The wallet data dictionary if found, else None.
         """
-        file_path = os.path.join(self.WalletStorage, f"{wallet_id}.json")
-
-        if os.path.exists(file_path):
-            with open(file_path, 'r') as file:
-                data_dict = json.load(file)
-            print(f"Wallet data for {wallet_id} successfully fetched.")
-            return data_dict
-        else:
-            print(f"No wallet data found for ID: {wallet_id}.")
-            return None
-        
-    def store(self, data_dict):
-        """
-        Stores the wallet data securely in a JSON file.
-
-        This method takes a dictionary containing wallet data and writes it to a JSON file
-        named after the wallet ID. It ensures that the data is saved in a structured format.
-
-        Parameters:
-        data_dict (dict): Dictionary containing wallet data.
-        """
-        wallet_id = data_dict.get("wallet_id")
-        file_path = os.path.join(self.WalletStorage, f"{wallet_id}.json")
-
-        with open(file_path, 'w') as file:
-            json.dump(data_dict, file)
+        data_dict = load_wallet_record(wallet_id)
+        if data_dict is None:
+            logger.warning("wallet_not_found", wallet_id=wallet_id)
+        return data_dict
 
     def save_wallet(self,data):
         """
-        Exports and saves the current wallet's data and seed to files.
+        Saves the exported wallet data, including its seed, as an encrypted keystore record.
 
-        This method exports the current state of the wallet and stores it in JSON format.
-        It also saves the seed securely in an encrypted format and logs the wallet ID
-        in a separate text file if it does not already exist.
+        The keystore index doubles as the wallet registry, so no separate ID file is kept.
 
-        The process includes checking for existing IDs to prevent duplicates.
+        Parameters:
+        data (WalletData): The exported wallet data.
         """
-        self.store(data.to_dict())
-        
-        seed_file_path = "my_seed.json"
-        self.wallet.save_seed(seed_file_path, encrypt=True)
-
-        wallet_id = data.wallet_id
-        id_file_path = "wallet_ids.txt"
+        save_wallet_record(data, self.wallet.default_address.address_id)
 
-        if not self.wallet_id_exists(wallet_id, id_file_path):
-            with open(id_file_path, "a") as id_file:
-                id_file.write(f"{wallet_id}\n")
-
-    def wallet_id_exists(self, wallet_id, file_path):
+    def wallet_id_exists(self, wallet_id):
         """
-        Checks if a given wallet ID exists in the specified text file.
-
-        This method reads through a text file containing existing wallet IDs to determine
-        whether the specified ID is present.
+        Checks if a given wallet ID exists in the keystore.
 
         Parameters:
         wallet_id (str): The ID of the wallet to check.
@@ -123,15 +107,11 @@ class OnChainAgents:
         Returns:
         bool: True if the ID exists, False otherwise.
         """
-        if os.path.exists(file_path):
-            with open(file_path, 'r') as id_file:
-                existing_ids = id_file.read().splitlines()
-                return wallet_id in existing_ids
-        return False
+        return wallet_id in get_wallet_keystore()
 
 Tools = {
     "Calculator": Calculator(add=True, subtract=True, multiply=True, divide=True, exponentiate=True, factorial=True, is_prime=True, square_root=True),
-    "Exa": ExaTools(api_key=os.getenv("EXA_API_KEY")),
+    "Exa": clients.get("exa"),
     "File": FileTools(),
     "GoogleSearch": GoogleSearch(),
     "Pandas": PandasTools(),
@@ -139,6 +119,18 @@ Tools = {
     "Wikipedia": WikipediaTools(),
     "Sleep": Sleep()
 }
+
+@lru_cache(maxsize=None)
+def toolset(tool_names):
+    """
+    Shared tool instances for a config's tool names (a tuple, as stored on AgentConfig).
+
+    Agents with the same tool set get the same tuple of the module-level tool
+    instances, so tools are never rebuilt per agent.
+    """
+    return tuple(Tools[name] for name in tool_names if name in Tools)
+
+metrics.register("toolsets", lambda: toolset.cache_info()._asdict())
     
 def read_json_data(file_path: str) -> dict:
     """
@@ -151,154 +143,200 @@ def read_json_data(file_path: str) -> dict:
         dict: The data read from the JSON file, or None if an error occurred.
     """
     try:
-        with open(file_path, 'r') as json_file:
-            data = json.load(json_file)
-            return data
+        return read_file(file_path)
     except FileNotFoundError:
-        print(f"Error: The file {file_path} does not exist.")
-    except json.JSONDecodeError:
-        print("Error: Failed to decode JSON from the file.")
+        logger.warning("json_file_missing", path=file_path)
+    except DecodeError:
+        logger.error("json_decode_failed", path=file_path)
     except Exception as e:
-        print(f"An error occurred: {e}")
+        logger.error("json_read_failed", path=file_path, error=str(e))
     return None
 
+# NFT hash -> wallet ID, and wallet ID -> list of conversation turns. Both are served
+# from memory; writes go through a group-committed journal and are checkpointed into
+# the JSON files.
+mapping_store = JournaledStore('map.json')
+conversation_store = JournaledStore('conversations.json')
+# NFT hash -> {"creator", "members"}: who may chat with each agent.
+authorization_store = JournaledStore('authorisations.json')
+metrics.register("stores", lambda: {"mapping": dict(mapping_store.stats), "conversations": dict(conversation_store.stats),
+                                    "authorizations": dict(authorization_store.stats)})
+
+MAX_CONVERSATION_TURNS = int(os.getenv("MAX_CONVERSATION_TURNS", "1000"))
+
+def _parse_legacy_turn(conversation):
+    """Convert a stored "Question:X,answer: Y" string into a turn record."""
+    if conversation.startswith("Question:") and ",answer: " in conversation:
+        question, answer = conversation[len("Question:"):].split(",answer: ", 1)
+        return {"id": 1, "question": question.strip(), "answer": answer.strip(), "timestamp": None}
+    return {"id": 1, "question": None, "answer": None, "raw": conversation, "timestamp": None}
+
+def _migrate_legacy_conversations():
+    """Rewrite conversations stored as plain strings as structured turns, once."""
+    legacy = {wallet_id: value for wallet_id, value in conversation_store.snapshot().items() if isinstance(value, str)}
+    for wallet_id, conversation in legacy.items():
+        conversation_store.set(wallet_id, [_parse_legacy_turn(conversation)])
+    if legacy:
+        logger.info("conversations_migrated", wallets=len(legacy))
+
+_migrate_legacy_conversations()
+
+# Long-term memory: embeddings of past turns, recalled by similarity to the new prompt.
+MEMORY_TOP_K = int(os.getenv("MEMORY_TOP_K", "3"))
+agent_memory = AgentMemory(
+    load_turns=lambda wallet_id: conversation_store.page(wallet_id, MAX_CONVERSATION_TURNS)[0],
+    max_rows=MAX_CONVERSATION_TURNS,
+)
+metrics.register("agent_memory", agent_memory.stats)
+
 def store_mapping(nft_id, wallet_id):
-    filename = 'map.json'
-    new_entry = {nft_id: wallet_id}
-    if os.path.exists(filename):
-        with open(filename, 'r') as file:
-            try:
-                data = json.load(file)
-            except json.JSONDecodeError:
-                data = {}
-    else:
-        data = {}
-    data.update(new_entry)
-    with open(filename, 'w') as file:
-        json.dump(data, file, indent=4)
+    mapping_store.set(nft_id, wallet_id)
 
 def store_response(wallet_id, prompt, response):
-    """Store or update the response for a specific wallet ID in a JSON file."""
-    file_path = 'conversations.json'
-    print(f"Storing response for wallet_id: {wallet_id}")
-    
-    # Initialize data dictionary
-    data = {}
-    
-    # Load existing data if the file exists
-    if os.path.exists(file_path):
-        try:
-            with open(file_path, 'r') as file:
-                file_content = file.read().strip()
-                
-                if file_content:  # Only try to parse if file is not empty
-                    try:
-                        data = json.loads(file_content)
-                        print(f"Successfully loaded existing conversations data")
-                    except json.JSONDecodeError:
-                        print(f"Error decoding JSON from {file_path}, creating new file")
-                        data = {}  # Reset to empty dict if file is corrupt
-                else:
-                    print(f"Conversations file exists but is empty")
-        except Exception as e:
-            print(f"Error reading conversations file: {str(e)}")
-            # Continue with empty data dictionary
-    
-    # Update the response for the specified wallet ID
-    data[wallet_id] = f"Question:{prompt},answer: {response}"
-    print(f"Updated conversation data for wallet_id: {wallet_id}")
-    
-    # Write the updated data back to the JSON file
+    """Append a question/answer turn to the wallet's conversation. Returns the turn ID."""
+    turn = {"question": prompt, "answer": response, "timestamp": time.time()}
+    turn_id = conversation_store.append(wallet_id, turn, max_items=MAX_CONVERSATION_TURNS)
+    index_turn(wallet_id, dict(turn, id=turn_id))
+    agent_memory.remember(wallet_id, dict(turn, id=turn_id))
+    if turn_id > MAX_CONVERSATION_TURNS:
+        # The store dropped its oldest turn to stay within the cap.
+        remove_turn(wallet_id, turn_id - MAX_CONVERSATION_TURNS)
+    logger.debug("response_stored", wallet_id=wallet_id, turn_id=turn_id, sample_rate=0.1)
+    return turn_id
+
+def format_turn(turn):
+    """Render a turn the way it is given to the agent as context."""
+    if turn.get("raw") is not None:
+        return turn["raw"]
+    return f"Question:{turn['question']},answer: {turn['answer']}"
+
+def encode_cursor(direction, turn_id):
+    """Opaque pagination cursor: "after" or "before" a turn ID."""
+    return base64.urlsafe_b64encode(f"{direction}:{turn_id}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor. Raises ValueError for anything malformed."""
     try:
-        with open(file_path, 'w') as file:
-            json.dump(data, file, indent=4)
-        print(f"Successfully wrote conversation data to {file_path}")
-    except Exception as e:
-        print(f"Error writing conversation data: {str(e)}")
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        direction, turn_id = raw.split(":", 1)
+        turn_id = int(turn_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if direction not in ("after", "before"):
+        raise ValueError("Invalid cursor")
+    return direction, turn_id
+
+def get_conversation_page(wallet_id, limit, cursor=None, offset=0, latest=False):
+    """
+    One page of a wallet's turns, oldest first, with cursors to the neighbouring pages.
+
+    Without a cursor the page starts at `offset`, or holds the most recent turns
+    when `latest` is set.
+
+    Returns:
+        dict: turns, total, next_cursor (newer turns) and prev_cursor (older turns).
+    """
+    after = before = None
+    bounds = conversation_store.bounds(wallet_id)
+    if cursor:
+        direction, turn_id = decode_cursor(cursor)
+        after, before = (turn_id, None) if direction == "after" else (None, turn_id)
+    elif latest and bounds:
+        before = bounds[1] + 1
+    turns, total = conversation_store.page(wallet_id, limit, after=after, before=before, offset=offset)
+    next_cursor = prev_cursor = None
+    if turns and bounds:
+        first_id, last_id = bounds
+        if last_id > turns[-1]["id"]:
+            next_cursor = encode_cursor("after", turns[-1]["id"])
+        if first_id < turns[0]["id"]:
+            prev_cursor = encode_cursor("before", turns[0]["id"])
+    return {"turns": turns, "total": total, "next_cursor": next_cursor, "prev_cursor": prev_cursor}
+
+# Turn bounds of each wallet whose turns were restored into the search index from
+# a cache snapshot; build_search_index() re-indexes only wallets that changed since.
+_restored_turn_bounds = {}
+_search_index_built = False
+
+def _dump_search_index():
+    if not _search_index_built:
+        # Still being built: its bounds would vouch for turns that are not indexed yet.
+        return {"bounds": {}, "docs": []}
+    # Bounds first: a turn stored in between is then either in both or shows up as
+    # a mismatch on restore, never silently missing from the index.
+    bounds = {wallet_id: conversation_store.bounds(wallet_id) for wallet_id in conversation_store.snapshot()}
+    return {"bounds": bounds, "docs": search_index.dump()}
+
+def _restore_search_index(state):
+    _restored_turn_bounds.update((wallet_id, tuple(bounds)) for wallet_id, bounds in state["bounds"].items() if bounds)
+    return search_index.load(state["docs"])
+
+cache_snapshot.register("search_index", 1, _dump_search_index, _restore_search_index)
+
+def build_search_index():
+    """
+    Index every agent config and stored turn. Run once at startup; returns the document count.
+
+    Wallets restored from the cache snapshot are skipped when their turns are unchanged.
+    """
+    agent_configs.preload()
+    for address, config in agent_configs.items().items():
+        index_agent(address, config)
+    reindexed = 0
+    for wallet_id, turns in conversation_store.snapshot().items():
+        if not isinstance(turns, list):
+            continue
+        restored = _restored_turn_bounds.pop(wallet_id, None)
+        if restored is not None and turns and restored == (turns[0]["id"], turns[-1]["id"]):
+            continue
+        if restored is not None:
+            for turn_id in range(restored[0], restored[1] + 1):
+                remove_turn(wallet_id, turn_id)
+        for turn in turns:
+            index_turn(wallet_id, turn)
+        reindexed += 1
+    # Wallets that no longer have any turns.
+    for wallet_id, (first_id, last_id) in list(_restored_turn_bounds.items()):
+        for turn_id in range(first_id, last_id + 1):
+            remove_turn(wallet_id, turn_id)
+    _restored_turn_bounds.clear()
+    global _search_index_built
+    _search_index_built = True
+    logger.info("search_index_built", documents=len(search_index), wallets_reindexed=reindexed)
+    return len(search_index)
 
 def get_wallet_id(nft_id):
-    filename = 'map.json'
-    print(f"Attempting to get wallet_id for NFT: {nft_id}")
-    try:
-        if not os.path.exists(filename):
-            print(f"Warning: {filename} does not exist")
-            return "File not found."
-        
-        with open(filename, 'r') as file:
-            file_content = file.read().strip()
-            print(f"map.json content: '{file_content[:100]}'")  # Print first 100 chars for debugging
-            
-            if not file_content:
-                print(f"Warning: {filename} is empty")
-                return "Empty file."
-            
-            # Try to fix malformed JSON if possible
-            try:
-                # First attempt - try to load as is
-                data = json.loads(file_content)
-            except json.JSONDecodeError:
-                print("Initial JSON decode failed, attempting to fix JSON format")
-                
-                # Second attempt - try to fix common JSON issues
-                if file_content.startswith('\ufeff'):  # BOM character
-                    print("Removing BOM character")
-                    file_content = file_content[1:]
-                
-                # Try again with cleaned content
-                try:
-                    data = json.loads(file_content)
-                    print("Successfully loaded JSON after cleanup")
-                except json.JSONDecodeError:
-                    # If we can't fix it, create a new empty mapping
-                    print(f"Could not parse {filename} - creating new empty mapping")
-                    data = {}
-                    # Write the empty mapping back to the file to fix it for next time
-                    with open(filename, 'w') as write_file:
-                        json.dump(data, write_file, indent=4)
-            
-        if nft_id in data:
-            wallet_id = data[nft_id]
-            print(f"Found wallet_id: {wallet_id} for NFT: {nft_id}")
-            return wallet_id
-        else:
-            print(f"NFT ID {nft_id} not found in mapping")
-            return "NFT ID not found."
-    except FileNotFoundError:
-        print(f"Error: {filename} not found")
-        return "File not found."
-    except Exception as e:
-        print(f"Unexpected error in get_wallet_id: {str(e)}")
-        return f"Error: {str(e)}"
+    wallet_id = mapping_store.get(nft_id)
+    if wallet_id is None:
+        logger.info("nft_not_mapped", nft_id=nft_id)
+        return "NFT ID not found."
+    return wallet_id
+
+def recall_conversations(wallet_id, prompt):
+    """Earlier turns most relevant to `prompt`, excluding the last one (always given separately)."""
+    last = conversation_store.last(wallet_id)
+    if last is None or MEMORY_TOP_K <= 0:
+        return []
+    recalled = []
+    for turn_id, _ in agent_memory.recall(wallet_id, prompt, k=MEMORY_TOP_K, exclude_after=last["id"] - 1):
+        turns, _ = conversation_store.page(wallet_id, 1, after=turn_id - 1)
+        if turns and turns[0]["id"] == turn_id:
+            recalled.append(format_turn(turns[0]))
+    return recalled
 
 def get_last_conversation(wallet_id):
-    """Retrieve the last conversation for a specific wallet ID from conversations.json."""
-    file_path = 'conversations.json'
-    
-    # Check if file exists first
-    if not os.path.exists(file_path):
-        return "not there. This is your first conversation."
-    
-    try:
-        # Attempt to read the JSON data from the file
-        with open(file_path, 'r') as file:
-            data = json.load(file)
-            # Check if the wallet ID exists in the data
-            if wallet_id in data:
-                return data[wallet_id]
-            else:
-                return "not there. This is your first conversation."
-    except json.JSONDecodeError:
-        # Handle case where file exists but contains invalid JSON
+    """Retrieve the last turn for a specific wallet ID from the conversation store."""
+    turn = conversation_store.last(wallet_id)
+    if turn is None:
         return "not there. This is your first conversation."
+    return format_turn(turn)
 
 def load_agent(NFT_id, prompt):
     try:
-        print(f"Starting load_agent for NFT_id: {NFT_id}")
         wallet_id = get_wallet_id(NFT_id)
-        print(f"Retrieved wallet_id: {wallet_id}")
         
         if wallet_id in ["File not found.", "Error decoding JSON.", "NFT ID not found.", "Empty file."]:
-            print(f"Error retrieving wallet_id: {wallet_id}")
+            logger.warning("load_agent_wallet_missing", nft_id=NFT_id, reason=wallet_id)
             return agentInteractResponse(
                 response=f"Error: {wallet_id}",
                 isMetaMask=False,
@@ -308,16 +346,13 @@ def load_agent(NFT_id, prompt):
             )
         
         convo = get_last_conversation(wallet_id)
-        print(f"Retrieved conversation history. Length: {len(convo) if convo else 0}")
         
         agent = OnChainAgents(Wallet_Id=wallet_id)
-        print(f"Created OnChainAgents with wallet address: {agent.wallet.default_address.address_id}")
         
-        file_path = f"DB/{agent.wallet.default_address.address_id}.json"
-        print(f"Attempting to read data from: {file_path}")
+        data = agent_configs.get(agent.wallet.default_address.address_id)
         
-        if not os.path.exists(file_path):
-            print(f"Warning: {file_path} does not exist")
+        if data is None:
+            logger.warning("agent_config_missing", nft_id=NFT_id, address=agent.wallet.default_address.address_id)
             return agentInteractResponse(
                 response=f"Error: Agent configuration file not found.",
                 isMetaMask=False,
@@ -325,19 +360,26 @@ def load_agent(NFT_id, prompt):
                 value=None,
                 Responses=0
             )
-            
-        data = read_json_data(file_path)
-        print(f"Data loaded: {data is not None}")
-        
-        if not data:
-            print(f"Error: Failed to load data from {file_path}")
-            return agentInteractResponse(
-                response="Error: Failed to load agent configuration.",
-                isMetaMask=False,
-                walletAddress=agent.wallet.default_address.address_id,
-                value=None,
-                Responses=0
-            )
+
+        # Plain balance/address questions are answered from the wallet without a model call.
+        intent = intent_router.classify(prompt)
+        if intent is not None:
+            reply = intent_router.answer(intent, agent.wallet, data.get("Templates"))
+            if reply is not None:
+                try:
+                    store_response(wallet_id, prompt, reply)
+                except Exception as e:
+                    logger.error("store_response_failed", wallet_id=wallet_id, error=str(e))
+                return agentInteractResponse(
+                    response=reply,
+                    isMetaMask=False,
+                    walletAddress=agent.wallet.default_address.address_id,
+                    value=None,
+                    Responses=0
+                )
+
+        # Only the model uses recalled turns, so fast-path answers never build the wallet's memory.
+        memories = recall_conversations(wallet_id, prompt)
             
         def get_balance(asset_id) -> str:
             """
@@ -349,7 +391,7 @@ def load_agent(NFT_id, prompt):
             Returns:
             str: A message showing the current balance of the specified asset.
             """
-            balance = agent.wallet.balance(asset_id)
+            balance = fetch_balance(agent.wallet, asset_id)
             return f"Current balance of {asset_id}: {balance}"
 
         def transfer_asset(amount, asset_id, destination_address):
@@ -392,19 +434,13 @@ def load_agent(NFT_id, prompt):
             except Exception as e:
                 return f"Error transferring asset: {str(e)}. If this is a custom token, it may have been recently deployed. Please try again in about 30 minutes, as it needs to be indexed by CDP first."
 
-        ToolKit = []
-        if data:
-            for key in data["Tools"]:
-                if key in Tools.keys():
-                    ToolKit.append(Tools[key])
-                    
-        print(f"Setting up agent with {len(ToolKit)} tools")
+        ToolKit = list(toolset(data.tools))
         
         try:
             based_agent = Agent(
-                model=Gemini(model='gemini-2.0-flash-exp', api_key=os.getenv("GEMINI_API_KEY")),
-                tools=[get_balance, transfer_asset, ExaTools(api_key=os.getenv("EXA_API_KEY"))]+ToolKit,
-                description=data["Personality"]+f"You have very in depth knowledge in the fields of {data['Concepts']}",
+                model=gemini_model(),
+                tools=[get_balance, transfer_asset, clients.get("exa")]+ToolKit,
+                description=data.personality+f"You have very in depth knowledge in the fields of {list(data.concepts)}",
                 instructions=[
                     "Always display the balance when asked.",
                     "As long as the prompt is not about transactions or balance, the answer should be long, thorough and based on the personality.",
@@ -413,18 +449,16 @@ def load_agent(NFT_id, prompt):
                     "Always search for real time data on the question asked and then answer.",
                     f"Your last conversation was {convo}.",
                     "Make sure you dont break the flow."
-                ]
+                ] + ([f"Earlier exchanges relevant to this question: {' | '.join(memories)}."] if memories else [])
             )
-            print("Agent initialized successfully")
             
             run: RunResponse = based_agent.run(prompt)
-            print("Agent run completed successfully")
+            logger.debug("agent_run_completed", nft_id=NFT_id, tools=len(ToolKit), sample_rate=0.1)
             
             try:
                 store_response(wallet_id, prompt, run.content)
-                print("Response stored successfully")
             except Exception as e:
-                print(f"Error storing response: {str(e)}")
+                logger.error("store_response_failed", wallet_id=wallet_id, error=str(e))
                 # Continue even if storage fails
             
             return agentInteractResponse(
@@ -435,7 +469,7 @@ def load_agent(NFT_id, prompt):
                 Responses=0
             )
         except Exception as e:
-            print(f"Error in agent setup or execution: {str(e)}")
+            logger.error("agent_run_failed", nft_id=NFT_id, error=str(e))
             return agentInteractResponse(
                 response=f"Error processing your request: {str(e)}",
                 isMetaMask=False,
@@ -444,7 +478,7 @@ def load_agent(NFT_id, prompt):
                 Responses=0
             )
     except Exception as e:
-        print(f"Unexpected error in load_agent: {str(e)}")
+        logger.exception("load_agent_failed", nft_id=NFT_id)
         return agentInteractResponse(
             response=f"An unexpected error occurred: {str(e)}",
             isMetaMask=False,
@@ -453,25 +487,24 @@ def load_agent(NFT_id, prompt):
             Responses=0
         )
 
+analyzer_pool = AgentPool(ChatbotAnalyzer, size=int(os.getenv("ANALYZER_POOL_SIZE", "4")),
+                          reset=ChatbotAnalyzer.reset, name="chatbot_analyzer")
+metrics.register("analyzer_pool", analyzer_pool.stats)
+
 def CreateAgent(prompt,NFT_id):
     agent = OnChainAgents()
-    print("hi1")
-    data = agent.wallet.export_data()
-    print("hi2")
-    creater = ChatbotAnalyzer()
-    print("hi3")
-    tools, concepts = creater.find_tools_and_concepts(prompt)
-    print("hi4")
-    personality = creater.GeneratePersonality(prompt)
-    print("hi5")
-    instructions = creater.GenerateInstructions(prompt)
-    print("hi6")
-    creater.save_to_json(tools, personality, instructions, concepts,agent.wallet.default_address.address_id)
-    print("hi7")
-    store_mapping(NFT_id,data.wallet_id)
-    print("hi8")
-    agent.save_wallet(data)
-    print("hi9")
+    wallet_id = agent.wallet.id
+    with analyzer_pool.acquire() as creater:
+        tools, concepts = creater.find_tools_and_concepts(prompt)
+        personality = creater.GeneratePersonality(prompt)
+        instructions = creater.GenerateInstructions(prompt)
+        creater.save_to_json(tools, personality, instructions, concepts,agent.wallet.default_address.address_id)
+    # Save the wallet before the mapping makes the agent visible to the listing endpoints,
+    # whose ETags do not cover the keystore.
+    if not agent.persisted:
+        agent.save_wallet(agent.wallet.export_data())
+    store_mapping(NFT_id,wallet_id)
+    logger.info("agent_created", nft_id=NFT_id, wallet_id=wallet_id, tools=tools, pooled_wallet=agent.persisted)
     return walletAddress(walletAddress=agent.wallet.default_address.address_id)
 
 # load_agent("123","What did I ask you in the previous conversation.")
\ No newline at end of file
@@ -1,8 +1,10 @@
-import json
 import os
 from phi.agent import Agent, RunResponse
 from phi.model.openai import OpenAILike
-from phi.model.google import Gemini
+from ...services.agent_config_cache import agent_configs
+from ...services.client_pool import gemini_model
+from ...services.serialization import write_file
+from ...services.search_index import index_agent
 
 class ChatbotAnalyzer:
     """
@@ -27,7 +29,7 @@ class ChatbotAnalyzer:
         }
         
         self.Analayser = Agent(
-            model=Gemini(model='gemini-2.0-flash-exp', api_key=os.getenv("GEMINI_API_KEY")),
+            model=gemini_model(),
             instructions=[
                 f"Based on the prompt provided give an analysis of what all tools from {self.tool_kit} should the chatbot be equipped with and what concepts should it know.",
                 "The output should be of form [Tools = [the tools required], Concepts = [the concepts required]].",
@@ -36,7 +38,7 @@ class ChatbotAnalyzer:
         )
         
         self.PersonalityGenerator = Agent(
-            model=Gemini(model='gemini-2.0-flash-exp', api_key=os.getenv("GEMINI_API_KEY")),
+            model=gemini_model(),
             instructions=[
                 "Based on the type of chatbot the user wants to make, generate a background and personality for the Chatbot to be created.",
                 "Keep the whole background and personality concise and in a single paragraph.",
@@ -45,7 +47,7 @@ class ChatbotAnalyzer:
         )
 
         self.InstructionGenerator = Agent(
-            model=Gemini(model='gemini-2.0-flash-exp', api_key=os.getenv("GEMINI_API_KEY")),
+            model=gemini_model(),
             instructions=[
                 "Based on the type of chatbot the user wants to create, generate a concise set of instructions outlining the tasks and functionalities that the chatbot should perform.",
                 "The output should be structured as a para of actionable items, each describing a specific capability or task the chatbot is expected to handle.",
@@ -56,6 +58,14 @@ class ChatbotAnalyzer:
             ]
         )
 
+    def reset(self):
+        """
+        Clears the run history accumulated by the analysis agents so the same
+        instance can serve the next agent creation from the pool.
+        """
+        for agent in (self.Analayser, self.PersonalityGenerator, self.InstructionGenerator):
+            agent.memory.clear()
+
     def find_tools_and_concepts(self, prompt):
         """
         Analyzes a given prompt to determine which tools from the toolkit are needed 
@@ -141,5 +151,6 @@ class ChatbotAnalyzer:
         }
 
         file_path = os.path.join('DB', f'{ID}.json')
-        with open(file_path, 'w') as json_file:
-            json.dump(data, json_file, indent=4)
\ No newline at end of file
+        write_file(file_path, data)
+        agent_configs.put(ID, data)
+        index_agent(ID, data)
\ No newline at end of file
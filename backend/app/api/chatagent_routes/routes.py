@@ -1,33 +1,61 @@
-from fastapi import APIRouter, HTTPException, WebSocket
+from fastapi import APIRouter, HTTPException, WebSocket, Request, Response
 from .schemas import (agentCreation, walletAddress, ChatAuthorization, 
                     agentInteract, agentInteractResponse)
-from .Agent import CreateAgent, load_agent, get_wallet_id
-from typing import Dict
-import os
-import json
+from .Agent import (CreateAgent, load_agent, get_wallet_id, mapping_store, conversation_store,
+                    authorization_store, format_turn, get_conversation_page)
+from typing import Optional
+from ...services.log_service import get_logger
+from ...services.keystore import get_wallet_address
+from ...services.agent_config_cache import agent_configs
+from ...services.single_flight import SingleFlight
+from ...services.mailbox import KeyedScheduler
+from ...services.llm_scheduler import llm_scheduler, admit_request
+from ...services.http_cache import version_etag, check_not_modified
+from ...services.search_index import search_index
+from ...services import metrics
+from starlette.concurrency import run_in_threadpool
 
 router = APIRouter()
 
-chat_authorizations: Dict[str, ChatAuthorization] = {}
+logger = get_logger(__name__)
+
+
+def get_authorization(nft_hash: str) -> Optional[ChatAuthorization]:
+    """Who may chat with the agent minted as `nft_hash`, or None if it is unknown."""
+    auth = authorization_store.get(nft_hash)
+    return ChatAuthorization(**auth) if auth is not None else None
+
+
+# Concurrent identical reads (same endpoint and parameters) share one computation.
+read_flights = SingleFlight("aigent_reads")
+metrics.register("aigent_read_coalescing", read_flights.stats)
+
+# Interactions with one agent run in arrival order so each turn sees the previous
+# one; different agents are processed in parallel.
+interaction_mailboxes = KeyedScheduler("agent_interactions")
+metrics.register("agent_interaction_mailboxes", interaction_mailboxes.stats)
+
+# Turns included inline in /user-agents; older ones are fetched by cursor.
+USER_AGENTS_RECENT_TURNS = 10
 
 
 @router.post("/create-agent/{user_id}", response_model=walletAddress)
 async def create_agent(user_id: str, request: agentCreation) -> walletAddress:
+    admit_request(user_id)
     try:
         # here teh walle address is being returned
-        response = CreateAgent(prompt=request.prompt, NFT_id=request.nftHash)
-        
-        # Add debug logging
-        print(f"Creating agent for user: {user_id}")
-        print(f"NFT hash: {request.nftHash}")
+        response = await llm_scheduler.run(user_id, request.nftHash, CreateAgent,
+                                           prompt=request.prompt, NFT_id=request.nftHash)
         
         chat_auth = ChatAuthorization(
             creator=user_id.lower(),  # Store lowercase
             members=[]
         )
         
-        chat_authorizations[request.nftHash] = chat_auth
-        print(f"Updated chat authorizations: {chat_authorizations}")
+        # Access control has no other source to be rebuilt from, so it is stored durably.
+        await run_in_threadpool(authorization_store.set, request.nftHash, chat_auth.model_dump())
+        logger.info("chat_authorization_added", nft_hash=request.nftHash, creator=chat_auth.creator,
+                    total=len(authorization_store))
         
         return response
     except Exception as e:
@@ -39,91 +67,107 @@ async def interact_with_agent(
     user_id: str, 
     request: agentInteract
 ) -> agentInteractResponse:
-    if nft_hash not in chat_authorizations:
+    auth = get_authorization(nft_hash)
+    if auth is None:
         raise HTTPException(
             status_code=404,
             detail="NFT hash not found in authorization map"
         )
     
-    auth = chat_authorizations[nft_hash]
-    
     if user_id != auth.creator and user_id not in auth.members:
         raise HTTPException(
             status_code=403,
             detail="User not authorized to interact with this agent"
         )
     
+    admit_request(user_id)
     try:
-        response = load_agent(NFT_id=nft_hash, prompt=request.prompt)
+        # The mailbox keeps this agent's turns in order; the scheduler decides
+        # when this turn gets a model slot relative to other users and agents.
+        response = await interaction_mailboxes.submit(nft_hash, llm_scheduler.run, user_id, nft_hash,
+                                                      load_agent, NFT_id=nft_hash, prompt=request.prompt)
         return response
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/llm-queue/{user_id}")
+async def get_llm_queue(user_id: str):
+    """Rate-limit tier, remaining tokens and model queue wait times for a user."""
+    return llm_scheduler.user_stats(user_id)
+
+def _listing_etag(*parts) -> str:
+    """ETag for payloads built from the mapping, conversation and agent config stores."""
+    return version_etag(mapping_store.version, conversation_store.version, agent_configs.version, *parts)
+
+def _accessible_wallet_ids(user_id: str) -> set:
+    """Wallet IDs of the agents `user_id` created or is a member of."""
+    wallet_ids = set()
+    for nft_hash, auth in authorization_store.snapshot().items():
+        if auth["creator"] == user_id or user_id in auth["members"]:
+            wallet_id = mapping_store.get(nft_hash)
+            if wallet_id:
+                wallet_ids.add(wallet_id)
+    return wallet_ids
+
+@router.get("/search/{user_id}")
+async def search(user_id: str, q: str, limit: int = 20, kind: Optional[str] = None):
+    """
+    Full-text search over agent personalities, concepts and instructions and
+    over conversation turns, ranked by BM25.
+
+    `kind` restricts hits to "agent" or "turn". Agent hits carry the agent's
+    wallet address; turn hits carry the wallet ID and turn ID. Turn hits only
+    come from agents the user created or is a member of, the same access rule
+    as /conversation-history.
+    """
+    if kind not in (None, "agent", "turn"):
+        raise HTTPException(status_code=400, detail="kind must be 'agent' or 'turn'")
+    limit = max(1, min(limit, 100))
+    wallet_ids = _accessible_wallet_ids(user_id.lower()) if kind != "agent" else set()
+    results = search_index.search(q, limit=limit, kind=kind,
+                                  allow=lambda meta: meta["kind"] != "turn" or meta["wallet_id"] in wallet_ids)
+    return {"query": q, "count": len(results), "results": results}
+
+@router.get("/agent-footprint")
+async def agent_footprint():
+    """Memory footprint of every cached agent config, with shared objects amortized."""
+    return agent_configs.footprint()
+
 @router.get("/fetch-agent-mappings")
-async def fetch_agent_mappings():
+async def fetch_agent_mappings(request: Request, response: Response):
     """Fetch all mappings between NFT hashes, wallet IDs, and conversation prompts."""
+    not_modified = check_not_modified(request, response, _listing_etag("fetch-agent-mappings"))
+    if not_modified is not None:
+        return not_modified
     try:
         # Get NFT to wallet mappings
-        nft_wallet_map = {}
-        if os.path.exists('map.json'):
-            try:
-                with open('map.json', 'r') as file:
-                    nft_wallet_map = json.load(file)
-            except json.JSONDecodeError:
-                nft_wallet_map = {}
-        
-        # Get wallet conversations
-        wallet_conversations = {}
-        if os.path.exists('conversations.json'):
-            try:
-                with open('conversations.json', 'r') as file:
-                    wallet_conversations = json.load(file)
-            except json.JSONDecodeError:
-                wallet_conversations = {}
-        
-        # Get agent personalities (if needed)
-        agent_personalities = {}
-        db_dir = "DB"
-        if os.path.exists(db_dir):
-            for filename in os.listdir(db_dir):
-                if filename.endswith('.json'):
-                    wallet_address = filename[:-5]  # Remove .json extension
-                    file_path = os.path.join(db_dir, filename)
-                    try:
-                        with open(file_path, 'r') as file:
-                            data = json.load(file)
-                            agent_personalities[wallet_address] = {
-                                "personality": data.get("Personality", ""),
-                                "concepts": data.get("Concepts", [])
-                            }
-                    except:
-                        continue
+        nft_wallet_map = mapping_store.snapshot()
         
         # Combine data into a comprehensive mapping
         result = []
         for nft_hash, wallet_id in nft_wallet_map.items():
+            last_turn = conversation_store.last(wallet_id)
             entry = {
                 "nft_hash": nft_hash,
                 "wallet_id": wallet_id,
                 "address": "",  # Would need to fetch this from wallet data
-                "conversation": wallet_conversations.get(wallet_id, "No conversations yet")
+                "conversation": format_turn(last_turn) if last_turn else "No conversations yet"
             }
             
-            # Get wallet data if available
-            wallet_file = f"wallet_storage/{wallet_id}.json"
-            if os.path.exists(wallet_file):
-                try:
-                    with open(wallet_file, 'r') as file:
-                        wallet_data = json.load(file)
-                        if wallet_data.get('addresses') and len(wallet_data['addresses']) > 0:
-                            entry["address"] = wallet_data['addresses'][0].get('address_id', "")
-                except:
-                    pass
+            # Get wallet address if available
+            try:
+                entry["address"] = get_wallet_address(wallet_id)
+            except Exception:
+                pass
             
             # Add personality if available
-            if entry["address"] in agent_personalities:
-                entry["personality"] = agent_personalities[entry["address"]]
+            data = agent_configs.get(entry["address"]) if entry["address"] else None
+            if data:
+                entry["personality"] = {
+                    "personality": data.get("Personality", ""),
+                    "concepts": data.get("Concepts", [])
+                }
             
             result.append(entry)
         
@@ -137,249 +181,164 @@ async def test_get_wallet(nft_hash: str):
     return {"nft_hash": nft_hash, "wallet_id": get_wallet_id(nft_hash)}
 
 @router.get("/user-agents/{user_id}")
-async def get_user_agents(user_id: str):
+async def get_user_agents(user_id: str, request: Request, response: Response):
     """
     Fetch all agents and their conversations that a user has access to.
     This includes both agents created by the user and those they're added to as members.
     """
+    user_id = user_id.lower()  # Normalize user ID
+    etag = _listing_etag("user-agents", user_id, authorization_store.version)
+    not_modified = check_not_modified(request, response, etag)
+    if not_modified is not None:
+        return not_modified
     try:
-        user_id = user_id.lower()  # Normalize user ID
-        user_agents = []
+        return await read_flights.do_async(("user-agents", user_id), _build_user_agents, user_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _build_user_agents(user_id: str) -> dict:
+    """Build the /user-agents payload. Runs once per user for concurrent identical requests."""
+    user_agents = []
+    
+    # Find all NFTs this user has access to
+    accessible_nfts = []
+    for nft_hash, auth in authorization_store.snapshot().items():
+        if auth["creator"] == user_id or user_id in auth["members"]:
+            accessible_nfts.append({
+                "nft_hash": nft_hash,
+                "is_creator": auth["creator"] == user_id,
+                "members": auth["members"]
+            })
+    
+    # Get NFT to wallet mappings
+    nft_wallet_map = mapping_store.snapshot()
+    
+    # Build detailed information for each accessible NFT
+    for nft_info in accessible_nfts:
+        nft_hash = nft_info["nft_hash"]
+        wallet_id = nft_wallet_map.get(nft_hash)
         
-        # Find all NFTs this user has access to
-        accessible_nfts = []
-        for nft_hash, auth in chat_authorizations.items():
-            if auth.creator == user_id or user_id in auth.members:
-                accessible_nfts.append({
-                    "nft_hash": nft_hash,
-                    "is_creator": auth.creator == user_id,
-                    "members": auth.members
-                })
+        if not wallet_id:
+            continue  # Skip if no wallet mapping
+            
+        # Latest turns, with a cursor to page back through older ones
+        recent = get_conversation_page(wallet_id, USER_AGENTS_RECENT_TURNS, offset=0, latest=True)
         
-        # Get NFT to wallet mappings
-        nft_wallet_map = {}
-        if os.path.exists('map.json'):
-            try:
-                with open('map.json', 'r') as file:
-                    nft_wallet_map = json.load(file)
-            except json.JSONDecodeError:
-                nft_wallet_map = {}
+        # Get agent details
+        agent_entry = {
+            "nft_hash": nft_hash,
+            "wallet_id": wallet_id,
+            "is_creator": nft_info["is_creator"],
+            "members": nft_info["members"],
+            "conversation": format_turn(recent["turns"][-1]) if recent["turns"] else "No conversations yet",
+            "parsed_conversation": recent["turns"],
+            "total_conversations": recent["total"],
+            "prev_cursor": recent["prev_cursor"],
+            "address": "",
+            "personality": {}
+        }
         
-        # Get wallet conversations
-        wallet_conversations = {}
-        if os.path.exists('conversations.json'):
-            try:
-                with open('conversations.json', 'r') as file:
-                    wallet_conversations = json.load(file)
-            except json.JSONDecodeError:
-                wallet_conversations = {}
+        # Get wallet address
+        try:
+            agent_entry["address"] = get_wallet_address(wallet_id)
+        except Exception:
+            pass
         
-        # Build detailed information for each accessible NFT
-        for nft_info in accessible_nfts:
-            nft_hash = nft_info["nft_hash"]
-            wallet_id = nft_wallet_map.get(nft_hash)
-            
-            if not wallet_id:
-                continue  # Skip if no wallet mapping
-                
-            # Get agent details
-            agent_entry = {
-                "nft_hash": nft_hash,
-                "wallet_id": wallet_id,
-                "is_creator": nft_info["is_creator"],
-                "members": nft_info["members"],
-                "conversation": wallet_conversations.get(wallet_id, "No conversations yet"),
-                "address": "",
-                "personality": {}
+        # Get agent personality
+        data = agent_configs.get(agent_entry["address"]) if agent_entry["address"] else None
+        if data:
+            agent_entry["personality"] = {
+                "description": data.get("Personality", ""),
+                "concepts": data.get("Concepts", []),
+                "tools": data.get("Tools", [])
             }
-            
-            # Get wallet address
-            wallet_file = f"wallet_storage/{wallet_id}.json"
-            if os.path.exists(wallet_file):
-                try:
-                    with open(wallet_file, 'r') as file:
-                        wallet_data = json.load(file)
-                        if wallet_data.get('addresses') and len(wallet_data['addresses']) > 0:
-                            agent_entry["address"] = wallet_data['addresses'][0].get('address_id', "")
-                except:
-                    pass
-            
-            # Get agent personality
-            if agent_entry["address"]:
-                db_file = f"DB/{agent_entry['address']}.json"
-                if os.path.exists(db_file):
-                    try:
-                        with open(db_file, 'r') as file:
-                            data = json.load(file)
-                            agent_entry["personality"] = {
-                                "description": data.get("Personality", ""),
-                                "concepts": data.get("Concepts", []),
-                                "tools": data.get("Tools", [])
-                            }
-                    except:
-                        pass
-            
-            # Parse conversations into an array for better frontend display
-            if isinstance(agent_entry["conversation"], str):
-                # Try to parse conversation string into structured data
-                conversation_parts = []
-                try:
-                    # Typical format: "Question:X,answer: Y"
-                    convo_str = agent_entry["conversation"]
-                    if "Question:" in convo_str and ",answer: " in convo_str:
-                        question_part = convo_str.split(",answer: ")[0]
-                        answer_part = convo_str.split(",answer: ")[1]
-                        
-                        question = question_part.replace("Question:", "").strip()
-                        answer = answer_part.strip()
-                        
-                        conversation_parts.append({
-                            "question": question,
-                            "answer": answer
-                        })
-                except:
-                    # If parsing fails, just keep the original string
-                    conversation_parts.append({
-                        "raw": agent_entry["conversation"]
-                    })
-                
-                agent_entry["parsed_conversation"] = conversation_parts
-            
-            user_agents.append(agent_entry)
         
-        return {"user_id": user_id, "agents": user_agents}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        user_agents.append(agent_entry)
+    
+    return {"user_id": user_id, "agents": user_agents}
 
 @router.get("/conversation-history/{nft_hash}/{user_id}")
 async def get_conversation_history(
     nft_hash: str, 
     user_id: str,
     limit: int = 10,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None
 ):
     """
     Fetch paginated conversation history for a specific NFT agent.
     Includes filtering by user access permissions.
+
+    Turns are returned oldest first. Pass the returned next_cursor/prev_cursor
+    as `cursor` to page forwards/backwards; `offset` is used only without one.
     """
     try:
         user_id = user_id.lower()  # Normalize user ID
-        
-        # Check if user has access to this NFT
-        if nft_hash not in chat_authorizations:
-            raise HTTPException(
-                status_code=404,
-                detail="NFT hash not found"
-            )
-        
-        auth = chat_authorizations[nft_hash]
-        if user_id != auth.creator and user_id not in auth.members:
-            raise HTTPException(
-                status_code=403,
-                detail="User not authorized to access this agent's conversations"
-            )
-        
-        # Get wallet ID for this NFT
-        wallet_id = get_wallet_id(nft_hash)
-        if wallet_id in ["File not found.", "Error decoding JSON.", "NFT ID not found.", "Empty file."]:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Error retrieving wallet: {wallet_id}"
-            )
-        
-        # Load conversations
-        conversations = []
-        if os.path.exists('conversations.json'):
-            try:
-                with open('conversations.json', 'r') as file:
-                    data = json.load(file)
-                    if wallet_id in data:
-                        # Parse conversation string
-                        conversation_str = data[wallet_id]
-                        
-                        # If we have a full conversation history format (assuming it's in JSON)
-                        if conversation_str.startswith('[') and conversation_str.endswith(']'):
-                            try:
-                                conversations = json.loads(conversation_str)
-                            except:
-                                # Fall back to basic parsing
-                                conversations = []
-                        else:
-                            # Basic parsing of "Question:X,answer: Y" format
-                            parts = []
-                            current_convo = conversation_str
-                            
-                            # Split by questions if possible
-                            if "Question:" in current_convo:
-                                # Handle the typical format "Question:X,answer: Y"
-                                try:
-                                    question_part = current_convo.split(",answer: ")[0]
-                                    answer_part = current_convo.split(",answer: ")[1]
-                                    
-                                    question = question_part.replace("Question:", "").strip()
-                                    answer = answer_part.strip()
-                                    
-                                    parts.append({
-                                        "question": question,
-                                        "answer": answer,
-                                        "timestamp": None  # We don't have timestamps in current format
-                                    })
-                                except:
-                                    # If parsing fails, add the raw format
-                                    parts.append({
-                                        "raw": current_convo
-                                    })
-                            
-                            conversations = parts
-            except Exception as e:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Error parsing conversations: {str(e)}"
-                )
-        
-        # Get wallet address and agent personality if available
-        wallet_address = ""
-        personality = {}
-        
-        wallet_file = f"wallet_storage/{wallet_id}.json"
-        if os.path.exists(wallet_file):
-            try:
-                with open(wallet_file, 'r') as file:
-                    wallet_data = json.load(file)
-                    if wallet_data.get('addresses') and len(wallet_data['addresses']) > 0:
-                        wallet_address = wallet_data['addresses'][0].get('address_id', "")
-            except:
-                pass
-                
-        if wallet_address:
-            db_file = f"DB/{wallet_address}.json"
-            if os.path.exists(db_file):
-                try:
-                    with open(db_file, 'r') as file:
-                        data = json.load(file)
-                        personality = {
-                            "description": data.get("Personality", ""),
-                            "concepts": data.get("Concepts", []),
-                            "tools": data.get("Tools", [])
-                        }
-                except:
-                    pass
-        
-        # Apply pagination if needed
-        total_conversations = len(conversations)
-        paginated_conversations = conversations[offset:offset+limit] if conversations else []
-        
-        return {
-            "nft_hash": nft_hash,
-            "wallet_id": wallet_id,
-            "wallet_address": wallet_address,
-            "creator": auth.creator,
-            "members": auth.members,
-            "personality": personality,
-            "total_conversations": total_conversations,
-            "offset": offset,
-            "limit": limit,
-            "conversations": paginated_conversations
-        }
+        key = ("conversation-history", nft_hash, user_id, limit, offset, cursor)
+        return await read_flights.do_async(key, _build_conversation_history, nft_hash, user_id, limit, offset, cursor)
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _build_conversation_history(nft_hash: str, user_id: str, limit: int, offset: int,
+                                cursor: Optional[str]) -> dict:
+    """Build the /conversation-history payload, raising HTTPException on access errors."""
+    # Check if user has access to this NFT
+    auth = get_authorization(nft_hash)
+    if auth is None:
+        raise HTTPException(
+            status_code=404,
+            detail="NFT hash not found"
+        )
+    if user_id != auth.creator and user_id not in auth.members:
+        raise HTTPException(
+            status_code=403,
+            detail="User not authorized to access this agent's conversations"
+        )
+    
+    # Get wallet ID for this NFT
+    wallet_id = get_wallet_id(nft_hash)
+    if wallet_id in ["File not found.", "Error decoding JSON.", "NFT ID not found.", "Empty file."]:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Error retrieving wallet: {wallet_id}"
+        )
+    
+    # One page of structured turns; cursors take precedence over offset
+    try:
+        page = get_conversation_page(wallet_id, limit, cursor=cursor, offset=offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Get wallet address and agent personality if available
+    wallet_address = ""
+    personality = {}
+    
+    try:
+        wallet_address = get_wallet_address(wallet_id)
+    except Exception:
+        pass
+            
+    data = agent_configs.get(wallet_address) if wallet_address else None
+    if data:
+        personality = {
+            "description": data.get("Personality", ""),
+            "concepts": data.get("Concepts", []),
+            "tools": data.get("Tools", [])
+        }
+    
+    return {
+        "nft_hash": nft_hash,
+        "wallet_id": wallet_id,
+        "wallet_address": wallet_address,
+        "creator": auth.creator,
+        "members": auth.members,
+        "personality": personality,
+        "total_conversations": page["total"],
+        "offset": offset,
+        "limit": limit,
+        "conversations": page["turns"],
+        "next_cursor": page["next_cursor"],
+        "prev_cursor": page["prev_cursor"]
+    }
@@ -0,0 +1,108 @@
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List
+from ...services.file_service import circuit_files
+from ...services.http_cache import version_etag, check_not_modified, is_not_modified
+from ...services.zk_verifier import proof_verifier
+import os
+import time
+
+router = APIRouter(prefix="/circuits", tags=["circuits"])
+
+ARTIFACT_MEDIA_TYPES = {
+    "wasm": "application/wasm",
+    "zkey": "application/octet-stream",
+}
+
+# Artifacts rarely change; clients may reuse them for an hour, then revalidate by ETag.
+ARTIFACT_CACHE_CONTROL = "public, max-age=3600"
+
+MAX_PROOF_BATCH = int(os.getenv("ZK_MAX_BATCH", "256"))
+
+
+class ProofItem(BaseModel):
+    # snarkjs output: proof.json and public.json
+    proof: Dict[str, Any]
+    publicSignals: List[str]
+
+
+class VerifyRequest(BaseModel):
+    proofs: List[ProofItem] = Field(..., min_length=1)
+
+
+class VerifyResponse(BaseModel):
+    circuit: str
+    valid: List[bool]
+    errors: Dict[int, str]
+    elapsed_ms: float
+    proofs_per_second: float
+
+
+@router.get("")
+def list_circuits(request: Request, response: Response):
+    catalog = circuit_files.catalog()
+    not_modified = check_not_modified(request, response, version_etag(
+        "circuits", *((name, tuple(entry["sizes"].items())) for name, entry in catalog.items())))
+    if not_modified is not None:
+        return not_modified
+    return [{"name": name, "sizes": entry["sizes"]} for name, entry in catalog.items()]
+
+
+@router.get("/{circuit_name}/verification-key")
+def get_verification_key(circuit_name: str, request: Request, response: Response):
+    path = circuit_files.artifact_path(circuit_name, "vkey")
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Circuit {circuit_name} not found")
+    not_modified = check_not_modified(request, response, circuit_files.strong_etag(path))
+    if not_modified is not None:
+        return not_modified
+    return circuit_files.read_verification_key(circuit_name)
+
+
+@router.get("/{circuit_name}/{artifact}")
+def get_artifact(circuit_name: str, artifact: str, request: Request):
+    """
+    Serve a circuit's .wasm or .zkey file.
+
+    FileResponse streams from disk (zero-copy via the ASGI pathsend extension
+    where the server supports it) and answers Range / If-Range requests with
+    206. The ETag is a content hash, so it is strong and valid for If-Range.
+    """
+    if artifact not in ARTIFACT_MEDIA_TYPES:
+        raise HTTPException(status_code=404, detail=f"Unknown artifact {artifact}")
+    path = circuit_files.artifact_path(circuit_name, artifact)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Circuit {circuit_name} not found")
+    etag = circuit_files.strong_etag(path)
+    if etag is None:
+        raise HTTPException(status_code=404, detail=f"{artifact} of {circuit_name} is missing")
+    headers = {"ETag": etag, "Cache-Control": ARTIFACT_CACHE_CONTROL}
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    # The artifacts are effectively incompressible; marking them identity-encoded
+    # keeps the compression middleware from re-encoding them, which would also
+    # break byte ranges.
+    headers["Content-Encoding"] = "identity"
+    return FileResponse(path, media_type=ARTIFACT_MEDIA_TYPES[artifact], headers=headers,
+                        filename=path.name, content_disposition_type="inline")
+
+
+@router.post("/{circuit_name}/verify", response_model=VerifyResponse)
+async def verify_proofs(circuit_name: str, request: VerifyRequest):
+    """Verify a batch of Groth16 proofs for one circuit; returns per-proof validity."""
+    if len(request.proofs) > MAX_PROOF_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_PROOF_BATCH} proofs per request")
+    start = time.perf_counter()
+    try:
+        results = await proof_verifier.verify(circuit_name, [(item.proof, item.publicSignals) for item in request.proofs])
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Circuit {circuit_name} not found")
+    elapsed = time.perf_counter() - start
+    return VerifyResponse(
+        circuit=circuit_name,
+        valid=[result is None for result in results],
+        errors={i: result for i, result in enumerate(results) if result is not None},
+        elapsed_ms=round(elapsed * 1000, 1),
+        proofs_per_second=round(len(results) / elapsed, 2) if elapsed else 0.0,
+    )
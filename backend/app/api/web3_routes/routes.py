@@ -1,13 +1,33 @@
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from typing import List, Dict, Optional
 from ...web3_agents.main import Web3AgentManager
-import json 
+from ...web3_agents.converter_agent import BASENAME_MAX_AMOUNT
+from ...web3_agents.plan_executor import PlanError, PlanStep, execute_plan, topological_levels
+from ...services.log_service import get_logger
+from ...services.llm_scheduler import llm_scheduler, admit_request
+from ...services.http_cache import file_etag, check_not_modified
+from ...services.serialization import dumps, read_file, write_file
+from ...services.sharded_registry import ShardedRegistry
+from ...services import metrics
 import os  
 
 router = APIRouter(prefix="/web3_manager/{user_id}", tags=["web3"])
 
-agent_manager = Web3AgentManager(user_id="{user_id}")
+logger = get_logger(__name__)
+
+# One manager per user, so users never overwrite each other's agents or converter state.
+managers = ShardedRegistry(
+    "web3_managers",
+    factory=lambda user_id: Web3AgentManager(user_id=user_id),
+    shards=int(os.getenv("WEB3_MANAGER_SHARDS", "16")),
+    max_entries=int(os.getenv("WEB3_MANAGER_MAX", "1024")),
+    idle_ttl=float(os.getenv("WEB3_MANAGER_IDLE_SECONDS", "1800")),
+)
+metrics.register("web3_managers", managers.stats)
+
+PLAN_MAX_PARALLEL = int(os.getenv("PLAN_MAX_PARALLEL", "4"))
 # 
 # Request/Response Models
 class PromptRequest(BaseModel):
@@ -25,6 +45,9 @@ class AgentResponse(BaseModel):
     wallet_address: str
     wallet_id: Optional[str] = None
     user_id: str
+    task: Optional[str] = None
+    flow: Optional[str] = None
+    depends_on: List[int] = []
 
 class CreateAgentsResponse(BaseModel):
     success: bool
@@ -36,15 +59,43 @@ class RunAgentResponse(BaseModel):
     success: bool
     result: str
 
+class PlanStepRequest(BaseModel):
+    functions: List[str]
+    wallet_id: str
+    name: Optional[str] = None
+    task: Optional[str] = None
+    flow: Optional[str] = None
+    depends_on: List[int] = []
+
+class BasenameRegistration(BaseModel):
+    wallet_id: str
+    basename: str
+
+class RegisterBasenamesRequest(BaseModel):
+    registrations: List[BasenameRegistration]
+    # ETH paid per registration
+    amount: float = Field(0.002, gt=0, le=BASENAME_MAX_AMOUNT)
+
+class RegisterBasenamesResponse(BaseModel):
+    success: bool
+    results: List[str]
+
+class RunPlanRequest(BaseModel):
+    prompt: str
+    # Defaults to the agents (and their dependencies) saved by /create-agents.
+    steps: Optional[List[PlanStepRequest]] = None
+
 # Routes
 @router.post("/create-agents", response_model=CreateAgentsResponse)
 async def create_agents(
     request: PromptRequest,
     user_id: str
 ):
+    admit_request(user_id)
     try:
-        agents = agent_manager.create_agents(request.prompt)
-        print(f"Created {len(agents)} agents with manager {id(agent_manager)}")
+        agent_manager = managers.get_or_create(user_id.lower())
+        agents = await llm_scheduler.run(user_id, "create-agents", agent_manager.create_agents, request.prompt)
+        logger.info("web3_agents_created", user_id=user_id, count=len(agents))
         
         agent_responses = [
             AgentResponse(
@@ -52,7 +103,10 @@ async def create_agents(
                 functions=agent.function_names,
                 wallet_address=agent._get_wallet_address(),
                 wallet_id=agent.wallet_id,  # Always send the wallet_id back to the frontend
-                user_id=f"{user_id}"  # Include user_id in the response
+                user_id=f"{user_id}",  # Include user_id in the response
+                task=agent.task,
+                flow=agent.flow,
+                depends_on=agent.depends_on
             )
             for i, agent in enumerate(agents)
         ]
@@ -65,8 +119,7 @@ async def create_agents(
         os.makedirs(dir_path, exist_ok=True)
 
         # Save agent_responses to a JSON file
-        with open(file_path, "w") as json_file:
-            json.dump([response.dict() for response in agent_responses], json_file)
+        write_file(file_path, [response.dict() for response in agent_responses])
 
         return CreateAgentsResponse(
             success=True,
@@ -75,24 +128,25 @@ async def create_agents(
             agents=agent_responses
         )
     except Exception as e:
-        print(f"Error in create_agents route: {str(e)}")
+        logger.error("create_agents_failed", user_id=user_id, error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/agents", response_model=List[AgentResponse])
-async def get_agents(user_id: str):
-    try:
-        # Define the directory and file path
-        dir_path = f"user_data"
-        file_path = os.path.join(dir_path, f"{user_id}.json")
+async def get_agents(user_id: str, request: Request, response: Response):
+    # Define the directory and file path
+    dir_path = f"user_data"
+    file_path = os.path.join(dir_path, f"{user_id}.json")
 
+    # The payload is exactly the file's contents, so its stat is the version.
+    not_modified = check_not_modified(request, response, file_etag(file_path))
+    if not_modified is not None:
+        return not_modified
+    try:
         # Check if the file exists
         if not os.path.exists(file_path):
             raise HTTPException(status_code=404, detail="No agents found for this user.")
 
-        with open(file_path, "r") as json_file:
-            agents_data = json.load(json_file)
-
-        print(f"Getting agents from JSON file for user {user_id}: {len(agents_data)} agents")
+        agents_data = read_file(file_path)
         
         responses = [
             AgentResponse(
@@ -100,15 +154,17 @@ async def get_agents(user_id: str):
                 functions=agent['functions'],
                 wallet_address=agent['wallet_address'],
                 wallet_id=agent['wallet_id'],
-                user_id=agent['user_id']
+                user_id=agent['user_id'],
+                task=agent.get('task'),
+                flow=agent.get('flow'),
+                depends_on=agent.get('depends_on', [])
             )
             for agent in agents_data
         ]
-        print(f"Returning {len(responses)} agent responses")
         return responses
         
     except Exception as e:
-        print(f"Error in get_agents: {str(e)}")
+        logger.error("get_agents_failed", user_id=user_id, error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/run-agent", response_model=RunAgentResponse)
@@ -116,8 +172,11 @@ async def run_agent(
     request: AgentRunRequest,
     user_id: str
 ):
+    admit_request(user_id)
     try:
-        result = agent_manager.run_agent(request.functions, request.wallet_id, request.agent_index, request.prompt)
+        agent_manager = managers.get_or_create(user_id.lower())
+        result = await llm_scheduler.run(user_id, request.wallet_id, agent_manager.run_agent, request.functions,
+                                         request.wallet_id, request.agent_index, request.prompt)
         return RunAgentResponse(
             success=True,
             result=result
@@ -125,5 +184,80 @@ async def run_agent(
     except IndexError as e:
         raise HTTPException(status_code=404, detail=f"Agent {request.agent_index} not found")
     except Exception as e:
-        print(f"Error running agent: {str(e)}")
+        logger.error("run_agent_failed", user_id=user_id, error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
+
+def _saved_wallet_ids(user_id: str) -> set:
+    """Wallet IDs of the agents saved for `user_id` by /create-agents."""
+    file_path = os.path.join("user_data", f"{user_id}.json")
+    if not os.path.exists(file_path):
+        return set()
+    return {agent["wallet_id"] for agent in read_file(file_path) if agent.get("wallet_id")}
+
+@router.post("/register-basenames", response_model=RegisterBasenamesResponse)
+async def register_basenames(
+    request: RegisterBasenamesRequest,
+    user_id: str
+):
+    if not request.registrations:
+        raise HTTPException(status_code=400, detail="No registrations given")
+    # Registrations spend ETH, so only wallets of the caller's own saved agents may be used.
+    owned = _saved_wallet_ids(user_id)
+    foreign = sorted({item.wallet_id for item in request.registrations} - owned)
+    if foreign:
+        raise HTTPException(status_code=403, detail=f"Wallets not owned by this user: {', '.join(foreign)}")
+    admit_request(user_id, cost=len(request.registrations))
+    try:
+        agent_manager = managers.get_or_create(user_id.lower())
+        results = await llm_scheduler.run(user_id, "register-basenames", agent_manager.register_basenames,
+                                          [(item.wallet_id, item.basename) for item in request.registrations],
+                                          request.amount)
+        return RegisterBasenamesResponse(
+            success=all(result.startswith("Successfully") for result in results),
+            results=results
+        )
+    except Exception as e:
+        logger.error("register_basenames_failed", user_id=user_id, error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/run-plan")
+async def run_plan(
+    request: RunPlanRequest,
+    user_id: str
+):
+    """
+    Run all of the user's agents as one plan, streaming NDJSON events.
+
+    Steps whose dependencies are met run concurrently; each dependent step gets
+    its dependencies' outputs in its prompt. See execute_plan for the events.
+    """
+    if request.steps is not None:
+        steps = [PlanStep(i, step.name or f"agent{i+1}", step.functions, step.wallet_id,
+                          step.task, step.flow, step.depends_on)
+                 for i, step in enumerate(request.steps)]
+    else:
+        file_path = os.path.join("user_data", f"{user_id}.json")
+        if not os.path.exists(file_path):
+            raise HTTPException(status_code=404, detail="No agents found for this user.")
+        steps = [PlanStep(i, agent["name"], agent["functions"], agent["wallet_id"],
+                          agent.get("task"), agent.get("flow"), agent.get("depends_on", []))
+                 for i, agent in enumerate(read_file(file_path))]
+    if not steps:
+        raise HTTPException(status_code=404, detail="No agents found for this user.")
+    try:
+        # Validate before streaming starts, so a bad plan is a plain 400.
+        topological_levels(steps)
+    except PlanError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    admit_request(user_id, cost=len(steps))
+    agent_manager = managers.get_or_create(user_id.lower())
+
+    async def run_step(step: PlanStep, prompt: str) -> str:
+        return await llm_scheduler.run(user_id, step.wallet_id, agent_manager.run_agent, step.functions,
+                                       step.wallet_id, step.index, prompt, raise_errors=True)
+
+    async def events():
+        async for event in execute_plan(request.prompt, steps, run_step, max_parallel=PLAN_MAX_PARALLEL):
+            yield dumps(event) + b"\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
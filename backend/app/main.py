@@ -1,11 +1,88 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
-from .api.web3_routes.routes import router as web3_router
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse
+from .api.web3_routes.routes import router as web3_router, managers as web3_managers
 from .api.chatagent_routes.routes import router as chatagent_router
+from .api.circuit_routes.routes import router as circuit_router
+from .api.chatagent_routes.Agent import analyzer_pool, build_search_index
+from .services.agent_config_cache import agent_configs
+from .services.client_pool import clients, warm_gemini
+from .services import metrics
+from .services.log_service import dropped_count, get_logger
+from .services.warmup import warmup
+from .services.serialization import FastJSONResponse
+from .services.event_indexer import start_event_indexer, stop_event_indexer
+from .services.file_service import circuit_files
+from .services.zk_verifier import proof_verifier
+from .services.wallet_pool import wallet_pool
+from .services.snapshot import cache_snapshot, SNAPSHOT_INTERVAL
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
+
+logger = get_logger(__name__)
 # from .api.chatagent_routes.routes import router as chatagent_router
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Restore cached state from the last run before warm-up, which then only fills gaps.
+    await asyncio.to_thread(cache_snapshot.load)
+    # Warm up in the background so /ready can report progress while it runs.
+    warmup.add("cdp", lambda: clients.get("cdp") and True)
+    warmup.add("agent_configs", agent_configs.preload)
+    warmup.add("search_index", build_search_index, required=False)
+    warmup.add("analyzer_pool", analyzer_pool.fill)
+    warmup.add("http_pool", lambda: clients.get("http") and True)
+    warmup.add("exa", lambda: clients.get("exa") and True)
+    warmup.add("gemini", warm_gemini, required=False)
+    warmup.add("event_indexer", lambda: "started" if start_event_indexer() else "disabled", required=False)
+    warmup.add("wallet_pool", wallet_pool.start, required=False)
+    warmup.add("circuits", lambda: circuit_files.watch() or len(circuit_files.catalog()), required=False)
+    warmup_task = asyncio.create_task(warmup.run())
+    sweep_task = asyncio.create_task(sweep_idle_managers())
+    snapshot_task = asyncio.create_task(snapshot_caches(SNAPSHOT_INTERVAL)) if SNAPSHOT_INTERVAL > 0 else None
+    yield
+    warmup_task.cancel()
+    sweep_task.cancel()
+    if snapshot_task is not None:
+        snapshot_task.cancel()
+    await save_snapshot()
+    stop_event_indexer()
+    circuit_files.stop()
+    proof_verifier.shutdown()
+    wallet_pool.stop()
+
+
+async def sweep_idle_managers(interval: float = 60.0):
+    # Inserts already evict idle managers in their own shard; this catches quiet shards.
+    while True:
+        await asyncio.sleep(interval)
+        web3_managers.evict_idle()
+
+
+async def snapshot_caches(interval: float):
+    # Periodic snapshots bound what a crash loses; graceful shutdowns write a final one.
+    while True:
+        await asyncio.sleep(interval)
+        await save_snapshot()
+
+
+async def save_snapshot():
+    try:
+        await asyncio.to_thread(cache_snapshot.save)
+    except OSError as e:
+        logger.error("snapshot_save_failed", error=str(e))
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+
+metrics.register("logging", lambda: {"dropped": dropped_count()})
 
 # Configure CORS
 app.add_middleware(
@@ -16,6 +93,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses; brotli when installed (it falls back to gzip per client).
+if BrotliMiddleware is not None:
+    app.add_middleware(BrotliMiddleware, minimum_size=1024, gzip_fallback=True)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # Initialize the agent manager at startup
 app.include_router(web3_router, prefix="/blend", tags=["web3"])
-app.include_router(chatagent_router, prefix="/aigent", tags=["aigent"])
\ No newline at end of file
+app.include_router(chatagent_router, prefix="/aigent", tags=["aigent"])
+app.include_router(circuit_router)
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once warm-up has finished, 503 with progress until then."""
+    progress = warmup.progress()
+    return FastJSONResponse(progress, status_code=200 if progress["ready"] else 503)
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Runtime stats from every registered component (pools, queues, caches)."""
+    return metrics.snapshot()
@@ -0,0 +1,270 @@
+import os
+import sys
+import threading
+import weakref
+from collections import Counter
+from types import MappingProxyType
+from typing import Any, Dict, Optional, Tuple
+
+from . import metrics
+from .log_service import get_logger
+from .serialization import DecodeError, read_file
+from .snapshot import cache_snapshot
+
+logger = get_logger(__name__)
+
+
+def _freeze(value: Any) -> Any:
+    """Interned, immutable copy of a JSON value: lists become tuples, dicts read-only mappings."""
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return MappingProxyType({sys.intern(str(key)): _freeze(item) for key, item in value.items()})
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    """Plain JSON copy of a frozen value."""
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    if isinstance(value, MappingProxyType):
+        return {key: _thaw(item) for key, item in value.items()}
+    return value
+
+
+def _hashable(value: Any) -> Any:
+    if isinstance(value, MappingProxyType):
+        return tuple((key, _hashable(item)) for key, item in value.items())
+    if isinstance(value, tuple):
+        return tuple(_hashable(item) for item in value)
+    return value
+
+
+class AgentConfig:
+    """
+    Immutable, interned agent config record.
+
+    Strings are interned and sequences frozen into tuples, so identical
+    personalities, instructions, concepts and tool lists are stored once no
+    matter how many agents use them; agents whose configs are entirely equal
+    share a single record. Supports the read-only dict access used by the
+    routes (`config["Tools"]`, `config.get("Templates")`).
+    """
+
+    __slots__ = ("personality", "instructions", "concepts", "tools", "templates", "__weakref__")
+
+    FIELDS = {"Personality": "personality", "Instructions": "instructions", "Concepts": "concepts",
+              "Tools": "tools", "Templates": "templates"}
+
+    _registry: "weakref.WeakValueDictionary[tuple, AgentConfig]" = weakref.WeakValueDictionary()
+    _registry_lock = threading.Lock()
+
+    def __init__(self, personality: str, instructions: Any, concepts: tuple, tools: tuple,
+                 templates: Optional[MappingProxyType]):
+        object.__setattr__(self, "personality", personality)
+        object.__setattr__(self, "instructions", instructions)
+        object.__setattr__(self, "concepts", concepts)
+        object.__setattr__(self, "tools", tools)
+        object.__setattr__(self, "templates", templates)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("AgentConfig is immutable")
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "AgentConfig":
+        """Canonical record for `data`; equal configs return the same instance."""
+        fields = (
+            _freeze(data.get("Personality", "")),
+            _freeze(data.get("Instructions", "")),
+            _freeze(data.get("Concepts") or ()),
+            _freeze(data.get("Tools") or ()),
+            _freeze(data["Templates"]) if data.get("Templates") else None,
+        )
+        key = _hashable(fields)
+        with cls._registry_lock:
+            record = cls._registry.get(key)
+            if record is None:
+                record = cls._registry[key] = cls(*fields)
+        return record
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            value = getattr(self, self.FIELDS[key])
+        except KeyError:
+            raise KeyError(key) from None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self) -> dict:
+        return {key: self[key] for key in self.FIELDS if self.get(key) is not None}
+
+    def to_json(self) -> dict:
+        """Like to_dict, with plain lists and dicts instead of the frozen types."""
+        return {key: _thaw(value) for key, value in self.to_dict().items()}
+
+    def _objects(self):
+        yield self
+        for name in self.__slots__[:-1]:
+            value = getattr(self, name)
+            yield value
+            if isinstance(value, tuple):
+                yield from value
+            elif isinstance(value, MappingProxyType):
+                for key, item in value.items():
+                    yield key
+                    yield item
+
+
+def footprint(configs: Dict[str, AgentConfig]) -> dict:
+    """
+    Memory footprint of cached configs.
+
+    `deep_bytes` is what an agent's config would cost on its own;
+    `amortized_bytes` splits every shared object (interned strings, shared
+    records) evenly between the agents referencing it, so it sums to the real
+    total.
+    """
+    uses = Counter()
+    for config in configs.values():
+        uses.update({id(obj) for obj in config._objects()})
+    agents = {}
+    for address, config in configs.items():
+        seen = {}
+        for obj in config._objects():
+            seen.setdefault(id(obj), obj)
+        deep = sum(sys.getsizeof(obj) for obj in seen.values())
+        amortized = sum(sys.getsizeof(obj) / uses[key] for key, obj in seen.items())
+        agents[address] = {"deep_bytes": deep, "amortized_bytes": round(amortized)}
+    deep_total = sum(agent["deep_bytes"] for agent in agents.values())
+    amortized_total = sum(agent["amortized_bytes"] for agent in agents.values())
+    return {
+        "agents": len(agents),
+        "distinct_records": len({id(config) for config in configs.values()}),
+        "deep_bytes": deep_total,
+        "amortized_bytes": amortized_total,
+        "sharing_ratio": round(deep_total / amortized_total, 2) if amortized_total else 0.0,
+        "per_agent": agents,
+    }
+
+
+class AgentConfigCache:
+    """
+    In-memory cache of the per-agent configs stored as DB/{address}.json.
+
+    Configs are held as interned AgentConfig records.
+
+    Entries are validated with a single stat() against the file's mtime, so a
+    config edited on disk is picked up on the next access without re-reading
+    unchanged files. The same check validates entries restored from a cache
+    snapshot.
+    """
+
+    def __init__(self, directory: str = "DB"):
+        self.directory = directory
+        self._entries: Dict[str, Tuple[float, AgentConfig]] = {}
+        self._lock = threading.Lock()
+        self.version = 0
+
+    def _path(self, address: str) -> str:
+        return os.path.join(self.directory, f"{address}.json")
+
+    def get(self, address: str) -> Optional[AgentConfig]:
+        """Return the config for `address`, or None if it does not exist or cannot be parsed."""
+        path = self._path(address)
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            with self._lock:
+                if self._entries.pop(address, None) is not None:
+                    self.version += 1
+            return None
+        entry = self._entries.get(address)
+        if entry is not None and entry[0] == mtime:
+            return entry[1]
+        try:
+            data = AgentConfig.from_dict(read_file(path))
+        except (OSError, DecodeError, AttributeError) as e:
+            logger.error("agent_config_unreadable", path=path, error=str(e))
+            return None
+        self._store(address, mtime, data)
+        return data
+
+    def _store(self, address: str, mtime: float, data: AgentConfig):
+        # Records are interned, so an unchanged config re-read after a touch is the
+        # same object and leaves the version (and the listing ETags) alone.
+        with self._lock:
+            previous = self._entries.get(address)
+            self._entries[address] = (mtime, data)
+            if previous is None or previous[1] is not data:
+                self.version += 1
+
+    def put(self, address: str, data: dict):
+        """Record a config that was just written to disk."""
+        data = AgentConfig.from_dict(data)
+        try:
+            mtime = os.stat(self._path(address)).st_mtime
+        except FileNotFoundError:
+            return
+        self._store(address, mtime, data)
+
+    def preload(self) -> int:
+        """Parse every config in the directory. Returns the number loaded."""
+        if not os.path.isdir(self.directory):
+            return 0
+        loaded = 0
+        present = set()
+        for filename in os.listdir(self.directory):
+            if filename.endswith('.json'):
+                present.add(filename[:-5])
+                if self.get(filename[:-5]) is not None:
+                    loaded += 1
+        # Restored entries whose file has since been removed.
+        with self._lock:
+            for address in set(self._entries) - present:
+                del self._entries[address]
+                self.version += 1
+        return loaded
+
+    def dump(self) -> dict:
+        """Snapshot state: address -> [mtime, config]."""
+        return {address: [mtime, config.to_json()] for address, (mtime, config) in list(self._entries.items())}
+
+    def restore(self, entries: dict) -> int:
+        """Seed the cache from dump(); each entry is re-validated by mtime on its next get()."""
+        with self._lock:
+            for address, (mtime, data) in entries.items():
+                self._entries.setdefault(address, (mtime, AgentConfig.from_dict(data)))
+            self.version += 1
+        return len(entries)
+
+    def items(self) -> Dict[str, AgentConfig]:
+        """All cached configs keyed by wallet address."""
+        return {address: entry[1] for address, entry in list(self._entries.items())}
+
+
+    def footprint(self) -> dict:
+        """Per-agent and total memory footprint of the cached configs."""
+        return footprint(self.items())
+
+    def stats(self) -> dict:
+        # Scraped often, so counts only; byte sizes are on /aigent/agent-footprint.
+        configs = [entry[1] for entry in list(self._entries.values())]
+        return {
+            "agents": len(configs),
+            "distinct_records": len({id(config) for config in configs}),
+            "version": self.version,
+        }
+
+
+agent_configs = AgentConfigCache()
+metrics.register("agent_configs", agent_configs.stats)
+cache_snapshot.register("agent_configs", 1, agent_configs.dump, agent_configs.restore)
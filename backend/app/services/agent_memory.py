@@ -0,0 +1,168 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .search_index import tokenize
+
+EMBEDDING_DIM = int(os.getenv("MEMORY_EMBEDDING_DIM", "256"))
+MAX_WALLETS = int(os.getenv("MEMORY_MAX_WALLETS", "1000"))
+
+
+class HashingEmbedder:
+    """
+    Local, dependency-free stand-in for a sentence embedding model.
+
+    Unigrams and bigrams are hashed into a fixed number of signed buckets with
+    sublinear term weighting and L2-normalised, so cosine similarity is a dot
+    product. It captures lexical overlap only, but runs offline and in
+    microseconds; swap in a real model by providing the same `embed()` method.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+
+    def _features(self, text: str) -> Iterable[str]:
+        tokens = tokenize(text)
+        yield from tokens
+        for first, second in zip(tokens, tokens[1:]):
+            yield f"{first} {second}"
+
+    def embed(self, text: str) -> np.ndarray:
+        counts = {}
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            sign = 1.0 if digest[4] & 1 else -1.0
+            counts[bucket] = counts.get(bucket, 0.0) + sign
+        vector = np.zeros(self.dim, dtype=np.float32)
+        if counts:
+            buckets = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+            values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+            vector[buckets] = np.sign(values) * np.log1p(np.abs(values))
+            norm = np.linalg.norm(vector)
+            if norm:
+                vector /= norm
+        return vector
+
+
+class WalletMemory:
+    """Embeddings of one wallet's turns as rows of a preallocated float32 matrix."""
+
+    def __init__(self, dim: int, max_rows: int, capacity: int = 16):
+        self.max_rows = max_rows
+        self.vectors = np.zeros((min(capacity, max_rows), dim), dtype=np.float32)
+        self.turn_ids = np.zeros(len(self.vectors), dtype=np.int64)
+        self.size = 0
+
+    def add(self, turn_id: int, vector: np.ndarray):
+        if self.size and self.turn_ids[self.size - 1] >= turn_id:
+            return
+        if self.size == len(self.vectors):
+            if self.size < self.max_rows:
+                capacity = min(self.size * 2, self.max_rows)
+                self.vectors = np.resize(self.vectors, (capacity, self.vectors.shape[1]))
+                self.turn_ids = np.resize(self.turn_ids, capacity)
+            else:
+                # Full: drop the oldest row, mirroring the conversation store's cap.
+                self.vectors[:-1] = self.vectors[1:]
+                self.turn_ids[:-1] = self.turn_ids[1:]
+                self.size -= 1
+        self.vectors[self.size] = vector
+        self.turn_ids[self.size] = turn_id
+        self.size += 1
+
+    def top_k(self, query: np.ndarray, k: int, min_score: float,
+              exclude_after: Optional[int] = None) -> List[Tuple[int, float]]:
+        if not self.size:
+            return []
+        scores = self.vectors[:self.size] @ query
+        if exclude_after is not None:
+            scores[self.turn_ids[:self.size] > exclude_after] = -np.inf
+        k = min(k, self.size)
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        candidates = candidates[np.argsort(-scores[candidates])]
+        return [(int(self.turn_ids[i]), float(scores[i])) for i in candidates if scores[i] >= min_score]
+
+
+class AgentMemory:
+    """
+    Long-term memory for agents: per-wallet embedding matrices of past turns.
+
+    A wallet's matrix is built from its stored turns on first use and kept up
+    to date by `remember()`. Recall is one matrix-vector product plus a partial
+    sort. Only the most recently used wallets stay resident.
+    """
+
+    def __init__(self, load_turns: Callable[[str], list], embedder: Optional[HashingEmbedder] = None,
+                 max_rows: int = 1000, max_wallets: int = MAX_WALLETS):
+        self.embedder = embedder or HashingEmbedder()
+        self.load_turns = load_turns
+        self.max_rows = max_rows
+        self.max_wallets = max_wallets
+        self._wallets: "OrderedDict[str, WalletMemory]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.recalls = 0
+        self.recalled = 0
+
+    @staticmethod
+    def turn_text(turn: dict) -> str:
+        return f"{turn.get('question') or ''} {turn.get('answer') or turn.get('raw') or ''}"
+
+    def _memory(self, wallet_id: str) -> WalletMemory:
+        with self._lock:
+            memory = self._wallets.get(wallet_id)
+            if memory is not None:
+                self._wallets.move_to_end(wallet_id)
+                return memory
+        memory = WalletMemory(self.embedder.dim, self.max_rows)
+        for turn in self.load_turns(wallet_id):
+            memory.add(turn["id"], self.embedder.embed(self.turn_text(turn)))
+        with self._lock:
+            # Another thread may have built it meanwhile; keep the first one.
+            resident = self._wallets.setdefault(wallet_id, memory)
+            self._wallets.move_to_end(wallet_id)
+            while len(self._wallets) > self.max_wallets:
+                self._wallets.popitem(last=False)
+        if resident is memory:
+            # Turns stored while the matrix was being built were not seen by remember().
+            last_id = int(memory.turn_ids[memory.size - 1]) if memory.size else 0
+            for turn in self.load_turns(wallet_id):
+                if turn["id"] > last_id:
+                    self.remember(wallet_id, turn)
+        return resident
+
+    def remember(self, wallet_id: str, turn: dict):
+        """Add a newly stored turn, if the wallet's memory is resident."""
+        with self._lock:
+            memory = self._wallets.get(wallet_id)
+        if memory is not None:
+            vector = self.embedder.embed(self.turn_text(turn))
+            with self._lock:
+                memory.add(turn["id"], vector)
+
+    def recall(self, wallet_id: str, text: str, k: int = 3, min_score: float = 0.15,
+               exclude_after: Optional[int] = None) -> List[Tuple[int, float]]:
+        """(turn ID, similarity) of the `k` past turns most similar to `text`, best first."""
+        memory = self._memory(wallet_id)
+        query = self.embedder.embed(text)
+        with self._lock:
+            hits = memory.top_k(query, k, min_score, exclude_after)
+        self.recalls += 1
+        self.recalled += len(hits)
+        return hits
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = sum(memory.size for memory in self._wallets.values())
+            nbytes = sum(memory.vectors.nbytes for memory in self._wallets.values())
+        return {
+            "resident_wallets": len(self._wallets),
+            "rows": rows,
+            "matrix_bytes": nbytes,
+            "recalls": self.recalls,
+            "avg_recalled": round(self.recalled / self.recalls, 2) if self.recalls else 0.0,
+        }
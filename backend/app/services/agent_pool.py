@@ -0,0 +1,65 @@
+import queue
+from contextlib import contextmanager
+from typing import Callable, Generic, Optional, TypeVar
+
+from .log_service import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+
+class AgentPool(Generic[T]):
+    """
+    Bounded pool of pre-built, reusable objects such as phi agent bundles.
+
+    acquire() hands out an idle instance, or builds one when the pool is empty,
+    and returns it to the pool afterwards after calling `reset` on it. fill()
+    pre-builds instances so the first requests after startup skip construction.
+    """
+
+    def __init__(self, factory: Callable[[], T], size: int = 4,
+                 reset: Optional[Callable[[T], None]] = None, name: str = "pool"):
+        self.factory = factory
+        self.size = size
+        self.reset = reset
+        self.name = name
+        self._idle: "queue.LifoQueue[T]" = queue.LifoQueue(maxsize=size)
+        self.created = 0
+
+    def _build(self) -> T:
+        instance = self.factory()
+        self.created += 1
+        return instance
+
+    def fill(self) -> int:
+        """Build instances until the pool is full. Returns the number of idle instances."""
+        while not self._idle.full():
+            try:
+                self._idle.put_nowait(self._build())
+            except queue.Full:
+                break
+        logger.info("agent_pool_filled", pool=self.name, idle=self._idle.qsize())
+        return self._idle.qsize()
+
+    @contextmanager
+    def acquire(self):
+        try:
+            instance = self._idle.get_nowait()
+        except queue.Empty:
+            instance = self._build()
+        try:
+            yield instance
+        finally:
+            try:
+                if self.reset is not None:
+                    self.reset(instance)
+                self._idle.put_nowait(instance)
+            except queue.Full:
+                pass
+            except Exception as e:
+                # A failed reset means the instance may carry state; drop it.
+                logger.warning("agent_pool_reset_failed", pool=self.name, error=str(e))
+
+    def stats(self) -> dict:
+        return {"idle": self._idle.qsize(), "size": self.size, "created": self.created}
@@ -0,0 +1,52 @@
+import os
+import threading
+
+from cdp import Cdp
+
+from . import metrics
+from .log_service import get_logger
+from .single_flight import SingleFlight
+
+logger = get_logger(__name__)
+
+_configure_lock = threading.Lock()
+cdp_configured = False
+
+# Many clients loading the same agent ask for the same wallet balance at once.
+balance_lookups = SingleFlight("wallet_balance")
+metrics.register("balance_coalescing", balance_lookups.stats)
+
+
+def configure_cdp():
+    try:
+        API_KEY_NAME = os.environ.get("CDP_API_KEY_NAME")
+        PRIVATE_KEY = os.environ.get("CDP_PRIVATE_KEY", "")
+        
+        if not API_KEY_NAME or not PRIVATE_KEY:
+            raise ValueError("CDP credentials not found in environment variables")
+            
+        # Clean up private key - remove any extra quotes and properly handle newlines
+        PRIVATE_KEY = PRIVATE_KEY.strip('"').replace('\\n', '\n')
+        
+        logger.info("cdp_configuring", api_key_name=API_KEY_NAME, private_key_length=len(PRIVATE_KEY))
+        
+        Cdp.configure(API_KEY_NAME, PRIVATE_KEY)
+        return True
+    except Exception as e:
+        logger.error("cdp_configure_failed", error=str(e))
+        return False
+
+
+def ensure_cdp_configured() -> bool:
+    """Configure the CDP SDK once per process. Normally done by the startup warm-up."""
+    global cdp_configured
+    if not cdp_configured:
+        with _configure_lock:
+            if not cdp_configured:
+                cdp_configured = configure_cdp()
+    return cdp_configured
+
+
+def fetch_balance(wallet, asset_id: str):
+    """Wallet balance lookup shared by concurrent callers asking for the same wallet and asset."""
+    return balance_lookups.do((wallet.id, asset_id.lower()), wallet.balance, asset_id)
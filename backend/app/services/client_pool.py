@@ -0,0 +1,184 @@
+import os
+import threading
+from typing import Any, Callable, Dict
+
+import google.generativeai as genai
+import requests
+from cdp import Cdp
+from phi.model.google import Gemini
+from requests.adapters import HTTPAdapter
+
+from . import metrics
+from .cdp_service import ensure_cdp_configured
+from .log_service import get_logger
+
+logger = get_logger(__name__)
+
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "16"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "32"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+GEMINI_MODEL = "gemini-2.0-flash-exp"
+
+
+class ClientRegistry:
+    """
+    Process-wide registry of long-lived outbound clients.
+
+    Each client is built once by its factory on first use and shared by every
+    agent afterwards. The registry counts builds and reuses per client so the
+    reuse rate can be checked on /metrics.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._clients: Dict[str, Any] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        self._factories[name] = factory
+        self._counts.setdefault(name, {"created": 0, "reused": 0})
+
+    def get(self, name: str) -> Any:
+        client = self._clients.get(name)
+        if client is not None:
+            self._counts[name]["reused"] += 1
+            return client
+        with self._lock:
+            client = self._clients.get(name)
+            if client is None:
+                client = self._factories[name]()
+                self._clients[name] = client
+                self._counts[name]["created"] += 1
+                logger.info("client_created", client=name)
+            else:
+                self._counts[name]["reused"] += 1
+        return client
+
+    def stats(self) -> dict:
+        result = {name: dict(counts) for name, counts in self._counts.items()}
+        session = self._clients.get("http")
+        if session is not None:
+            result["http"]["connections"] = _connection_stats(session)
+        return result
+
+
+def _connection_stats(session: requests.Session) -> dict:
+    """Aggregate urllib3 pool counters: requests sent vs. new connections opened."""
+    totals = {"requests": 0, "new_connections": 0, "hosts": 0}
+    for adapter in session.adapters.values():
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            totals["requests"] += pool.num_requests
+            totals["new_connections"] += pool.num_connections
+            totals["hosts"] += 1
+    if totals["requests"]:
+        totals["reuse_ratio"] = round(1 - totals["new_connections"] / totals["requests"], 3)
+    return totals
+
+
+def _build_http_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE,
+                          max_retries=HTTP_MAX_RETRIES)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class _SessionBoundRequests:
+    """Stand-in for the `requests` module whose get/post go through the pooled session."""
+
+    def __init__(self, session: requests.Session):
+        self._session = session
+
+    def get(self, *args, **kwargs):
+        return self._session.get(*args, **kwargs)
+
+    def post(self, *args, **kwargs):
+        return self._session.post(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+
+def _build_exa_tools():
+    import exa_py.api
+    from phi.tools.exa import ExaTools
+
+    # phi builds a new Exa client per search and exa_py calls requests.get/post
+    # directly, which opens a fresh connection every time. Route those calls
+    # through the shared keep-alive session instead.
+    if isinstance(getattr(exa_py.api, "requests", None), type(requests)):
+        exa_py.api.requests = _SessionBoundRequests(clients.get("http"))
+    return ExaTools(api_key=os.getenv("EXA_API_KEY"))
+
+
+_genai_lock = threading.Lock()
+_genai_api_key = None
+
+
+def configure_genai(api_key: str):
+    """
+    Configure google-generativeai once per API key.
+
+    genai.configure() discards every cached service client, so calling it per
+    request (as phi's Gemini does) throws away the open gRPC channel each time.
+    """
+    global _genai_api_key
+    if _genai_api_key == api_key:
+        return
+    with _genai_lock:
+        if _genai_api_key != api_key:
+            genai.configure(api_key=api_key)
+            _genai_api_key = api_key
+
+
+def _build_gemini_transport():
+    configure_genai(os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY"))
+    return genai
+
+
+def warm_gemini():
+    """Make one cheap call so the shared Gemini channel is open before user traffic."""
+    clients.get("gemini").get_model(f"models/{GEMINI_MODEL}")
+
+
+def _build_cdp():
+    if not ensure_cdp_configured():
+        raise ValueError("CDP configuration failed. Check your credentials.")
+    return Cdp
+
+
+class PooledGemini(Gemini):
+    """Gemini model that reuses the shared google-generativeai transport instead of reconfiguring it."""
+
+    def get_client(self):
+        if self.client:
+            return self.client
+        clients.get("gemini")
+        # No-op unless this model was given a different key than the shared transport.
+        configure_genai(self.api_key or os.getenv("GOOGLE_API_KEY"))
+        return genai.GenerativeModel(model_name=self.id, **self.request_kwargs)
+
+
+def gemini_model(**kwargs) -> PooledGemini:
+    """
+    Build a phi Gemini model bound to the shared transport.
+
+    Model objects carry per-agent tool state, so each agent still gets its own;
+    only the underlying connection is shared.
+    """
+    kwargs.setdefault("model", GEMINI_MODEL)
+    kwargs.setdefault("api_key", os.getenv("GEMINI_API_KEY"))
+    return PooledGemini(**kwargs)
+
+
+clients = ClientRegistry()
+clients.register("http", _build_http_session)
+clients.register("gemini", _build_gemini_transport)
+clients.register("exa", _build_exa_tools)
+# The CDP SDK keeps a single urllib3 pool per process once configured.
+clients.register("cdp", _build_cdp)
+metrics.register("clients", clients.stats)
@@ -0,0 +1,313 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from web3 import Web3
+
+from . import metrics
+from .log_service import get_logger
+
+logger = get_logger(__name__)
+
+INDEX_DB_PATH = os.getenv("EVENT_INDEX_DB", os.path.join("DB", "events.sqlite3"))
+
+
+def _event(name: str, *inputs: Tuple[str, str, bool]) -> dict:
+    return {
+        "anonymous": False,
+        "name": name,
+        "type": "event",
+        "inputs": [{"name": arg, "type": kind, "indexed": indexed} for arg, kind, indexed in inputs],
+    }
+
+
+# Events of Web3Bridge and EnhancedNFT in contracts/super_Agent.sol.
+EVENTS_ABI = [
+    _event("UserRegistered", ("user", "address", True), ("username", "string", False)),
+    _event("ContentUploaded", ("contentId", "uint256", True), ("ipfsHash", "string", False),
+           ("creator", "address", False)),
+    _event("AccessGranted", ("contentId", "uint256", True), ("user", "address", True)),
+    _event("ReputationUpdated", ("user", "address", True), ("newReputation", "uint256", False)),
+    _event("MetadataUploaded", ("tokenId", "uint256", True), ("ipfsHash", "string", False)),
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    contract TEXT NOT NULL, address TEXT NOT NULL, username TEXT, reputation INTEGER NOT NULL DEFAULT 0,
+    registered_block INTEGER, PRIMARY KEY (address, contract)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS contents (
+    contract TEXT NOT NULL, content_id INTEGER NOT NULL, ipfs_hash TEXT NOT NULL, creator TEXT NOT NULL,
+    block_number INTEGER NOT NULL, PRIMARY KEY (content_id, contract)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS contents_by_creator ON contents (creator, block_number);
+CREATE TABLE IF NOT EXISTS content_access (
+    contract TEXT NOT NULL, content_id INTEGER NOT NULL, user TEXT NOT NULL,
+    PRIMARY KEY (user, content_id, contract)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS nft_metadata (
+    contract TEXT NOT NULL, token_id INTEGER NOT NULL, ipfs_hash TEXT NOT NULL, block_number INTEGER NOT NULL,
+    PRIMARY KEY (token_id, contract)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sync_state (name TEXT PRIMARY KEY, block_number INTEGER NOT NULL);
+"""
+
+
+class EventStore:
+    """
+    SQLite tables materialised from contract events, keyed for the questions
+    agents ask: access by (user, content), content by creator, profile by
+    address, metadata by token. Every write is an upsert, so replaying a block
+    range after a crash leaves the same state; the sync cursor is committed in
+    the same transaction as the events it covers.
+    """
+
+    def __init__(self, path: str = INDEX_DB_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self.queries = 0
+
+    def _query(self, sql: str, params: tuple) -> List[tuple]:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        self.queries += 1
+        return rows
+
+    # -- writes (indexer thread) ----------------------------------------------------
+
+    def cursor(self, name: str) -> Optional[int]:
+        rows = self._query("SELECT block_number FROM sync_state WHERE name = ?", (name,))
+        return rows[0][0] if rows else None
+
+    def apply(self, name: str, events: Iterable[dict], to_block: int):
+        """Apply decoded events (web3 EventData) in log order and advance cursor `name` to `to_block`."""
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN")
+            try:
+                for event in events:
+                    self._apply_one(conn, event)
+                conn.execute("INSERT OR REPLACE INTO sync_state (name, block_number) VALUES (?, ?)",
+                             (name, to_block))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _apply_one(conn: sqlite3.Connection, event: dict):
+        args = event["args"]
+        contract = event["address"].lower()
+        block = event["blockNumber"]
+        kind = event["event"]
+        if kind == "UserRegistered":
+            conn.execute(
+                "INSERT INTO users (contract, address, username, registered_block) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (address, contract) DO UPDATE SET username = excluded.username, "
+                "registered_block = excluded.registered_block",
+                (contract, args["user"].lower(), args["username"], block))
+        elif kind == "ReputationUpdated":
+            # The event carries the new total, so replays are idempotent.
+            conn.execute(
+                "INSERT INTO users (contract, address, reputation) VALUES (?, ?, ?) "
+                "ON CONFLICT (address, contract) DO UPDATE SET reputation = excluded.reputation",
+                (contract, args["user"].lower(), args["newReputation"]))
+        elif kind == "ContentUploaded":
+            creator = args["creator"].lower()
+            conn.execute("INSERT OR REPLACE INTO contents VALUES (?, ?, ?, ?, ?)",
+                         (contract, args["contentId"], args["ipfsHash"], creator, block))
+            # uploadContent grants the creator access without an AccessGranted event.
+            conn.execute("INSERT OR IGNORE INTO content_access VALUES (?, ?, ?)",
+                         (contract, args["contentId"], creator))
+        elif kind == "AccessGranted":
+            conn.execute("INSERT OR IGNORE INTO content_access VALUES (?, ?, ?)",
+                         (contract, args["contentId"], args["user"].lower()))
+        elif kind == "MetadataUploaded":
+            conn.execute("INSERT OR REPLACE INTO nft_metadata VALUES (?, ?, ?, ?)",
+                         (contract, args["tokenId"], args["ipfsHash"], block))
+
+    # -- reads (agent tools) --------------------------------------------------------
+
+    def has_access(self, content_id: int, user: str, contract: Optional[str] = None) -> bool:
+        sql = "SELECT 1 FROM content_access WHERE user = ? AND content_id = ?"
+        params = (user.lower(), int(content_id))
+        if contract:
+            sql += " AND contract = ?"
+            params += (contract.lower(),)
+        return bool(self._query(sql + " LIMIT 1", params))
+
+    def contents_by_creator(self, creator: str, limit: int = 50) -> List[dict]:
+        rows = self._query(
+            "SELECT contract, content_id, ipfs_hash, block_number FROM contents WHERE creator = ? "
+            "ORDER BY block_number DESC LIMIT ?", (creator.lower(), limit))
+        return [{"contract": contract, "content_id": content_id, "ipfs_hash": ipfs_hash, "block": block}
+                for contract, content_id, ipfs_hash, block in rows]
+
+    def user_profile(self, address: str) -> Optional[dict]:
+        rows = self._query(
+            "SELECT contract, username, reputation, registered_block FROM users WHERE address = ?",
+            (address.lower(),))
+        if not rows:
+            return None
+        contract, username, reputation, block = rows[0]
+        return {"contract": contract, "username": username, "reputation": reputation,
+                "registered_block": block}
+
+    def nft_metadata(self, token_id: int, contract: Optional[str] = None) -> Optional[str]:
+        sql = "SELECT ipfs_hash FROM nft_metadata WHERE token_id = ?"
+        params = (int(token_id),)
+        if contract:
+            sql += " AND contract = ?"
+            params += (contract.lower(),)
+        rows = self._query(sql + " LIMIT 1", params)
+        return rows[0][0] if rows else None
+
+    def stats(self) -> dict:
+        counts = {}
+        for table in ("users", "contents", "content_access", "nft_metadata"):
+            counts[table] = self._query(f"SELECT COUNT(*) FROM {table}", ())[0][0]
+        counts["queries"] = self.queries
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class EventIndexer:
+    """
+    Background poller that copies contract events into an EventStore.
+
+    Works with any web3.py provider, so it can be pointed at an eth-tester or
+    anvil chain in tests. Only blocks at least `confirmations` deep are
+    indexed, which keeps reorgs out of the store without rollback logic. Logs
+    are fetched in block ranges of `batch_size`, halved whenever the node
+    rejects a range as too large.
+    """
+
+    def __init__(self, w3: Web3, store: EventStore, addresses: List[str], start_block: int = 0,
+                 confirmations: int = 2, batch_size: int = 2000, poll_interval: float = 5.0,
+                 name: str = "super_agent"):
+        self.w3 = w3
+        self.store = store
+        self.addresses = [Web3.to_checksum_address(address) for address in addresses]
+        self.start_block = start_block
+        self.confirmations = confirmations
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.name = name
+        events = w3.eth.contract(abi=EVENTS_ABI).events
+        self._decoders: Dict[bytes, object] = {}
+        for abi in EVENTS_ABI:
+            signature = f"{abi['name']}({','.join(arg['type'] for arg in abi['inputs'])})"
+            self._decoders[bytes(Web3.keccak(text=signature))] = events[abi["name"]]()
+        self._topics = [[Web3.to_hex(topic) for topic in self._decoders]]
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.indexed_events = 0
+        self.last_synced_at = 0.0
+        self.errors = 0
+
+    def decode(self, log: dict) -> Optional[dict]:
+        decoder = self._decoders.get(bytes(log["topics"][0])) if log["topics"] else None
+        return decoder.process_log(log) if decoder is not None else None
+
+    def sync_once(self) -> int:
+        """Index every confirmed block not yet indexed. Returns the number of events applied."""
+        head = self.w3.eth.block_number - self.confirmations
+        indexed = self.store.cursor(self.name)
+        from_block = self.start_block if indexed is None else indexed + 1
+        applied = 0
+        while from_block <= head:
+            to_block = min(from_block + self.batch_size - 1, head)
+            try:
+                logs = self.w3.eth.get_logs({"fromBlock": from_block, "toBlock": to_block,
+                                             "address": self.addresses, "topics": self._topics})
+            except Exception as e:
+                if self.batch_size > 1 and to_block > from_block:
+                    self.batch_size = max(1, self.batch_size // 2)
+                    logger.warning("event_range_rejected", from_block=from_block, to_block=to_block,
+                                   batch_size=self.batch_size, error=str(e))
+                    continue
+                raise
+            events = [event for event in map(self.decode, logs) if event is not None]
+            self.store.apply(self.name, events, to_block)
+            applied += len(events)
+            from_block = to_block + 1
+        self.indexed_events += applied
+        self.last_synced_at = time.time()
+        return applied
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                applied = self.sync_once()
+                if applied:
+                    logger.info("events_indexed", count=applied, block=self.store.cursor(self.name))
+            except Exception as e:
+                self.errors += 1
+                logger.error("event_index_failed", error=str(e))
+            self._stop.wait(self.poll_interval)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="event-indexer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 1)
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "indexed_block": self.store.cursor(self.name),
+            "indexed_events": self.indexed_events,
+            "batch_size": self.batch_size,
+            "last_synced_at": self.last_synced_at,
+            "errors": self.errors,
+            **self.store.stats(),
+        }
+
+
+event_store = EventStore()
+event_indexer: Optional[EventIndexer] = None
+
+
+def start_event_indexer() -> bool:
+    """
+    Start indexing if EVENT_INDEXER_RPC_URL and EVENT_INDEXER_ADDRESSES are set.
+    Without them the store stays as it is and the agent tools answer from it.
+    """
+    global event_indexer
+    rpc_url = os.getenv("EVENT_INDEXER_RPC_URL")
+    addresses = [address.strip() for address in os.getenv("EVENT_INDEXER_ADDRESSES", "").split(",")
+                 if address.strip()]
+    if not rpc_url or not addresses or event_indexer is not None:
+        return event_indexer is not None
+    event_indexer = EventIndexer(
+        Web3(Web3.HTTPProvider(rpc_url)),
+        event_store,
+        addresses,
+        start_block=int(os.getenv("EVENT_INDEXER_START_BLOCK", "0")),
+        confirmations=int(os.getenv("EVENT_INDEXER_CONFIRMATIONS", "2")),
+        poll_interval=float(os.getenv("EVENT_INDEXER_POLL_SECONDS", "5")),
+    )
+    event_indexer.start()
+    metrics.register("event_indexer", event_indexer.stats)
+    logger.info("event_indexer_started", addresses=addresses, start_block=event_indexer.start_block)
+    return True
+
+
+def stop_event_indexer():
+    if event_indexer is not None:
+        event_indexer.stop()
@@ -1,13 +1,61 @@
+import hashlib
+import os
+import threading
+import time
 from pathlib import Path
-from typing import Optional, Dict
-import json
+from typing import Optional, Dict, List, Tuple
+
+from . import metrics
+from .log_service import get_logger
+from .serialization import loads
+
+try:
+    from watchfiles import watch
+except ImportError:
+    watch = None
+
+logger = get_logger(__name__)
+
+# Without change notifications, the catalog re-stats the circuit directories at most this often.
+CATALOG_TTL = float(os.getenv("CIRCUIT_CATALOG_TTL", "2"))
+
+
+def _stat_key(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
 
 class CircuitFileService:
+    """
+    Catalog of compiled circom circuits under `base_path` (one directory per
+    circuit with its .wasm, .zkey and verification key).
+
+    The catalog is built once and kept until the tree changes: with
+    `watchfiles` installed a watcher thread invalidates it on any change,
+    otherwise it is revalidated by comparing directory mtimes, at most every
+    CATALOG_TTL seconds. Parsed verification keys and artifact content hashes
+    (used as strong ETags) are cached per file size and mtime, so a rewritten
+    file is never served with stale data.
+    """
+
     def __init__(self, base_path: str):
         self.base_path = Path(base_path)
-        print(self.base_path)
-        print(self.base_path.exists())
-        
+        self._lock = threading.Lock()
+        self._catalog: Optional[Dict[str, dict]] = None
+        self._signature: Optional[tuple] = None
+        self._checked_at = 0.0
+        self._vkeys: Dict[str, Tuple[Tuple[int, int], dict]] = {}
+        self._digests: Dict[Path, Tuple[Tuple[int, int], str]] = {}
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.builds = 0
+        self.vkey_parses = 0
+        self.hashes = 0
+        logger.info("circuit_service_initialized", base_path=str(self.base_path), exists=self.base_path.exists())
+
     def get_circuit_paths(self, circuit_name: str) -> Dict[str, Path]:
         """Get all paths related to a circuit"""
         circuit_dir = self.base_path / circuit_name
@@ -19,25 +67,132 @@ class CircuitFileService:
 
     def verify_circuit_files(self, circuit_name: str) -> bool:
         """Verify all required files exist for a circuit"""
-        paths = self.get_circuit_paths(circuit_name)
-        return all(path.exists() for path in paths.values())
+        return circuit_name in self.catalog()
+
+    # -- catalog ----------------------------------------------------------------------
+
+    def _directory_signature(self) -> tuple:
+        # Adding or removing a file changes its directory's mtime; in-place
+        # rewrites are caught by the per-file size/mtime keys instead.
+        try:
+            entries = sorted(os.scandir(self.base_path), key=lambda entry: entry.name)
+        except OSError:
+            return ()
+        signature = [_stat_key(self.base_path)]
+        for entry in entries:
+            if entry.is_dir():
+                js_dir = Path(entry.path) / f"{entry.name}_js"
+                signature.append((entry.name, entry.stat().st_mtime_ns, _stat_key(js_dir)))
+        return tuple(signature)
+
+    def _build(self) -> Dict[str, dict]:
+        catalog = {}
+        if self.base_path.is_dir():
+            for circuit_dir in sorted(self.base_path.iterdir()):
+                if not circuit_dir.is_dir():
+                    continue
+                paths = self.get_circuit_paths(circuit_dir.name)
+                sizes = {kind: _stat_key(path) for kind, path in paths.items()}
+                if all(sizes.values()):
+                    catalog[circuit_dir.name] = {
+                        "name": circuit_dir.name,
+                        "paths": {kind: str(path) for kind, path in paths.items()},
+                        "sizes": {kind: size for kind, (size, _) in sizes.items()},
+                    }
+        self.builds += 1
+        logger.info("circuit_catalog_built", circuits=len(catalog))
+        return catalog
+
+    def catalog(self) -> Dict[str, dict]:
+        """{circuit name: entry} for every circuit whose three files exist."""
+        now = time.monotonic()
+        catalog = self._catalog
+        if catalog is not None and (self._watcher is not None or now - self._checked_at < CATALOG_TTL):
+            return catalog
+        with self._lock:
+            if self._watcher is None:
+                signature = self._directory_signature()
+                if self._catalog is None or signature != self._signature:
+                    self._catalog = self._build()
+                    self._signature = signature
+            elif self._catalog is None:
+                self._catalog = self._build()
+            self._checked_at = now
+            return self._catalog
+
+    def invalidate(self):
+        with self._lock:
+            self._catalog = None
+
+    def list_available_circuits(self) -> List[dict]:
+        """List all available circuits with valid files"""
+        return [{"name": entry["name"], "paths": entry["paths"]} for entry in self.catalog().values()]
+
+    def watch(self) -> bool:
+        """Invalidate the catalog on filesystem change notifications, if `watchfiles` is installed."""
+        if watch is None or self._watcher is not None or not self.base_path.is_dir():
+            return False
+
+        def run():
+            for _ in watch(self.base_path, stop_event=self._stop):
+                self.invalidate()
+            self._watcher = None
+
+        self._watcher = threading.Thread(target=run, name="circuit-watcher", daemon=True)
+        self._watcher.start()
+        self.invalidate()
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    # -- files ------------------------------------------------------------------------
+
+    def artifact_path(self, circuit_name: str, kind: str) -> Optional[Path]:
+        entry = self.catalog().get(circuit_name)
+        if entry is None or kind not in entry["paths"]:
+            return None
+        return Path(entry["paths"][kind])
 
     def read_verification_key(self, circuit_name: str) -> Optional[dict]:
         """Read and parse verification key JSON"""
         vkey_path = self.get_circuit_paths(circuit_name)["vkey"]
-        if vkey_path.exists():
-            return json.loads(vkey_path.read_text())
-        return None
+        key = _stat_key(vkey_path)
+        if key is None:
+            return None
+        cached = self._vkeys.get(circuit_name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        vkey = loads(vkey_path.read_bytes())
+        self._vkeys[circuit_name] = (key, vkey)
+        self.vkey_parses += 1
+        return vkey
 
-    def list_available_circuits(self):
-        """List all available circuits with valid files"""
-        circuits = []
-        for circuit_dir in self.base_path.iterdir():
-            if circuit_dir.is_dir():
-                circuit_name = circuit_dir.name
-                if self.verify_circuit_files(circuit_name):
-                    circuits.append({
-                        "name": circuit_name,
-                        "paths": {k: str(v) for k, v in self.get_circuit_paths(circuit_name).items()}
-                    })
-        return circuits 
\ No newline at end of file
+    def strong_etag(self, path: Path) -> Optional[str]:
+        """Strong ETag from the file's content hash, computed once per size/mtime."""
+        key = _stat_key(path)
+        if key is None:
+            return None
+        cached = self._digests.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        with open(path, "rb") as f:
+            digest = hashlib.file_digest(f, "sha256").hexdigest()
+        etag = f'"{digest[:32]}"'
+        self._digests[path] = (key, etag)
+        self.hashes += 1
+        return etag
+
+    def stats(self) -> dict:
+        return {
+            "circuits": len(self._catalog or {}),
+            "catalog_builds": self.builds,
+            "watching": self._watcher is not None,
+            "cached_vkeys": len(self._vkeys),
+            "vkey_parses": self.vkey_parses,
+            "hashed_artifacts": self.hashes,
+        }
+
+
+circuit_files = CircuitFileService(os.getenv("CIRCUITS_DIR", "circuits"))
+metrics.register("circuits", circuit_files.stats)
@@ -0,0 +1,176 @@
+"""
+Groth16 verification over BN254 (snarkjs "bn128") with py_ecc.
+
+Kept free of app imports so process-pool workers can import it cheaply.
+"""
+import hashlib
+import secrets
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+from py_ecc.optimized_bn128 import (FQ, FQ2, FQ12, add, b, b2, curve_order, field_modulus, is_inf,
+                                    is_on_curve, multiply, neg)
+from py_ecc.optimized_bn128.optimized_pairing import cast_point_to_fq12, miller_loop, twist
+
+FINAL_EXPONENT = (field_modulus ** 12 - 1) // curve_order
+# Soundness error of a randomized batch is about 2^-RANDOM_BITS.
+RANDOM_BITS = 128
+
+
+class ProofFormatError(ValueError):
+    """Raised for proofs or keys that are malformed, off-curve or out of range."""
+
+
+def _fq(value) -> int:
+    number = int(value)
+    if not 0 <= number < field_modulus:
+        raise ProofFormatError("coordinate out of field range")
+    return number
+
+
+def parse_g1(point) -> tuple:
+    x, y = _fq(point[0]), _fq(point[1])
+    parsed = (FQ(x), FQ(y), FQ(1)) if (x, y) != (0, 0) else (FQ(1), FQ(1), FQ(0))
+    if not is_on_curve(parsed, b):
+        raise ProofFormatError("G1 point is not on the curve")
+    return parsed
+
+
+def parse_g2(point) -> tuple:
+    # snarkjs writes each Fp2 coordinate as [c0, c1].
+    x = FQ2([_fq(point[0][0]), _fq(point[0][1])])
+    y = FQ2([_fq(point[1][0]), _fq(point[1][1])])
+    parsed = (x, y, FQ2.one())
+    if not is_on_curve(parsed, b2):
+        raise ProofFormatError("G2 point is not on the curve")
+    # G2 has a cofactor, so on-curve points may lie outside the prime-order subgroup.
+    if not is_inf(multiply(parsed, curve_order)):
+        raise ProofFormatError("G2 point is not in the prime-order subgroup")
+    return parsed
+
+
+class PreparedKey:
+    """
+    A verification key with everything that doesn't depend on the proof
+    precomputed: parsed IC points, the twisted gamma and delta, and the
+    pairing e(alpha, beta) including its final exponentiation.
+    """
+
+    __slots__ = ("n_public", "ic", "gamma", "delta", "alpha_beta")
+
+    def __init__(self, vkey: dict):
+        if vkey.get("protocol", "groth16") != "groth16" or vkey.get("curve", "bn128") != "bn128":
+            raise ProofFormatError("only groth16 keys on bn128 are supported")
+        alpha = parse_g1(vkey["vk_alpha_1"])
+        beta = parse_g2(vkey["vk_beta_2"])
+        self.ic = [parse_g1(point) for point in vkey["IC"]]
+        self.n_public = len(self.ic) - 1
+        self.gamma = twist(parse_g2(vkey["vk_gamma_2"]))
+        self.delta = twist(parse_g2(vkey["vk_delta_2"]))
+        self.alpha_beta = miller_loop(twist(beta), cast_point_to_fq12(alpha), final_exponentiate=True)
+
+
+class Proof:
+    __slots__ = ("a", "b", "c", "public")
+
+    def __init__(self, proof: dict, public_signals: Sequence, n_public: int):
+        if len(public_signals) != n_public:
+            raise ProofFormatError(f"expected {n_public} public signals, got {len(public_signals)}")
+        self.public = [int(signal) for signal in public_signals]
+        if any(not 0 <= signal < curve_order for signal in self.public):
+            raise ProofFormatError("public signal out of range")
+        self.a = parse_g1(proof["pi_a"])
+        self.b = twist(parse_g2(proof["pi_b"]))
+        self.c = parse_g1(proof["pi_c"])
+
+
+def _sum(points) -> tuple:
+    total = None
+    for point in points:
+        total = point if total is None else add(total, point)
+    return total
+
+
+def batch_check(key: PreparedKey, proofs: Sequence[Proof]) -> bool:
+    """
+    True if every proof is valid, checked together.
+
+    Each proof's equation e(A, B) = e(alpha, beta) e(vk_x, gamma) e(C, delta) is
+    raised to a fresh random power r and the equations multiplied, giving
+
+        prod e(-r_i A_i, B_i) * e(alpha, beta)^sum(r) * e(sum r_i vk_x_i, gamma) * e(sum r_i C_i, delta) == 1
+
+    That is n + 2 Miller loops and a single final exponentiation for n proofs,
+    instead of 3n loops and n exponentiations. The vk_x terms are folded into
+    one multi-scalar sum over the IC points.
+    """
+    if not proofs:
+        return True
+    weights = [secrets.randbits(RANDOM_BITS) | 1 for _ in proofs]
+    ic_scalars = [sum(weights) % curve_order] + [
+        sum(weight * proof.public[i] for weight, proof in zip(weights, proofs)) % curve_order
+        for i in range(key.n_public)
+    ]
+    vk_x = _sum(multiply(point, scalar) for point, scalar in zip(key.ic, ic_scalars) if scalar)
+    c_sum = _sum(multiply(proof.c, weight) for proof, weight in zip(proofs, weights))
+
+    f = FQ12.one()
+    for proof, weight in zip(proofs, weights):
+        a = neg(multiply(proof.a, weight))
+        if not is_inf(a):
+            f = f * miller_loop(proof.b, cast_point_to_fq12(a), final_exponentiate=False)
+    for g2, g1 in ((key.gamma, vk_x), (key.delta, c_sum)):
+        if g1 is not None and not is_inf(g1):
+            f = f * miller_loop(g2, cast_point_to_fq12(g1), final_exponentiate=False)
+    return f ** FINAL_EXPONENT * key.alpha_beta ** ic_scalars[0] == FQ12.one()
+
+
+def verify_each(key: PreparedKey, proofs: Sequence[Proof]) -> List[bool]:
+    """Per-proof results. Batches that fail are split in half until the bad proofs are isolated."""
+    if batch_check(key, proofs):
+        return [True] * len(proofs)
+    if len(proofs) == 1:
+        return [False]
+    middle = len(proofs) // 2
+    return verify_each(key, proofs[:middle]) + verify_each(key, proofs[middle:])
+
+
+def key_fingerprint(vkey_bytes: bytes) -> str:
+    return hashlib.blake2b(vkey_bytes, digest_size=16).hexdigest()
+
+
+# Prepared keys per process, so each worker pays for e(alpha, beta) once per key.
+_prepared: "OrderedDict[str, PreparedKey]" = OrderedDict()
+MAX_PREPARED_KEYS = 32
+
+
+def prepared_key(fingerprint: str, vkey: dict) -> PreparedKey:
+    key = _prepared.get(fingerprint)
+    if key is None:
+        key = PreparedKey(vkey)
+        _prepared[fingerprint] = key
+        while len(_prepared) > MAX_PREPARED_KEYS:
+            _prepared.popitem(last=False)
+    else:
+        _prepared.move_to_end(fingerprint)
+    return key
+
+
+def verify_chunk(fingerprint: str, vkey: dict, items: Sequence[Tuple[dict, Sequence]]) -> List[Optional[str]]:
+    """
+    Verify (proof, public signals) pairs against `vkey`. Returns, per item, None
+    if valid or the reason it was rejected. Top-level so a process pool can run it.
+    """
+    key = prepared_key(fingerprint, vkey)
+    results: List[Optional[str]] = [None] * len(items)
+    parsed, positions = [], []
+    for position, (proof, public_signals) in enumerate(items):
+        try:
+            parsed.append(Proof(proof, public_signals, key.n_public))
+            positions.append(position)
+        except (ProofFormatError, KeyError, IndexError, TypeError, ValueError) as e:
+            results[position] = f"malformed proof: {e}"
+    for position, valid in zip(positions, verify_each(key, parsed)):
+        if not valid:
+            results[position] = "invalid proof"
+    return results
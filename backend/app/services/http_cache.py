@@ -0,0 +1,80 @@
+import hashlib
+import os
+import threading
+from typing import Optional
+
+from fastapi import Request, Response
+
+from . import metrics
+
+# Versions restart from zero with the process, so every tag also carries a boot ID.
+_BOOT_ID = os.urandom(8).hex()
+
+_lock = threading.Lock()
+_counts = {"not_modified": 0, "full": 0}
+
+
+def version_etag(*parts) -> str:
+    """Weak ETag for a response that is fully determined by `parts` (store versions, keys)."""
+    digest = hashlib.blake2b(repr((_BOOT_ID,) + parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def file_etag(path: str, *parts) -> Optional[str]:
+    """Weak ETag from a file's size and mtime, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return version_etag(path, stat.st_size, stat.st_mtime_ns, *parts)
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/"x" and "x" name the same representation.
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """True if the client's If-None-Match already names `etag`."""
+    if_none_match = request.headers.get("if-none-match")
+    matched = bool(if_none_match) and _matches(if_none_match, etag)
+    with _lock:
+        _counts["not_modified" if matched else "full"] += 1
+    return matched
+
+
+def check_not_modified(request: Request, response: Response, etag: Optional[str]) -> Optional[Response]:
+    """
+    Conditional GET handling for a route.
+
+    Returns a bodiless 304 if the client's If-None-Match already names `etag`;
+    otherwise stamps `etag` on the route's response and returns None so the
+    route builds the payload as usual.
+    """
+    if etag is None:
+        return None
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+def stats() -> dict:
+    total = _counts["not_modified"] + _counts["full"]
+    return {
+        **_counts,
+        "not_modified_ratio": round(_counts["not_modified"] / total, 3) if total else 0.0,
+    }
+
+
+metrics.register("http_cache", stats)
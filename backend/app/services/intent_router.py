@@ -0,0 +1,131 @@
+import re
+import threading
+from typing import Dict, Optional
+
+from . import metrics
+from .cdp_service import fetch_balance
+from .log_service import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_TEMPLATES = {
+    "balance": "Current balance of {asset}: {balance}",
+    "address": "My wallet address is {address}",
+}
+
+KNOWN_ASSETS = ("eth", "usdc", "weth")
+
+# Anything that asks the agent to act, or to do more than one thing, goes to the model.
+_ACTION_WORDS = re.compile(
+    r"\b(send|transfer|swap|trade|mint|deploy|create|buy|sell|bridge|stake|faucet|pay|"
+    r"withdraw|deposit|why|explain|compare|history|if|and then|also)\b",
+    re.IGNORECASE,
+)
+_CONTRACT = re.compile(r"\b0x[a-fA-F0-9]{40}\b")
+_ASSET = re.compile(r"\b(" + "|".join(KNOWN_ASSETS) + r")\b", re.IGNORECASE)
+# Balance and address intents only match when the question is clearly about the
+# agent's (or the user's) wallet; "balance my diet" or "your email address" go to the model.
+_ASK = r"(?:what(?:'?s| is| are)|show(?: me)?|check|get|tell me|give me|display)"
+_OWNER = r"(?:my|your|our|the wallet'?s|the agent'?s|wallet)"
+_ASSET_REF = r"(?:" + "|".join(KNOWN_ASSETS) + r"|0x[a-fA-F0-9]{40})"
+_BALANCE = re.compile(
+    rf"\b{_ASK}\s+(?:the\s+)?{_OWNER}\s+(?:{_ASSET_REF}\s+)?(?:token\s+)?balances?\b(?!\s+sheet)"
+    rf"|^\s*{_OWNER}\s+(?:{_ASSET_REF}\s+)?balances?\s*\??\s*$"
+    rf"|\b{_ASK}\s+the\s+balances?\s+(?:of|in)\s+(?:my|your|our|the)\s+wallet\b"
+    rf"|\bhow much\s+{_ASSET_REF}\s+(?:do|does)\s+(?:i|you|we|the wallet)\s+(?:have|hold|own)\b"
+    rf"|\bhow much\s+{_ASSET_REF}\s+is\s+in\s+(?:my|your|our|the)\s+wallet\b",
+    re.IGNORECASE,
+)
+_ADDRESS = re.compile(
+    rf"\b{_ASK}\s+(?:the\s+)?(?:my|your|our|the|this|the agent'?s)\s+(?:{_ASSET_REF}\s+)?wallet(?:'s)?\s+address\b"
+    rf"|\b{_ASK}\s+the\s+address\s+of\s+(?:my|your|our|the)\s+wallet\b"
+    rf"|\b{_ASK}\s+(?:my|your|our)\s+(?:{_ASSET_REF}|base)\s+(?:deposit\s+|receiving\s+)?address\b"
+    rf"|^\s*(?:(?:my|your)\s+)?wallet\s+address\s*\??\s*$",
+    re.IGNORECASE,
+)
+MAX_PROMPT_CHARS = 120
+
+
+class Intent:
+    __slots__ = ("kind", "asset_id")
+
+    def __init__(self, kind: str, asset_id: Optional[str] = None):
+        self.kind = kind
+        self.asset_id = asset_id
+
+    def __repr__(self):
+        return f"Intent({self.kind!r}, {self.asset_id!r})"
+
+
+class IntentRouter:
+    """
+    Local fast path for prompts that need no reasoning.
+
+    `classify()` matches short, single-purpose balance and address questions
+    with a handful of regexes and returns None for everything else, so any doubt
+    falls through to the full agent. `answer()` serves a matched intent straight
+    from the wallet, optionally through per-agent templates.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.hits: Dict[str, int] = {"balance": 0, "address": 0}
+        self.misses = 0
+        self.failures = 0
+
+    def classify(self, prompt: str) -> Optional[Intent]:
+        text = prompt.strip()
+        intent = None
+        if text and len(text) <= MAX_PROMPT_CHARS and not _ACTION_WORDS.search(text):
+            if _BALANCE.search(text):
+                assets = {m.lower() for m in _ASSET.findall(text)} | set(_CONTRACT.findall(text))
+                # Several assets in one question are left to the model to phrase.
+                if len(assets) <= 1:
+                    intent = Intent("balance", assets.pop() if assets else "eth")
+            elif _ADDRESS.search(text) and not _CONTRACT.search(text):
+                intent = Intent("address")
+        if intent is None:
+            self.record_miss()
+        return intent
+
+    def record_miss(self):
+        """Count a prompt that went to the model, e.g. a matched intent the agent cannot serve."""
+        with self._lock:
+            self.misses += 1
+
+    def answer(self, intent: Intent, wallet, templates: Optional[Dict[str, str]] = None) -> Optional[str]:
+        """
+        Render the reply for `intent`, or return None so the caller falls back to the agent.
+
+        Templates may use {asset}, {balance} and {address}.
+        """
+        template = (templates or {}).get(intent.kind) or DEFAULT_TEMPLATES[intent.kind]
+        try:
+            address = wallet.default_address.address_id
+            balance = fetch_balance(wallet, intent.asset_id) if intent.kind == "balance" else None
+            reply = template.format(asset=intent.asset_id, balance=balance, address=address)
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+                self.misses += 1
+            logger.warning("fast_path_failed", intent=intent.kind, asset=intent.asset_id, error=str(e))
+            return None
+        with self._lock:
+            self.hits[intent.kind] += 1
+        logger.debug("fast_path_answered", router=self.name, intent=intent.kind, sample_rate=0.1)
+        return reply
+
+    def stats(self) -> dict:
+        hits = sum(self.hits.values())
+        total = hits + self.misses
+        return {
+            "hits": dict(self.hits),
+            "misses": self.misses,
+            "failures": self.failures,
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+        }
+
+
+intent_router = IntentRouter("agents")
+metrics.register("intent_fast_path", intent_router.stats)
@@ -0,0 +1,307 @@
+import atexit
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .log_service import get_logger
+from .serialization import DecodeError, dumps, loads, write_file
+
+logger = get_logger(__name__)
+
+
+class JournaledStore:
+    """
+    In-memory dict persisted as a JSON file plus a write-ahead journal.
+
+    Writers apply their change to memory under a lock, append a journal line to a
+    shared pending batch and block until a background flusher has written and
+    fsynced that batch. Concurrent writers therefore share a single fsync (group
+    commit) and never lose each other's updates. The flusher periodically
+    checkpoints the whole state into the main JSON file and truncates the journal.
+    Reads are served from memory.
+
+    Every journal record is idempotent, so replaying a journal over a checkpoint
+    that already contains some of its records is safe. Appended list items carry
+    increasing integer IDs for that purpose, which also makes them addressable
+    by position without scanning.
+
+    If a journal write or fsync fails, the partial write is cut off, every
+    waiting writer gets the error and the store turns read-only until restart:
+    the failed records were already applied in memory, and later IDs must not
+    be issued past them.
+    """
+
+    def __init__(self, path: str, flush_window: float = 0.002, max_batch: int = 512,
+                 checkpoint_every: int = 1000, checkpoint_interval: float = 30.0):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.flush_window = flush_window
+        self.max_batch = max_batch
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_interval = checkpoint_interval
+
+        self._data: Dict[str, Any] = {}
+        self._cond = threading.Condition()
+        self._pending: List[str] = []
+        self._seq = 0
+        self._durable_seq = 0
+        self._uncheckpointed = 0
+        self._last_checkpoint = time.monotonic()
+        self._closed = False
+        self._error: Optional[Exception] = None
+        self.version = 0
+        self.stats = {"writes": 0, "flushes": 0, "checkpoints": 0}
+
+        self._load()
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._flusher = threading.Thread(target=self._run, name=f"journal:{path}", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    # -- recovery -------------------------------------------------------------------
+
+    def _load(self):
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as file:
+                content = file.read().lstrip("\ufeff").strip()
+            if content:
+                try:
+                    self._data = loads(content)
+                except DecodeError:
+                    corrupt_path = f"{self.path}.corrupt"
+                    os.replace(self.path, corrupt_path)
+                    logger.error("store_corrupt", path=self.path, moved_to=corrupt_path)
+                    self._data = {}
+
+        replayed = 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        record = loads(line)
+                    except DecodeError:
+                        # Torn final line from a crash mid-write; it was never acknowledged.
+                        break
+                    self._apply(record)
+                    replayed += 1
+        self._uncheckpointed = replayed
+        if replayed:
+            logger.info("journal_replayed", path=self.journal_path, records=replayed)
+
+    def _apply(self, record: dict):
+        op, key = record["op"], record["k"]
+        if op == "set":
+            self._data[key] = record["v"]
+        elif op == "del":
+            self._data.pop(key, None)
+        elif op == "append":
+            items = self._data.get(key)
+            if not isinstance(items, list):
+                items = self._data[key] = []
+            item = record["v"]
+            if not items or items[-1]["id"] < item["id"]:
+                items.append(item)
+                limit = record.get("max")
+                if limit and len(items) > limit:
+                    del items[:len(items) - limit]
+        self.version += 1
+
+    # -- writes ---------------------------------------------------------------------
+
+    def _commit(self, record: dict):
+        line = dumps(record).decode() + "\n"
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"store {self.path} is closed")
+            self._raise_if_failed()
+            self._apply(record)
+            self._pending.append(line)
+            self._seq += 1
+            seq = self._seq
+            self.stats["writes"] += 1
+            self._cond.notify_all()
+            while self._durable_seq < seq and self._error is None:
+                self._cond.wait()
+            if self._durable_seq < seq:
+                self._raise_if_failed()
+
+    def _raise_if_failed(self):
+        if self._error is not None:
+            raise OSError(f"store {self.path} is read-only after a failed journal write: {self._error}") from self._error
+
+    def set(self, key: str, value: Any):
+        """Durably set `key` to `value`. Returns once the change is fsynced."""
+        self._commit({"op": "set", "k": key, "v": value})
+
+    def delete(self, key: str):
+        """Durably remove `key` if present."""
+        self._commit({"op": "del", "k": key})
+
+    def append(self, key: str, item: Dict[str, Any], max_items: Optional[int] = None) -> int:
+        """
+        Durably append `item` to the list stored under `key`.
+
+        The item is assigned the next ID for that list (1, 2, ...), which is
+        returned. With `max_items`, the oldest items are dropped beyond that
+        length; IDs keep increasing regardless.
+        """
+        # The condition's lock is re-entrant, so the ID is allocated and applied atomically.
+        with self._cond:
+            items = self._data.get(key)
+            last_id = items[-1]["id"] if isinstance(items, list) and items else 0
+            record = {"op": "append", "k": key, "v": dict(item, id=last_id + 1)}
+            if max_items:
+                record["max"] = max_items
+            self._commit(record)
+        return last_id + 1
+
+    # -- reads ----------------------------------------------------------------------
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._data.get(key, default)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Shallow copy of the current state, safe to iterate while writes continue."""
+        with self._cond:
+            return self._copy()
+
+    def _copy(self) -> Dict[str, Any]:
+        # Appended lists are mutated in place, so they are copied one level down.
+        return {key: list(value) if isinstance(value, list) else value for key, value in self._data.items()}
+
+    def bounds(self, key: str) -> Optional[Tuple[int, int]]:
+        """IDs of the first and last items of the appended list under `key`, if any."""
+        with self._cond:
+            items = self._data.get(key)
+            if not isinstance(items, list) or not items:
+                return None
+            return items[0]["id"], items[-1]["id"]
+
+    def last(self, key: str) -> Optional[Any]:
+        """Most recently appended item under `key`, if any."""
+        items = self._data.get(key)
+        return items[-1] if isinstance(items, list) and items else None
+
+    def page(self, key: str, limit: int, after: Optional[int] = None, before: Optional[int] = None,
+             offset: int = 0) -> Tuple[List[Any], int]:
+        """
+        Slice of the appended list under `key`, oldest first, and the list's length.
+
+        `after` returns the first `limit` items with a greater ID, `before` the
+        last `limit` items with a smaller ID, otherwise items from `offset`.
+        IDs are contiguous, so positions are computed instead of searched.
+        """
+        with self._cond:
+            items = self._data.get(key)
+            if not isinstance(items, list) or not items or limit <= 0:
+                return [], len(items) if isinstance(items, list) else 0
+            first_id = items[0]["id"]
+            if after is not None:
+                start = max(after + 1 - first_id, 0)
+                end = start + limit
+            elif before is not None:
+                end = min(max(before - first_id, 0), len(items))
+                start = max(end - limit, 0)
+            else:
+                start = max(offset, 0)
+                end = start + limit
+            return items[start:end], len(items)
+
+    # -- background flushing and checkpointing --------------------------------------
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed and not self._checkpoint_due():
+                    self._cond.wait(timeout=self.checkpoint_interval)
+                # Hold the door briefly so concurrent writers join this batch.
+                deadline = time.monotonic() + self.flush_window
+                while self._pending and len(self._pending) < self.max_batch and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(timeout=remaining)
+                batch, self._pending = self._pending, []
+                batch_seq = self._seq
+                self._uncheckpointed += len(batch)
+                state = None
+                if self._closed or self._checkpoint_due():
+                    state = self._copy() if self._uncheckpointed else None
+                closing = self._closed and not self._pending
+
+            if batch:
+                size = None
+                try:
+                    size = os.fstat(self._journal.fileno()).st_size
+                    self._journal.write("".join(batch))
+                    self._journal.flush()
+                    os.fsync(self._journal.fileno())
+                except Exception as e:
+                    self._fail(e, size)
+                    return
+                self.stats["flushes"] += 1
+            with self._cond:
+                self._durable_seq = batch_seq
+                self._cond.notify_all()
+
+            if state is not None:
+                self._checkpoint(state)
+            if closing:
+                return
+
+    def _fail(self, error: Exception, journal_size: Optional[int]):
+        """Wake every waiting writer with `error` and stop flushing."""
+        logger.error("journal_write_failed", path=self.journal_path, error=str(error))
+        try:
+            self._journal.close()
+        except Exception:
+            # Closing retries the buffered write; the file is closed either way.
+            pass
+        if journal_size is not None:
+            try:
+                # Drop the torn tail so replay reaches everything written before it.
+                os.truncate(self.journal_path, journal_size)
+            except OSError as e:
+                logger.error("journal_truncate_failed", path=self.journal_path, error=str(e))
+        with self._cond:
+            self._error = error
+            self._pending = []
+            self._cond.notify_all()
+
+    def _checkpoint_due(self) -> bool:
+        if not self._uncheckpointed:
+            return False
+        return (self._uncheckpointed >= self.checkpoint_every
+                or time.monotonic() - self._last_checkpoint >= self.checkpoint_interval)
+
+    def _checkpoint(self, state: Dict[str, Any]):
+        try:
+            write_file(self.path, state, fsync=True)
+            # Only the flusher thread writes the journal, so nothing lands between these steps.
+            self._journal.truncate(0)
+            self._journal.seek(0)
+            with self._cond:
+                self._uncheckpointed = 0
+                self._last_checkpoint = time.monotonic()
+            self.stats["checkpoints"] += 1
+        except Exception as e:
+            # Back off until the next interval; the journal still holds every record.
+            self._last_checkpoint = time.monotonic()
+            logger.error("checkpoint_failed", path=self.path, error=str(e))
+
+    def close(self):
+        """Flush pending writes, write a final checkpoint and stop the flusher."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._flusher.join()
+        self._journal.close()
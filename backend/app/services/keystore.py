@@ -0,0 +1,364 @@
+import atexit
+import hashlib
+import mmap
+import os
+import shutil
+import struct
+import threading
+import zlib
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from .log_service import get_logger
+from .serialization import dumps, loads, read_file
+
+logger = get_logger(__name__)
+
+# Data file: 8-byte header, then append-only records of
+#   <payload_len:u32><crc32:u32><key_len:u16><key><payload>
+# where payload is nonce + AES-GCM ciphertext and payload_len == 0 marks a deletion.
+DATA_MAGIC = b"BKKS\x01\x00\x00\x00"
+RECORD_HEADER = struct.Struct("<IIH")
+
+# Index file: header with the data size it covers, then <key_len:u16><key><offset:u64><length:u32>.
+INDEX_MAGIC = b"BKKI\x01\x00\x00\x00"
+INDEX_HEADER = struct.Struct("<QI")
+INDEX_ENTRY = struct.Struct("<QI")
+
+NONCE_SIZE = 12
+
+
+def derive_key(secret: str) -> bytes:
+    """Derive a 256-bit AES key from an arbitrary secret string."""
+    return hashlib.sha256(b"blockchain-keystore:" + secret.encode()).digest()
+
+
+class Keystore:
+    """
+    Single-file, append-only store of encrypted JSON records with an offset index.
+
+    Every record is looked up through an in-memory {key: (offset, length)} index
+    and read with one slice of the memory-mapped data file. Updates append a new
+    record and deletions append a tombstone; compact() rewrites the live records
+    into a fresh file. The index is snapshotted next to the data file so startup
+    only has to scan records appended after the last snapshot.
+
+    Records are encrypted with `key`. `previous_keys` are only used to decrypt
+    records written before a key rotation; such a record is re-encrypted with
+    the current key the first time it is read.
+    """
+
+    def __init__(self, path: str, key: bytes, fsync: bool = True, previous_keys: Sequence[bytes] = ()):
+        self.path = path
+        self.index_path = f"{path}.idx"
+        self.fsync = fsync
+        self._cipher = AESGCM(key)
+        self._previous_ciphers = [AESGCM(previous) for previous in previous_keys if previous != key]
+        self._lock = threading.RLock()
+        self._index: Dict[str, Tuple[int, int]] = {}
+        self._dead_bytes = 0
+        self._map: Optional[mmap.mmap] = None
+        self._write_error: Optional[str] = None
+        self._open()
+
+    # -- opening and index recovery -------------------------------------------------
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < len(DATA_MAGIC):
+            with open(self.path, "wb") as file:
+                file.write(DATA_MAGIC)
+        # Unbuffered: a failed append must not leave bytes queued for a later flush.
+        self._file = open(self.path, "r+b", buffering=0)
+        if self._file.read(len(DATA_MAGIC)) != DATA_MAGIC:
+            raise ValueError(f"{self.path} is not a keystore file")
+
+        start = self._load_index_snapshot()
+        end = self._scan(start)
+        size = os.path.getsize(self.path)
+        if end < size:
+            # Torn tail from a crash mid-append; drop it so new records stay aligned.
+            logger.warning("keystore_truncated_tail", path=self.path, bytes=size - end)
+            self._file.truncate(end)
+        self._file.seek(0, os.SEEK_END)
+        logger.info("keystore_opened", path=self.path, records=len(self._index))
+
+    def _load_index_snapshot(self) -> int:
+        """Load the persisted index; returns the data offset to resume scanning from."""
+        self._index = {}
+        self._dead_bytes = 0
+        try:
+            with open(self.index_path, "rb") as file:
+                raw = file.read()
+        except FileNotFoundError:
+            return len(DATA_MAGIC)
+        try:
+            if raw[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+                raise ValueError("bad magic")
+            pos = len(INDEX_MAGIC)
+            covered, dead_bytes = INDEX_HEADER.unpack_from(raw, pos)
+            pos += INDEX_HEADER.size
+            if covered > os.path.getsize(self.path):
+                raise ValueError("index is newer than data file")
+            while pos < len(raw):
+                (key_len,) = struct.unpack_from("<H", raw, pos)
+                pos += 2
+                key = raw[pos:pos + key_len].decode()
+                pos += key_len
+                self._index[key] = INDEX_ENTRY.unpack_from(raw, pos)
+                pos += INDEX_ENTRY.size
+            self._dead_bytes = dead_bytes
+            return covered
+        except Exception as e:
+            logger.warning("keystore_index_rebuild", path=self.index_path, error=str(e))
+            self._index = {}
+            self._dead_bytes = 0
+            return len(DATA_MAGIC)
+
+    def _scan(self, offset: int) -> int:
+        """Replay records from `offset` into the index. Returns the end of the last valid record."""
+        self._file.seek(offset)
+        while True:
+            header = self._file.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return offset
+            payload_len, crc, key_len = RECORD_HEADER.unpack(header)
+            body = self._file.read(key_len + payload_len)
+            if len(body) < key_len + payload_len or zlib.crc32(body) != crc:
+                return offset
+            key = body[:key_len].decode()
+            record_len = RECORD_HEADER.size + key_len + payload_len
+            self._retire(key)
+            if payload_len:
+                self._index[key] = (offset + RECORD_HEADER.size + key_len, payload_len)
+            else:
+                self._dead_bytes += record_len
+            offset += record_len
+
+    def _retire(self, key: str):
+        previous = self._index.pop(key, None)
+        if previous is not None:
+            self._dead_bytes += RECORD_HEADER.size + len(key.encode()) + previous[1]
+
+    # -- record access --------------------------------------------------------------
+
+    def _read(self, offset: int, length: int) -> bytes:
+        if self._map is None or offset + length > len(self._map):
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map[offset:offset + length]
+
+    def _append(self, key: str, payload: bytes):
+        if self._write_error is not None:
+            raise OSError(f"keystore is read-only after a failed write: {self._write_error}")
+        key_bytes = key.encode()
+        body = key_bytes + payload
+        offset = self._file.seek(0, os.SEEK_END)
+        record = memoryview(RECORD_HEADER.pack(len(payload), zlib.crc32(body), len(key_bytes)) + body)
+        try:
+            while record:
+                record = record[self._file.write(record):]
+            if self.fsync:
+                os.fsync(self._file.fileno())
+        except OSError as e:
+            # A torn record would make the next open() drop every record appended
+            # after it, so cut the file back to where this append started.
+            try:
+                self._file.truncate(offset)
+                self._file.seek(offset)
+            except OSError as rollback_error:
+                self._write_error = str(rollback_error)
+                logger.error("keystore_rollback_failed", path=self.path, error=str(rollback_error))
+            logger.error("keystore_append_failed", path=self.path, key=key, error=str(e))
+            raise
+        self._retire(key)
+        if payload:
+            self._index[key] = (offset + RECORD_HEADER.size + len(key_bytes), len(payload))
+        else:
+            self._dead_bytes += RECORD_HEADER.size + len(body)
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return the decrypted record for `key`, or None if absent."""
+        with self._lock:
+            location = self._index.get(key)
+            if location is None:
+                return None
+            payload = self._read(*location)
+        nonce, ciphertext = payload[:NONCE_SIZE], payload[NONCE_SIZE:]
+        try:
+            return loads(self._cipher.decrypt(nonce, ciphertext, key.encode()))
+        except InvalidTag:
+            for cipher in self._previous_ciphers:
+                try:
+                    value = loads(cipher.decrypt(nonce, ciphertext, key.encode()))
+                except InvalidTag:
+                    continue
+                self.put(key, value)
+                logger.info("keystore_record_rekeyed", key=key)
+                return value
+            raise
+
+    def put(self, key: str, value: dict):
+        """Encrypt and append `value` as the current record for `key`."""
+        nonce = os.urandom(NONCE_SIZE)
+        payload = nonce + self._cipher.encrypt(nonce, dumps(value), key.encode())
+        with self._lock:
+            self._append(key, payload)
+
+    def delete(self, key: str) -> bool:
+        """Append a tombstone for `key`. Returns False if it was not present."""
+        with self._lock:
+            if key not in self._index:
+                return False
+            self._append(key, b"")
+            return True
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def keys(self) -> Iterator[str]:
+        return iter(list(self._index))
+
+    # -- maintenance ----------------------------------------------------------------
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._file.seek(0, os.SEEK_END)
+            return {
+                "records": len(self._index),
+                "file_bytes": size,
+                "dead_bytes": self._dead_bytes,
+            }
+
+    def compact(self):
+        """Rewrite only the live records into a new file and swap it in atomically."""
+        with self._lock:
+            tmp_path = f"{self.path}.compact"
+            new_index = {}
+            with open(tmp_path, "wb") as out:
+                out.write(DATA_MAGIC)
+                offset = len(DATA_MAGIC)
+                for key, location in self._index.items():
+                    key_bytes = key.encode()
+                    body = key_bytes + self._read(*location)
+                    out.write(RECORD_HEADER.pack(location[1], zlib.crc32(body), len(key_bytes)) + body)
+                    new_index[key] = (offset + RECORD_HEADER.size + len(key_bytes), location[1])
+                    offset += RECORD_HEADER.size + len(body)
+                out.flush()
+                os.fsync(out.fileno())
+            before = self.stats()["file_bytes"]
+            self._close_handles()
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, "r+b", buffering=0)
+            self._file.seek(0, os.SEEK_END)
+            self._index = new_index
+            self._dead_bytes = 0
+            self._write_index()
+            logger.info("keystore_compacted", path=self.path, before=before, after=offset)
+
+    def maybe_compact(self, dead_ratio: float = 0.5, min_bytes: int = 1 << 20):
+        """Compact once dead records make up more than `dead_ratio` of a file larger than `min_bytes`."""
+        stats = self.stats()
+        if stats["file_bytes"] >= min_bytes and stats["dead_bytes"] > stats["file_bytes"] * dead_ratio:
+            self.compact()
+
+    def backup(self, destination: str):
+        """Copy the keystore as one sequential file read (the index is rebuilt on open)."""
+        with self._lock:
+            self._file.flush()
+            shutil.copyfile(self.path, destination)
+
+    def _write_index(self):
+        size = self._file.seek(0, os.SEEK_END)
+        parts = [INDEX_MAGIC, INDEX_HEADER.pack(size, self._dead_bytes)]
+        for key, (offset, length) in self._index.items():
+            key_bytes = key.encode()
+            parts.append(struct.pack("<H", len(key_bytes)) + key_bytes + INDEX_ENTRY.pack(offset, length))
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(b"".join(parts))
+        os.replace(tmp_path, self.index_path)
+
+    def _close_handles(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def close(self):
+        """Persist the index snapshot and release the file handles."""
+        with self._lock:
+            if self._file.closed:
+                return
+            self._write_index()
+            self._close_handles()
+
+
+WALLET_KEYSTORE_PATH = os.path.join("wallet_storage", "wallets.keystore")
+
+_wallet_keystore: Optional[Keystore] = None
+_wallet_keystore_lock = threading.Lock()
+
+
+def get_wallet_keystore() -> Keystore:
+    """
+    Return the process-wide wallet keystore.
+
+    Records are encrypted with WALLET_KEYSTORE_SECRET, which is deliberately
+    separate from the CDP API credentials so those can be rotated freely.
+    WALLET_KEYSTORE_PREVIOUS_SECRETS (comma-separated) keeps older secrets
+    available for decryption after a rotation; keystores written by builds
+    that fell back to CDP_PRIVATE_KEY are read by listing it there.
+    """
+    global _wallet_keystore
+    if _wallet_keystore is None:
+        with _wallet_keystore_lock:
+            if _wallet_keystore is None:
+                secret = os.getenv("WALLET_KEYSTORE_SECRET", "")
+                if not secret:
+                    raise ValueError("WALLET_KEYSTORE_SECRET must be set")
+                previous = [derive_key(old) for old in os.getenv("WALLET_KEYSTORE_PREVIOUS_SECRETS", "").split(",") if old]
+                _wallet_keystore = Keystore(WALLET_KEYSTORE_PATH, derive_key(secret), previous_keys=previous)
+                atexit.register(_wallet_keystore.close)
+    return _wallet_keystore
+
+
+def load_wallet_record(wallet_id: str) -> Optional[dict]:
+    """
+    Fetch a wallet record from the keystore.
+
+    Wallets saved by older builds as wallet_storage/{wallet_id}.json are imported
+    into the keystore the first time they are requested.
+    """
+    keystore = get_wallet_keystore()
+    record = keystore.get(wallet_id)
+    if record is not None:
+        return record
+    legacy_path = os.path.join(os.path.dirname(WALLET_KEYSTORE_PATH), f"{wallet_id}.json")
+    if not os.path.exists(legacy_path):
+        return None
+    record = read_file(legacy_path)
+    keystore.put(wallet_id, record)
+    logger.info("wallet_migrated_to_keystore", wallet_id=wallet_id)
+    return record
+
+
+def save_wallet_record(wallet_data, address_id: str):
+    """Store exported cdp WalletData together with its default address."""
+    record = wallet_data.to_dict()
+    record["default_address_id"] = address_id
+    get_wallet_keystore().put(wallet_data.wallet_id, record)
+
+
+def get_wallet_address(wallet_id: str) -> str:
+    """Default address of a stored wallet, or an empty string if unknown."""
+    record = load_wallet_record(wallet_id)
+    if not record:
+        return ""
+    return record.get("default_address_id", "")
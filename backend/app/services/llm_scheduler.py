@@ -0,0 +1,291 @@
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import os
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from . import metrics
+from .log_service import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_TIERS = {
+    "default": {"rate_per_minute": 20, "burst": 10, "weight": 1},
+    "premium": {"rate_per_minute": 120, "burst": 30, "weight": 4},
+}
+
+
+class RateLimited(Exception):
+    """Raised when a user has no tokens left in their bucket."""
+
+    def __init__(self, user_id: str, tier: str, retry_after: float):
+        super().__init__(f"Rate limit exceeded for tier '{tier}', retry in {retry_after:.1f}s")
+        self.user_id = user_id
+        self.tier = tier
+        self.retry_after = retry_after
+
+
+class RequestTooLarge(Exception):
+    """Raised when a request costs more tokens than the user's bucket can ever hold."""
+
+    def __init__(self, user_id: str, tier: str, cost: float, burst: float):
+        super().__init__(f"Request costs {cost:g} tokens but tier '{tier}' allows at most {burst:g} per request")
+        self.user_id = user_id
+        self.tier = tier
+        self.cost = cost
+        self.burst = burst
+
+
+class Tier:
+    def __init__(self, name: str, rate_per_minute: float, burst: float, weight: float):
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.weight = weight
+
+
+class TokenBucket:
+    def __init__(self, tier: Tier):
+        self.tier = tier
+        self.tokens = tier.burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.tier.burst, self.tokens + (now - self.updated) * self.tier.rate)
+        self.updated = now
+
+    def try_take(self, cost: float = 1.0) -> float:
+        """Take `cost` tokens; returns 0 on success or the seconds until enough are available."""
+        now = time.monotonic()
+        self._refill(now)
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        if self.tier.rate <= 0:
+            return float("inf")
+        return (cost - self.tokens) / self.tier.rate
+
+
+class _UserStats:
+    __slots__ = ("admitted", "rejected", "dispatched", "total_wait", "max_wait", "last_wait")
+
+    def __init__(self):
+        self.admitted = 0
+        self.rejected = 0
+        self.dispatched = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.last_wait = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "dispatched": self.dispatched,
+            "avg_wait_ms": round(self.total_wait / self.dispatched * 1000, 2) if self.dispatched else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+            "last_wait_ms": round(self.last_wait * 1000, 2),
+        }
+
+
+class LLMScheduler:
+    """
+    Admission control and fair ordering for model-bound work.
+
+    `admit()` charges the caller's per-user token bucket and raises RateLimited
+    when it is empty. `run()` then waits for one of `max_concurrency` execution
+    slots. Slots are handed out by start-time fair queuing over flows of
+    (user, flow), e.g. (user, NFT hash): each user gets a share proportional to
+    their tier weight, split evenly across that user's currently active flows,
+    so one user with many busy agents cannot crowd out everyone else.
+
+    Everything except the job itself runs on the event loop, so no locking is
+    needed.
+    """
+
+    def __init__(self, max_concurrency: int, tiers: Dict[str, Tier], user_tiers: Dict[str, str],
+                 default_tier: str = "default"):
+        if default_tier not in tiers:
+            raise ValueError(f"Unknown default LLM tier '{default_tier}'")
+        self.max_concurrency = max_concurrency
+        self.tiers = tiers
+        self.user_tiers = user_tiers
+        self.default_tier = default_tier
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._stats: Dict[str, _UserStats] = defaultdict(_UserStats)
+        self._heap: List[Tuple[float, int, asyncio.Future, str, float, float]] = []
+        self._seq = itertools.count()
+        self._vtime = 0.0
+        self._running = 0
+        self._finish: Dict[Tuple[str, Hashable], float] = {}
+        self._pending: Dict[Tuple[str, Hashable], int] = defaultdict(int)
+        self._user_flows: Dict[str, set] = defaultdict(set)
+
+    def tier_for(self, user_id: str) -> Tier:
+        name = self.user_tiers.get(user_id.lower(), self.default_tier)
+        return self.tiers.get(name) or self.tiers[self.default_tier]
+
+    def admit(self, user_id: str, cost: float = 1.0):
+        """
+        Charge the user's bucket or raise RateLimited.
+
+        Raises RequestTooLarge for a cost above the tier's burst, which no
+        amount of waiting would make admissible.
+        """
+        user_id = user_id.lower()
+        tier = self.tier_for(user_id)
+        if cost > tier.burst:
+            self._stats[user_id].rejected += 1
+            raise RequestTooLarge(user_id, tier.name, cost, tier.burst)
+        bucket = self._buckets.get(user_id)
+        if bucket is None or bucket.tier is not tier:
+            bucket = self._buckets[user_id] = TokenBucket(tier)
+        retry_after = bucket.try_take(cost)
+        if retry_after:
+            self._stats[user_id].rejected += 1
+            logger.warning("llm_rate_limited", user_id=user_id, tier=tier.name,
+                           retry_after=round(retry_after, 2), sample_rate=0.1)
+            raise RateLimited(user_id, tier.name, retry_after)
+        self._stats[user_id].admitted += 1
+
+    async def run(self, user_id: str, flow: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Wait for a fair execution slot, then run `fn(*args, **kwargs)`.
+
+        Blocking callables run in the threadpool; coroutine functions are awaited.
+        """
+        key = (user_id.lower(), flow)
+        await self._acquire(key)
+        try:
+            if asyncio.iscoroutinefunction(fn):
+                return await fn(*args, **kwargs)
+            return await run_in_threadpool(fn, *args, **kwargs)
+        finally:
+            self._release(key)
+
+    async def _acquire(self, key: Tuple[str, Hashable]):
+        user_id = key[0]
+        self._pending[key] += 1
+        self._user_flows[user_id].add(key)
+        weight = self.tier_for(user_id).weight / len(self._user_flows[user_id])
+        start = max(self._vtime, self._finish.get(key, 0.0))
+        self._finish[key] = start + 1.0 / weight
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (self._finish[key], next(self._seq), future, user_id,
+                                    time.monotonic(), start))
+        self._dispatch()
+        if future.done():
+            return
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was granted just as the caller went away; hand it on.
+                self._release(key)
+            else:
+                self._forget(key)
+            raise
+
+    def _release(self, key: Tuple[str, Hashable]):
+        self._running -= 1
+        self._forget(key)
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._heap and self._running < self.max_concurrency:
+            _, _, future, user_id, enqueued, start = heapq.heappop(self._heap)
+            if future.done():
+                continue
+            self._running += 1
+            self._vtime = max(self._vtime, start)
+            self._record_wait(user_id, time.monotonic() - enqueued)
+            future.set_result(None)
+
+    def _forget(self, key: Tuple[str, Hashable]):
+        self._pending[key] -= 1
+        if self._pending[key] > 0:
+            return
+        del self._pending[key]
+        flows = self._user_flows[key[0]]
+        flows.discard(key)
+        if not flows:
+            del self._user_flows[key[0]]
+        # An idle flow restarts from the current virtual time anyway, unless it
+        # is still ahead of it (it recently used more than its share).
+        if self._finish.get(key, 0.0) <= self._vtime:
+            self._finish.pop(key, None)
+
+    def _record_wait(self, user_id: str, wait: float):
+        stats = self._stats[user_id]
+        stats.dispatched += 1
+        stats.total_wait += wait
+        stats.last_wait = wait
+        if wait > stats.max_wait:
+            stats.max_wait = wait
+
+    def user_stats(self, user_id: str) -> dict:
+        user_id = user_id.lower()
+        tier = self.tier_for(user_id)
+        bucket = self._buckets.get(user_id)
+        entry = self._stats[user_id].to_dict() if user_id in self._stats else _UserStats().to_dict()
+        entry["tier"] = tier.name
+        entry["tokens"] = round(bucket.tokens, 2) if bucket else tier.burst
+        entry["in_flight"] = sum(self._pending.get(key, 0) for key in self._user_flows.get(user_id, ()))
+        return entry
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "running": self._running,
+            "queued": sum(not entry[2].done() for entry in self._heap),
+            "users": {user_id: self.user_stats(user_id) for user_id in list(self._stats)},
+        }
+
+
+def admit_request(user_id: str, cost: float = 1.0):
+    """
+    Route helper: admit `user_id` or reject the request.
+
+    Over-budget requests get 429 with Retry-After when the bucket will refill
+    in time; requests that can never fit get 413 and no Retry-After.
+    """
+    try:
+        llm_scheduler.admit(user_id, cost)
+    except RequestTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except RateLimited as e:
+        headers = {"Retry-After": str(math.ceil(e.retry_after))} if math.isfinite(e.retry_after) else None
+        raise HTTPException(status_code=429, detail=str(e), headers=headers)
+
+
+def _load_tiers() -> Dict[str, Tier]:
+    raw = dict(DEFAULT_TIERS)
+    if os.getenv("LLM_TIERS"):
+        raw.update(json.loads(os.getenv("LLM_TIERS")))
+    return {
+        name: Tier(name, float(spec.get("rate_per_minute", 20)), float(spec.get("burst", 10)),
+                   float(spec.get("weight", 1)))
+        for name, spec in raw.items()
+    }
+
+
+def _load_user_tiers() -> Dict[str, str]:
+    raw = json.loads(os.getenv("LLM_USER_TIERS", "{}"))
+    return {user_id.lower(): tier for user_id, tier in raw.items()}
+
+
+llm_scheduler = LLMScheduler(
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+    tiers=_load_tiers(),
+    user_tiers=_load_user_tiers(),
+    default_tier=os.getenv("LLM_DEFAULT_TIER", "default"),
+)
+metrics.register("llm_scheduler", llm_scheduler.stats)
@@ -0,0 +1,149 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict
+
+ROOT_LOGGER_NAME = "blockchain"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+MAX_FIELD_LENGTH = int(os.getenv("LOG_MAX_FIELD_LENGTH", "200"))
+
+
+class JsonFormatter(logging.Formatter):
+    """Renders a record as a single JSON line. Runs on the writer thread."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        sample_rate = getattr(record, "sample_rate", 1.0)
+        if sample_rate < 1.0:
+            entry["sample_rate"] = sample_rate
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting is left to the writer thread; only strip what cannot cross threads.
+        record.exc_text = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class StructuredLogger:
+    """
+    Thin wrapper over a stdlib logger that takes an event name plus keyword fields.
+
+    Every call is a level check followed by a non-blocking queue put; the JSON
+    encoding and the stdout write happen on the background listener thread.
+    Pass `sample_rate` below 1.0 for high-volume events to only keep a fraction of them.
+    """
+
+    def __init__(self, name: str):
+        self._logger = logging.getLogger(f"{ROOT_LOGGER_NAME}.{name}")
+
+    def debug(self, event: str, sample_rate: float = 1.0, **fields):
+        self._log(logging.DEBUG, event, sample_rate, fields)
+
+    def info(self, event: str, sample_rate: float = 1.0, **fields):
+        self._log(logging.INFO, event, sample_rate, fields)
+
+    def warning(self, event: str, sample_rate: float = 1.0, **fields):
+        self._log(logging.WARNING, event, sample_rate, fields)
+
+    def error(self, event: str, sample_rate: float = 1.0, **fields):
+        self._log(logging.ERROR, event, sample_rate, fields)
+
+    def exception(self, event: str, **fields):
+        if self._logger.isEnabledFor(logging.ERROR):
+            self._logger.error(event, exc_info=True, extra={"fields": _clip(fields)})
+
+    def _log(self, level: int, event: str, sample_rate: float, fields: Dict[str, Any]):
+        if not self._logger.isEnabledFor(level):
+            return
+        if sample_rate < 1.0 and random.random() >= sample_rate:
+            return
+        self._logger.log(level, event, extra={"fields": _clip(fields), "sample_rate": sample_rate})
+
+
+def _clip(fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Truncate long string values so a single log line never carries whole payloads."""
+    for key, value in fields.items():
+        if isinstance(value, str) and len(value) > MAX_FIELD_LENGTH:
+            fields[key] = f"{value[:MAX_FIELD_LENGTH]}...(+{len(value) - MAX_FIELD_LENGTH} chars)"
+    return fields
+
+
+_setup_lock = threading.Lock()
+_queue_handler: DroppingQueueHandler = None
+_listener: QueueListener = None
+
+
+def _setup():
+    global _queue_handler, _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(JsonFormatter())
+
+        root = logging.getLogger(ROOT_LOGGER_NAME)
+        if _queue_handler is not None:
+            root.removeHandler(_queue_handler)
+        _queue_handler = DroppingQueueHandler(log_queue)
+        root.setLevel(LOG_LEVEL)
+        root.addHandler(_queue_handler)
+        root.propagate = False
+
+        _listener = QueueListener(log_queue, stream_handler)
+        _listener.start()
+        atexit.register(shutdown)
+
+
+def shutdown():
+    """Flush pending records and stop the writer thread."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def dropped_count() -> int:
+    """Number of records dropped because the queue was full."""
+    return _queue_handler.dropped if _queue_handler else 0
+
+
+def get_logger(name: str) -> StructuredLogger:
+    """Return a structured logger, starting the background writer on first use."""
+    if _listener is None:
+        _setup()
+    return StructuredLogger(name)
+
@@ -0,0 +1,74 @@
+import asyncio
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Hashable, Set, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+_Job = Tuple[Callable[..., Any], tuple, dict, asyncio.Future]
+
+
+class KeyedScheduler:
+    """
+    Ordered mailboxes keyed by an ID such as an NFT hash.
+
+    Jobs submitted under the same key run one at a time in submission order,
+    blocking ones in the threadpool and coroutine functions on the loop; jobs
+    under different keys run fully in parallel. A
+    mailbox exists only while it has work, so idle keys cost nothing.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._boxes: Dict[Hashable, Deque[_Job]] = {}
+        self._drains: Set[asyncio.Task] = set()
+        self.processed = 0
+        self.max_depth = 0
+
+    async def submit(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Queue `fn(*args, **kwargs)` behind earlier jobs for `key` and await its result."""
+        future = asyncio.get_running_loop().create_future()
+        box = self._boxes.get(key)
+        if box is None:
+            box = self._boxes[key] = deque()
+            drain = asyncio.ensure_future(self._drain(key, box))
+            self._drains.add(drain)
+            drain.add_done_callback(self._drains.discard)
+        box.append((fn, args, kwargs, future))
+        if len(box) > self.max_depth:
+            self.max_depth = len(box)
+        return await future
+
+    async def _drain(self, key: Hashable, box: Deque[_Job]):
+        while box:
+            fn, args, kwargs, future = box[0]
+            # Skip jobs whose caller went away before they started.
+            if not future.done():
+                try:
+                    if asyncio.iscoroutinefunction(fn):
+                        result = await fn(*args, **kwargs)
+                    else:
+                        result = await run_in_threadpool(fn, *args, **kwargs)
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    if not future.done():
+                        future.set_result(result)
+            box.popleft()
+            self.processed += 1
+        del self._boxes[key]
+
+    def depth(self, key: Hashable) -> int:
+        """Jobs queued or running for `key`."""
+        box = self._boxes.get(key)
+        return len(box) if box else 0
+
+    def stats(self) -> dict:
+        depths = {str(key): len(box) for key, box in list(self._boxes.items())}
+        return {
+            "active_mailboxes": len(depths),
+            "queued": sum(depths.values()),
+            "processed": self.processed,
+            "max_depth": self.max_depth,
+            "depth_by_key": depths,
+        }
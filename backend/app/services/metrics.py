@@ -0,0 +1,24 @@
+from typing import Callable, Dict
+
+from .log_service import get_logger
+
+logger = get_logger(__name__)
+
+_providers: Dict[str, Callable[[], dict]] = {}
+
+
+def register(name: str, provider: Callable[[], dict]):
+    """Register a callable returning a JSON-serialisable stats dict under `name`."""
+    _providers[name] = provider
+
+
+def snapshot() -> Dict[str, dict]:
+    """Collect the current stats of every registered provider."""
+    result = {}
+    for name, provider in list(_providers.items()):
+        try:
+            result[name] = provider()
+        except Exception as e:
+            logger.warning("metrics_provider_failed", provider=name, error=str(e))
+            result[name] = {"error": str(e)}
+    return result
@@ -0,0 +1,173 @@
+import heapq
+import math
+import re
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Hashable, List, Optional
+
+from . import metrics
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do for from has have how i if in into is it its me my "
+    "no not of on or our so that the their them then there these they this to was we were "
+    "what when where which who why will with you your".split()
+)
+SNIPPET_CHARS = 160
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if len(token) > 1 and token not in STOPWORDS]
+
+
+class SearchIndex:
+    """
+    Incrementally maintained inverted index with BM25 ranking.
+
+    Documents are keyed by any hashable ID and carry a small metadata dict that
+    is returned with each hit. Re-adding a key replaces the document. Postings
+    map term -> {doc number: term frequency}, so a query only touches the
+    documents containing its terms, and the top hits are picked with a heap
+    instead of sorting every match.
+    """
+
+    def __init__(self, name: str, k1: float = 1.2, b: float = 0.75):
+        self.name = name
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._doc_numbers: Dict[Hashable, int] = {}
+        self._docs: Dict[int, tuple] = {}  # number -> (key, length, terms, meta)
+        self._next_number = 0
+        self._total_length = 0
+        self.queries = 0
+        self.query_ms_total = 0.0
+
+    def add(self, key: Hashable, text: str, meta: Optional[dict] = None):
+        tokens = tokenize(text)
+        counts = Counter(tokens)
+        meta = dict(meta or {}, snippet=text[:SNIPPET_CHARS])
+        with self._lock:
+            self._remove_locked(key)
+            if not counts:
+                return
+            number = self._next_number
+            self._next_number += 1
+            self._doc_numbers[key] = number
+            self._docs[number] = (key, len(tokens), tuple(counts), meta)
+            self._total_length += len(tokens)
+            for term, frequency in counts.items():
+                self._postings.setdefault(term, {})[number] = frequency
+
+    def remove(self, key: Hashable):
+        with self._lock:
+            self._remove_locked(key)
+
+    def _remove_locked(self, key: Hashable):
+        number = self._doc_numbers.pop(key, None)
+        if number is None:
+            return
+        _, length, terms, _ = self._docs.pop(number)
+        self._total_length -= length
+        for term in terms:
+            postings = self._postings[term]
+            del postings[number]
+            if not postings:
+                del self._postings[term]
+
+    def search(self, query: str, limit: int = 20, kind: Optional[str] = None,
+               allow: Optional[Callable[[dict], bool]] = None) -> List[dict]:
+        """
+        Top `limit` documents for `query` by BM25, optionally only those whose
+        meta kind matches and for which `allow(meta)` is true.
+        """
+        start = time.perf_counter()
+        terms = set(tokenize(query))
+        with self._lock:
+            total_docs = len(self._docs)
+            if not terms or not total_docs:
+                return []
+            average_length = self._total_length / total_docs
+            scores: Dict[int, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for number, frequency in postings.items():
+                    length = self._docs[number][1]
+                    norm = frequency + self.k1 * (1 - self.b + self.b * length / average_length)
+                    scores[number] = scores.get(number, 0.0) + idf * frequency * (self.k1 + 1) / norm
+            if kind is not None:
+                scores = {number: score for number, score in scores.items() if self._docs[number][3].get("kind") == kind}
+            if allow is not None:
+                scores = {number: score for number, score in scores.items() if allow(self._docs[number][3])}
+            top = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+            results = [dict(self._docs[number][3], score=round(score, 4)) for number, score in top]
+        self.queries += 1
+        self.query_ms_total += (time.perf_counter() - start) * 1000
+        return results
+
+    def dump(self) -> List[list]:
+        """Every document as [key, length, {term: frequency}, meta], for a cache snapshot."""
+        with self._lock:
+            return [[list(key) if isinstance(key, tuple) else key, length,
+                     {term: self._postings[term][number] for term in terms}, meta]
+                    for number, (key, length, terms, meta) in self._docs.items()]
+
+    def load(self, docs: List[list]) -> int:
+        """Add documents from dump() without re-tokenizing them. Returns the number added."""
+        with self._lock:
+            for key, length, counts, meta in docs:
+                key = tuple(key) if isinstance(key, list) else key
+                self._remove_locked(key)
+                number = self._next_number
+                self._next_number += 1
+                self._doc_numbers[key] = number
+                self._docs[number] = (key, length, tuple(counts), meta)
+                self._total_length += length
+                for term, frequency in counts.items():
+                    self._postings.setdefault(term, {})[number] = frequency
+        return len(docs)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def stats(self) -> dict:
+        return {
+            "documents": len(self._docs),
+            "terms": len(self._postings),
+            "queries": self.queries,
+            "avg_query_ms": round(self.query_ms_total / self.queries, 3) if self.queries else 0.0,
+        }
+
+
+def agent_text(config: dict) -> str:
+    """Searchable text of an agent config (DB/{address}.json)."""
+    concepts = config.get("Concepts") or []
+    if isinstance(concepts, (list, tuple)):
+        concepts = " ".join(str(concept) for concept in concepts)
+    instructions = config.get("Instructions") or ""
+    if isinstance(instructions, (list, tuple)):
+        instructions = " ".join(str(instruction) for instruction in instructions)
+    return f"{config.get('Personality', '')} {concepts} {instructions}"
+
+
+def index_agent(address: str, config: dict):
+    search_index.add(("agent", address), agent_text(config), {"kind": "agent", "address": address})
+
+
+def index_turn(wallet_id: str, turn: dict):
+    text = f"{turn.get('question') or ''} {turn.get('answer') or turn.get('raw') or ''}"
+    search_index.add(("turn", wallet_id, turn["id"]), text,
+                     {"kind": "turn", "wallet_id": wallet_id, "turn_id": turn["id"]})
+
+
+def remove_turn(wallet_id: str, turn_id: int):
+    search_index.remove(("turn", wallet_id, turn_id))
+
+
+search_index = SearchIndex("agents")
+metrics.register("search_index", search_index.stats)
@@ -0,0 +1,103 @@
+import os
+import threading
+from typing import Any, Callable, Tuple
+
+from starlette.responses import JSONResponse
+
+# Backend preference: orjson, then msgspec, then the standard library. Set
+# SERIALIZATION_BACKEND to force one (e.g. to compare behaviour).
+_PREFERENCE = ("orjson", "msgspec", "json")
+
+
+def _default(value: Any) -> Any:
+    # Decimal balances, datetimes and similar only ever need their string form.
+    return str(value)
+
+
+def _load_orjson() -> Tuple[Callable, Callable, type]:
+    import orjson
+
+    def dumps(obj, pretty=False):
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        return orjson.dumps(obj, default=_default, option=option)
+
+    return dumps, orjson.loads, orjson.JSONDecodeError
+
+
+def _load_msgspec() -> Tuple[Callable, Callable, type]:
+    import msgspec
+
+    encoder = msgspec.json.Encoder(enc_hook=_default)
+    decoder = msgspec.json.Decoder()
+
+    def dumps(obj, pretty=False):
+        data = encoder.encode(obj)
+        return msgspec.json.format(data, indent=2) if pretty else data
+
+    return dumps, decoder.decode, msgspec.DecodeError
+
+
+def _load_json() -> Tuple[Callable, Callable, type]:
+    import json
+
+    def dumps(obj, pretty=False):
+        if pretty:
+            return json.dumps(obj, default=_default, ensure_ascii=False, indent=2).encode()
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+    return dumps, json.loads, json.JSONDecodeError
+
+
+_LOADERS = {"orjson": _load_orjson, "msgspec": _load_msgspec, "json": _load_json}
+
+
+def _select_backend():
+    forced = os.getenv("SERIALIZATION_BACKEND")
+    for name in ((forced,) if forced else _PREFERENCE):
+        try:
+            return (name,) + _LOADERS[name]()
+        except ImportError:
+            continue
+    raise ValueError(f"Unknown or unavailable serialization backend '{forced}'")
+
+
+BACKEND, _dumps, _loads, DecodeError = _select_backend()
+
+
+def dumps(obj: Any, pretty: bool = False) -> bytes:
+    """Encode `obj` as compact UTF-8 JSON bytes (indented when `pretty`)."""
+    return _dumps(obj, pretty)
+
+
+def loads(data) -> Any:
+    """Decode JSON from bytes or str. Raises DecodeError on malformed input."""
+    return _loads(data)
+
+
+def read_file(path: str) -> Any:
+    """Read and decode a JSON file."""
+    with open(path, "rb") as file:
+        return _loads(file.read())
+
+
+def write_file(path: str, obj: Any, fsync: bool = False):
+    """
+    Atomically replace `path` with the compact JSON encoding of `obj`.
+
+    The data is written to a temporary file first, so readers never see a
+    partially written file.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(_dumps(obj, False))
+        if fsync:
+            file.flush()
+            os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the selected serialization backend."""
+
+    def render(self, content: Any) -> bytes:
+        return _dumps(content, False)
@@ -0,0 +1,119 @@
+import threading
+import time
+import zlib
+from typing import Callable, Dict, Generic, Hashable, List, Optional, TypeVar
+
+from .log_service import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+
+class _Entry(Generic[T]):
+    __slots__ = ("value", "last_used")
+
+    def __init__(self, value: T):
+        self.value = value
+        self.last_used = time.monotonic()
+
+
+class _Shard(Generic[T]):
+    __slots__ = ("lock", "entries", "created", "evicted")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries: Dict[Hashable, _Entry[T]] = {}
+        self.created = 0
+        self.evicted = 0
+
+
+class ShardedRegistry(Generic[T]):
+    """
+    Keyed registry of long-lived objects, split into independently locked shards.
+
+    Lookups of existing entries take no lock: a dict read plus a timestamp
+    write. Only creating or evicting an entry locks its shard, so users hashed
+    to different shards never contend. Each shard holds at most
+    `max_entries / shards` entries; inserting beyond that evicts the least
+    recently used one, and entries idle longer than `idle_ttl` seconds are
+    dropped on the next insert into their shard.
+    """
+
+    def __init__(self, name: str, factory: Callable[[Hashable], T], shards: int = 16,
+                 max_entries: int = 1024, idle_ttl: Optional[float] = None):
+        self.name = name
+        self.factory = factory
+        self.idle_ttl = idle_ttl
+        self.per_shard = max(1, max_entries // shards)
+        self._shards: List[_Shard[T]] = [_Shard() for _ in range(shards)]
+
+    def _shard(self, key: Hashable) -> _Shard[T]:
+        return self._shards[zlib.crc32(str(key).encode()) % len(self._shards)]
+
+    def get(self, key: Hashable) -> Optional[T]:
+        entry = self._shard(key).entries.get(key)
+        if entry is None:
+            return None
+        entry.last_used = time.monotonic()
+        return entry.value
+
+    def get_or_create(self, key: Hashable) -> T:
+        shard = self._shard(key)
+        entry = shard.entries.get(key)
+        if entry is not None:
+            entry.last_used = time.monotonic()
+            return entry.value
+        with shard.lock:
+            entry = shard.entries.get(key)
+            if entry is None:
+                # Built under the shard lock so one key never gets two objects.
+                entry = _Entry(self.factory(key))
+                self._evict_locked(shard, room_for=1)
+                # Copy-on-write: readers iterate or index the old dict untouched.
+                entries = dict(shard.entries)
+                entries[key] = entry
+                shard.entries = entries
+                shard.created += 1
+        entry.last_used = time.monotonic()
+        return entry.value
+
+    def _evict_locked(self, shard: _Shard[T], room_for: int = 0):
+        now = time.monotonic()
+        victims = []
+        if self.idle_ttl is not None:
+            victims = [key for key, entry in shard.entries.items() if now - entry.last_used > self.idle_ttl]
+        dropped = set(victims)
+        overflow = len(shard.entries) - len(dropped) + room_for - self.per_shard
+        if overflow > 0:
+            remaining = sorted((item for item in shard.entries.items() if item[0] not in dropped),
+                               key=lambda item: item[1].last_used)
+            dropped.update(key for key, _ in remaining[:overflow])
+        if dropped:
+            shard.entries = {key: entry for key, entry in shard.entries.items() if key not in dropped}
+            shard.evicted += len(dropped)
+            logger.debug("registry_evicted", registry=self.name, count=len(dropped))
+
+    def evict_idle(self) -> int:
+        """Drop entries idle longer than `idle_ttl` in every shard. Returns the number evicted."""
+        evicted = 0
+        for shard in self._shards:
+            with shard.lock:
+                before = shard.evicted
+                self._evict_locked(shard)
+                evicted += shard.evicted - before
+        return evicted
+
+    def __len__(self) -> int:
+        return sum(len(shard.entries) for shard in self._shards)
+
+    def stats(self) -> dict:
+        sizes = [len(shard.entries) for shard in self._shards]
+        return {
+            "entries": sum(sizes),
+            "shards": len(sizes),
+            "largest_shard": max(sizes),
+            "capacity": self.per_shard * len(sizes),
+            "created": sum(shard.created for shard in self._shards),
+            "evicted": sum(shard.evicted for shard in self._shards),
+        }
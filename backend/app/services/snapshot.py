@@ -0,0 +1,155 @@
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from . import metrics
+from .log_service import get_logger
+from .serialization import DecodeError, dumps, loads
+
+logger = get_logger(__name__)
+
+SNAPSHOT_PATH = os.getenv("CACHE_SNAPSHOT_PATH", os.path.join("DB", "cache.snapshot"))
+SNAPSHOT_INTERVAL = float(os.getenv("CACHE_SNAPSHOT_INTERVAL", "300"))
+
+MAGIC = b"BLNDSNAP"
+FORMAT_VERSION = 1
+# magic, format version, header length
+_PREAMBLE = struct.Struct("<8sII")
+
+
+class _Section:
+    def __init__(self, name: str, version: int, dump: Callable[[], Any], restore: Callable[[Any], object]):
+        self.name = name
+        self.version = version
+        self.dump = dump
+        self.restore = restore
+
+
+class CacheSnapshot:
+    """
+    Versioned on-disk snapshot of in-memory caches, for warm restarts.
+
+    Each cache registers a named section with a schema version plus a `dump`
+    callable returning JSON-serialisable state and a `restore` callable taking
+    it back. `save()` writes every section into one file:
+
+        preamble | JSON header (per-section version, offset, length, digest) | section bodies
+
+    `load()` memory-maps the file and decodes only the sections that are
+    registered with a matching version and digest; anything else is skipped,
+    so a schema change or a damaged section just means that cache starts cold.
+    Restored entries are not re-checked here: each cache validates them
+    against its source of truth (file mtimes, store bounds) when they are
+    next used.
+    """
+
+    def __init__(self, path: str = SNAPSHOT_PATH):
+        self.path = path
+        self._sections: Dict[str, _Section] = {}
+        self._save_lock = threading.Lock()
+        self.saves = 0
+        self.last_saved_at: Optional[float] = None
+        self.last_save_ms = 0.0
+        self.last_bytes = 0
+        self.load_ms = 0.0
+        self.restored: Dict[str, object] = {}
+        self.skipped: Dict[str, str] = {}
+
+    def register(self, name: str, version: int, dump: Callable[[], Any], restore: Callable[[Any], object]):
+        self._sections[name] = _Section(name, version, dump, restore)
+
+    def save(self) -> int:
+        """Write a snapshot of every registered cache. Returns its size in bytes."""
+        with self._save_lock:
+            start = time.perf_counter()
+            header, bodies, offset = {"created_at": time.time(), "sections": {}}, [], 0
+            for section in list(self._sections.values()):
+                try:
+                    body = dumps(section.dump())
+                except Exception as e:
+                    logger.error("snapshot_dump_failed", section=section.name, error=str(e))
+                    continue
+                header["sections"][section.name] = {
+                    "version": section.version, "offset": offset, "length": len(body),
+                    "digest": hashlib.blake2b(body, digest_size=16).hexdigest(),
+                }
+                bodies.append(body)
+                offset += len(body)
+            encoded_header = dumps(header)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as file:
+                file.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(encoded_header)))
+                file.write(encoded_header)
+                for body in bodies:
+                    file.write(body)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.path)
+            size = _PREAMBLE.size + len(encoded_header) + offset
+            self.saves += 1
+            self.last_saved_at = time.time()
+            self.last_save_ms = (time.perf_counter() - start) * 1000
+            self.last_bytes = size
+        logger.info("snapshot_saved", sections=len(bodies), bytes=size, ms=round(self.last_save_ms, 1))
+        return size
+
+    def load(self) -> Dict[str, object]:
+        """Restore every registered cache found in the snapshot. Returns each section's restore result."""
+        start = time.perf_counter()
+        try:
+            with open(self.path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                self._load_mapped(mapped)
+        except FileNotFoundError:
+            logger.info("snapshot_missing", path=self.path)
+        except (OSError, ValueError, DecodeError, struct.error) as e:
+            # ValueError also covers mapping an empty file.
+            logger.warning("snapshot_unreadable", path=self.path, error=str(e))
+        self.load_ms = (time.perf_counter() - start) * 1000
+        logger.info("snapshot_loaded", restored=list(self.restored), skipped=self.skipped,
+                    ms=round(self.load_ms, 1))
+        return self.restored
+
+    def _load_mapped(self, mapped: mmap.mmap):
+        magic, format_version, header_length = _PREAMBLE.unpack_from(mapped, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise ValueError(f"unsupported snapshot format {format_version}")
+        base = _PREAMBLE.size + header_length
+        header = loads(mapped[_PREAMBLE.size:base])
+        for name, entry in header["sections"].items():
+            section = self._sections.get(name)
+            if section is None:
+                continue
+            if entry["version"] != section.version:
+                self.skipped[name] = f"version {entry['version']} != {section.version}"
+                continue
+            start = base + entry["offset"]
+            body = mapped[start:start + entry["length"]]
+            if hashlib.blake2b(body, digest_size=16).hexdigest() != entry["digest"]:
+                self.skipped[name] = "digest mismatch"
+                continue
+            try:
+                self.restored[name] = section.restore(loads(body))
+            except Exception as e:
+                self.skipped[name] = str(e)
+                logger.error("snapshot_restore_failed", section=name, error=str(e))
+
+    def stats(self) -> dict:
+        return {
+            "sections": sorted(self._sections),
+            "saves": self.saves,
+            "last_saved_at": self.last_saved_at,
+            "last_save_ms": round(self.last_save_ms, 1),
+            "last_bytes": self.last_bytes,
+            "load_ms": round(self.load_ms, 1),
+            "restored": self.restored,
+            "skipped": self.skipped,
+        }
+
+
+cache_snapshot = CacheSnapshot()
+metrics.register("cache_snapshot", cache_snapshot.stats)
@@ -0,0 +1,169 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+from cdp import Wallet, WalletData
+
+from . import metrics
+from .cdp_service import ensure_cdp_configured
+from .keystore import WALLET_KEYSTORE_PATH, load_wallet_record, save_wallet_record
+from .log_service import get_logger
+from .serialization import DecodeError, read_file, write_file
+
+logger = get_logger(__name__)
+
+POOL_PATH = os.path.join(os.path.dirname(WALLET_KEYSTORE_PATH), "wallet_pool.json")
+
+
+class WalletPool:
+    """
+    Pre-created CDP wallets ready to be handed to new agents.
+
+    A background thread tops the pool up to `high` ready wallets whenever it
+    drops to `low` or below. Every pooled wallet is exported and saved to the
+    keystore before it becomes claimable, and the list of ready wallet IDs is
+    persisted, so the pool survives restarts. `claim()` pops a wallet
+    atomically and never blocks: it returns None when the pool is empty and
+    the caller creates a wallet inline as before.
+    """
+
+    def __init__(self, low: int, high: int, path: str = POOL_PATH):
+        self.low = low
+        self.high = max(high, low)
+        self.path = path
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        # (wallet_id, Wallet) for wallets created by this process; Wallet is
+        # None for IDs restored from disk, which are imported on claim.
+        self._ready: Deque[Tuple[str, Optional[Wallet]]] = deque()
+        self._thread: Optional[threading.Thread] = None
+        self.created = 0
+        self.claimed = 0
+        self.misses = 0
+        self.failures = 0
+        self.create_ms_total = 0.0
+        self.last_refill_ms = 0.0
+        self.refilling = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.high > 0
+
+    def _persist_locked(self):
+        write_file(self.path, [wallet_id for wallet_id, _ in self._ready], fsync=True)
+
+    def start(self) -> int:
+        """Restore the persisted pool and start the refill thread. Returns the restored depth."""
+        if not self.enabled or self._thread is not None:
+            return len(self._ready)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        try:
+            restored = read_file(self.path) if os.path.exists(self.path) else []
+        except (OSError, DecodeError) as e:
+            logger.warning("wallet_pool_restore_failed", error=str(e))
+            restored = []
+        with self._lock:
+            self._ready.extend((wallet_id, None) for wallet_id in restored)
+        self._thread = threading.Thread(target=self._run, name="wallet-pool", daemon=True)
+        self._thread.start()
+        self._wakeup.set()
+        logger.info("wallet_pool_started", restored=len(restored), low=self.low, high=self.high)
+        return len(restored)
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def claim(self) -> Optional[Tuple[str, Wallet]]:
+        """Take a ready wallet as (wallet_id, Wallet), or None if the pool is empty or disabled."""
+        if not self.enabled:
+            return None
+        while True:
+            with self._lock:
+                if not self._ready:
+                    self.misses += 1
+                    self._wakeup.set()
+                    return None
+                wallet_id, wallet = self._ready.popleft()
+                # Persist the removal before handing the wallet out, so it can never be claimed twice.
+                self._persist_locked()
+                if len(self._ready) <= self.low:
+                    self._wakeup.set()
+            if wallet is None:
+                wallet = self._import(wallet_id)
+                if wallet is None:
+                    continue
+            self.claimed += 1
+            return wallet_id, wallet
+
+    @staticmethod
+    def _import(wallet_id: str) -> Optional[Wallet]:
+        record = load_wallet_record(wallet_id)
+        if record is None:
+            logger.warning("pooled_wallet_missing", wallet_id=wallet_id)
+            return None
+        try:
+            return Wallet.import_data(WalletData(wallet_id=record["wallet_id"], seed=record["seed"]))
+        except Exception as e:
+            logger.error("pooled_wallet_import_failed", wallet_id=wallet_id, error=str(e))
+            return None
+
+    def _create_one(self):
+        start = time.perf_counter()
+        wallet = Wallet.create()
+        data = wallet.export_data()
+        save_wallet_record(data, wallet.default_address.address_id)
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._ready.append((data.wallet_id, wallet))
+            self._persist_locked()
+        self.created += 1
+        self.create_ms_total += elapsed
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait()
+            self._wakeup.clear()
+            if self._stop.is_set() or len(self._ready) > self.low or not ensure_cdp_configured():
+                continue
+            self.refilling = True
+            start = time.perf_counter()
+            added = 0
+            while len(self._ready) < self.high and not self._stop.is_set():
+                try:
+                    self._create_one()
+                    added += 1
+                except Exception as e:
+                    self.failures += 1
+                    logger.error("wallet_pool_create_failed", error=str(e))
+                    # Back off instead of hammering the API; retried on the next wakeup.
+                    self._stop.wait(5)
+                    self._wakeup.set()
+                    break
+            self.last_refill_ms = (time.perf_counter() - start) * 1000
+            self.refilling = False
+            if added:
+                logger.info("wallet_pool_refilled", added=added, depth=len(self._ready),
+                            ms=round(self.last_refill_ms, 1))
+
+    def stats(self) -> dict:
+        return {
+            "depth": len(self._ready),
+            "low": self.low,
+            "high": self.high,
+            "refilling": self.refilling,
+            "created": self.created,
+            "claimed": self.claimed,
+            "misses": self.misses,
+            "failures": self.failures,
+            "avg_create_ms": round(self.create_ms_total / self.created, 1) if self.created else 0.0,
+            "last_refill_ms": round(self.last_refill_ms, 1),
+        }
+
+
+wallet_pool = WalletPool(low=int(os.getenv("WALLET_POOL_LOW", "2")),
+                         high=int(os.getenv("WALLET_POOL_HIGH", "8")))
+metrics.register("wallet_pool", wallet_pool.stats)
@@ -0,0 +1,87 @@
+import asyncio
+import time
+from typing import Callable, Dict, Optional
+
+from .log_service import get_logger
+
+logger = get_logger(__name__)
+
+
+class WarmupStep:
+    def __init__(self, name: str, fn: Callable[[], object], required: bool = True):
+        self.name = name
+        self.fn = fn
+        self.required = required
+        self.status = "pending"
+        self.duration_ms: Optional[float] = None
+        self.result: object = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        entry = {"status": self.status, "required": self.required}
+        if self.duration_ms is not None:
+            entry["duration_ms"] = self.duration_ms
+        if self.result is not None:
+            entry["result"] = self.result
+        if self.error is not None:
+            entry["error"] = self.error
+        return entry
+
+
+class Warmup:
+    """
+    Startup warm-up tracker.
+
+    Steps are blocking callables that run concurrently in worker threads. The
+    instance is ready once every required step has succeeded; optional steps
+    only need to have finished, whatever their outcome.
+    """
+
+    def __init__(self):
+        self.steps: Dict[str, WarmupStep] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def add(self, name: str, fn: Callable[[], object], required: bool = True):
+        self.steps[name] = WarmupStep(name, fn, required)
+
+    async def run(self):
+        self.started_at = time.time()
+        await asyncio.gather(*(self._run_step(step) for step in self.steps.values()))
+        self.finished_at = time.time()
+        logger.info("warmup_finished", ready=self.ready,
+                    seconds=round(self.finished_at - self.started_at, 2))
+
+    async def _run_step(self, step: WarmupStep):
+        step.status = "running"
+        start = time.perf_counter()
+        try:
+            result = await asyncio.to_thread(step.fn)
+            if result is False:
+                raise RuntimeError("step reported failure")
+            step.result = result if isinstance(result, (int, float, str, dict)) else None
+            step.status = "done"
+        except Exception as e:
+            step.status = "failed"
+            step.error = str(e)
+            logger.error("warmup_step_failed", step=step.name, required=step.required, error=str(e))
+        step.duration_ms = round((time.perf_counter() - start) * 1000, 2)
+
+    @property
+    def ready(self) -> bool:
+        return all(
+            step.status == "done" if step.required else step.status in ("done", "failed")
+            for step in self.steps.values()
+        )
+
+    def progress(self) -> dict:
+        finished = sum(step.status in ("done", "failed") for step in self.steps.values())
+        return {
+            "ready": self.ready,
+            "completed": finished,
+            "total": len(self.steps),
+            "steps": {name: step.to_dict() for name, step in self.steps.items()},
+        }
+
+
+warmup = Warmup()
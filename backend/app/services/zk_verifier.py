@@ -0,0 +1,103 @@
+import asyncio
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from . import metrics
+from .file_service import CircuitFileService, circuit_files
+from .groth16 import key_fingerprint, verify_chunk
+from .log_service import get_logger
+from .serialization import dumps
+
+logger = get_logger(__name__)
+
+VERIFY_WORKERS = int(os.getenv("ZK_VERIFY_WORKERS", str(os.cpu_count() or 1)))
+# Smaller chunks spread a batch over more workers; larger ones amortize more pairings.
+MIN_CHUNK = int(os.getenv("ZK_VERIFY_MIN_CHUNK", "4"))
+
+
+class ProofVerifier:
+    """
+    Groth16 verification for the circuits in a CircuitFileService.
+
+    A batch is split into one chunk per worker process; each chunk is checked
+    with a single randomized batch equation (see groth16.batch_check) and
+    only split further if it fails. Workers keep prepared verification keys
+    between calls, so a circuit's fixed pairing is computed once per worker.
+    With `workers <= 1` chunks run in the threadpool instead.
+    """
+
+    def __init__(self, files: CircuitFileService, workers: int = VERIFY_WORKERS):
+        self.files = files
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.proofs = 0
+        self.rejected = 0
+        self.seconds = 0.0
+
+    def _executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers <= 1:
+            return None
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    # spawn: the server process has threads, which fork doesn't copy safely.
+                    self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def _chunks(self, items: Sequence) -> List[Sequence]:
+        count = max(1, min(max(self.workers, 1), len(items) // MIN_CHUNK or 1))
+        size = math.ceil(len(items) / count)
+        return [items[start:start + size] for start in range(0, len(items), size)]
+
+    async def verify(self, circuit_name: str, items: Sequence[Tuple[dict, Sequence]]) -> List[Optional[str]]:
+        """Per item None if the proof is valid, else the reason it was rejected. Raises KeyError for unknown circuits."""
+        vkey = self.files.read_verification_key(circuit_name)
+        if vkey is None or not self.files.verify_circuit_files(circuit_name):
+            raise KeyError(circuit_name)
+        fingerprint = key_fingerprint(dumps(vkey))
+        start = time.perf_counter()
+        pool = self._executor()
+        chunks = self._chunks(items)
+        if pool is None:
+            parts = [await run_in_threadpool(verify_chunk, fingerprint, vkey, chunk) for chunk in chunks]
+        else:
+            loop = asyncio.get_running_loop()
+            parts = await asyncio.gather(*(loop.run_in_executor(pool, verify_chunk, fingerprint, vkey, chunk)
+                                           for chunk in chunks))
+        results = [result for part in parts for result in part]
+        elapsed = time.perf_counter() - start
+        rejected = sum(result is not None for result in results)
+        self.batches += 1
+        self.proofs += len(results)
+        self.rejected += rejected
+        self.seconds += elapsed
+        logger.info("proofs_verified", circuit=circuit_name, proofs=len(results), rejected=rejected,
+                    chunks=len(chunks), seconds=round(elapsed, 3))
+        return results
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "batches": self.batches,
+            "proofs": self.proofs,
+            "rejected": self.rejected,
+            "proofs_per_second": round(self.proofs / self.seconds, 2) if self.seconds else 0.0,
+        }
+
+
+proof_verifier = ProofVerifier(circuit_files)
+metrics.register("zk_verifier", proof_verifier.stats)
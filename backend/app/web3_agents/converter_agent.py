@@ -1,13 +1,17 @@
-from phi.model.google import Gemini
 from phi.agent import Agent, RunResponse
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
 import os
-from typing import List, Union
-from cdp import *
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 from cdp.errors import UnsupportedAssetError
 from decimal import Decimal
+from ens import ENS
 from web3 import Web3
+from web3.exceptions import ContractLogicError
+from ..services.client_pool import gemini_model
 
 
 load_dotenv()
@@ -17,6 +21,7 @@ class Function(BaseModel):
     task: str = Field(..., description="The task that needs to be done.")
     flow: str = Field(..., description="How the functions will be used to accomplish the task.")
     function: List[str] = Field(..., description="The functions needed to accomplish the task.")
+    depends_on: List[int] = Field(default_factory=list, description="Zero-based indices of earlier tasks whose results this task needs.")
 
 
 class Functions(BaseModel):
@@ -30,6 +35,71 @@ L2_RESOLVER_ADDRESS_MAINNET = "0xC6d566A56A1aFf6508b41f6c90ff131615583BCD"
 L2_RESOLVER_ADDRESS_TESTNET = "0x6533C94869D28fAA8dF77cc63f9e2b2D6Cf77eBA"
 
 
+# Minimal ABIs for the calls made below
+l2_resolver_abi = [
+    {
+        "inputs": [{"internalType": "bytes32", "name": "node", "type": "bytes32"},
+                   {"internalType": "address", "name": "a", "type": "address"}],
+        "name": "setAddr",
+        "outputs": [],
+        "stateMutability": "nonpayable",
+        "type": "function",
+    },
+    {
+        "inputs": [{"internalType": "bytes32", "name": "node", "type": "bytes32"},
+                   {"internalType": "string", "name": "newName", "type": "string"}],
+        "name": "setName",
+        "outputs": [],
+        "stateMutability": "nonpayable",
+        "type": "function",
+    },
+]
+
+registrar_abi = [
+    {
+        "inputs": [{
+            "components": [
+                {"internalType": "string", "name": "name", "type": "string"},
+                {"internalType": "address", "name": "owner", "type": "address"},
+                {"internalType": "uint256", "name": "duration", "type": "uint256"},
+                {"internalType": "address", "name": "resolver", "type": "address"},
+                {"internalType": "bytes[]", "name": "data", "type": "bytes[]"},
+                {"internalType": "bool", "name": "reverseRecord", "type": "bool"},
+            ],
+            "internalType": "struct RegistrarController.RegisterRequest",
+            "name": "request",
+            "type": "tuple",
+        }],
+        "name": "register",
+        "outputs": [],
+        "stateMutability": "payable",
+        "type": "function",
+    },
+]
+
+# Encoding needs no provider, so one offline instance and contract object serve every call.
+_w3 = Web3()
+_resolver_contract = _w3.eth.contract(abi=l2_resolver_abi)
+
+BASENAME_REGISTRATION_WORKERS = int(os.getenv("BASENAME_REGISTRATION_WORKERS", "8"))
+# Upper bound on the ETH paid per registration; a year of a 5+ character name costs far less.
+BASENAME_MAX_AMOUNT = float(os.getenv("BASENAME_MAX_AMOUNT", "0.01"))
+
+
+@lru_cache(maxsize=4096)
+def namehash(name: str) -> bytes:
+    """ENS namehash of `name`, memoized."""
+    return bytes(ENS.namehash(name))
+
+
+@lru_cache(maxsize=4096)
+def _resolver_calldata(base_name: str, address_id: str) -> Tuple[str, str]:
+    name_hash = namehash(base_name)
+    address_data = _resolver_contract.encode_abi("setAddr", args=[name_hash, address_id])
+    name_data = _resolver_contract.encode_abi("setName", args=[name_hash, base_name])
+    return address_data, name_data
+
+
 # Function to create registration arguments for Basenames
 def create_register_contract_method_args(base_name: str, address_id: str,
                                          is_mainnet: bool) -> dict:
@@ -44,17 +114,7 @@ def create_register_contract_method_args(base_name: str, address_id: str,
     Returns:
         dict: Formatted arguments for the register contract method
     """
-    w3 = Web3()
-
-    resolver_contract = w3.eth.contract(abi=l2_resolver_abi)
-
-    name_hash = w3.ens.namehash(base_name)
-
-    address_data = resolver_contract.encode_abi("setAddr",
-                                                args=[name_hash, address_id])
-
-    name_data = resolver_contract.encode_abi("setName",
-                                             args=[name_hash, base_name])
+    address_data, name_data = _resolver_calldata(base_name, address_id)
 
     register_args = {
         "request": [
@@ -72,41 +132,50 @@ def create_register_contract_method_args(base_name: str, address_id: str,
     return register_args
 
 
+def _submit_registration(wallet, basename: str, amount: float):
+    """Broadcast the register call for `basename` from `wallet` without waiting for it to land."""
+    if not 0 < amount <= BASENAME_MAX_AMOUNT:
+        raise ValueError(f"amount must be greater than 0 and at most {BASENAME_MAX_AMOUNT} ETH")
+    address_id = wallet.default_address.address_id
+    is_mainnet = wallet.network_id == "base-mainnet"
+
+    suffix = ".base.eth" if is_mainnet else ".basetest.eth"
+    if not basename.endswith(suffix):
+        basename += suffix
+
+    register_args = create_register_contract_method_args(
+        basename, address_id, is_mainnet)
+
+    contract_address = (BASENAMES_REGISTRAR_CONTROLLER_ADDRESS_MAINNET
+                        if is_mainnet else
+                        BASENAMES_REGISTRAR_CONTROLLER_ADDRESS_TESTNET)
+
+    invocation = wallet.invoke_contract(
+        contract_address=contract_address,
+        method="register",
+        args=register_args,
+        abi=registrar_abi,
+        amount=amount,
+        asset_id="eth",
+    )
+    return invocation, basename, address_id
+
+
 # Function to register a basename
-def register_basename(basename: str, amount: float = 0.002):
+def register_basename(wallet, basename: str, amount: float = 0.002):
     """
-    Register a basename for the agent's wallet.
+    Register a basename for an agent's wallet.
     
     Args:
+        wallet: The CDP wallet to register the basename for
         basename (str): The basename to register (e.g. "myname.base.eth" or "myname.basetest.eth")
         amount (float): Amount of ETH to pay for registration (default 0.002)
     
     Returns:
         str: Status message about the basename registration
     """
-    address_id = agent_wallet.default_address.address_id
-    is_mainnet = agent_wallet.network_id == "base-mainnet"
-
-    suffix = ".base.eth" if is_mainnet else ".basetest.eth"
-    if not basename.endswith(suffix):
-        basename += suffix
-
-    register_args = create_register_contract_method_args(
-        basename, address_id, is_mainnet)
-
     try:
-        contract_address = (BASENAMES_REGISTRAR_CONTROLLER_ADDRESS_MAINNET
-                            if is_mainnet else
-                            BASENAMES_REGISTRAR_CONTROLLER_ADDRESS_TESTNET)
-
-        invocation = agent_wallet.invoke_contract(
-            contract_address=contract_address,
-            method="register",
-            args=register_args,
-            abi=registrar_abi,
-            amount=amount,
-            asset_id="eth",
-        )
+        invocation, basename, address_id = _submit_registration(wallet, basename, amount)
         invocation.wait()
         return f"Successfully registered basename {basename} for address {address_id}"
     except ContractLogicError as e:
@@ -114,46 +183,167 @@ def register_basename(basename: str, amount: float = 0.002):
     except Exception as e:
         return f"Unexpected error registering basename: {str(e)}"
 
+
+def register_basenames(registrations: Sequence[Tuple[object, str]], amount: float = 0.002) -> List[str]:
+    """
+    Register many basenames, possibly for many wallets, as one pipelined operation.
+
+    All register calls are broadcast first (wallets in parallel, each wallet's
+    calls in order), then every transaction is awaited concurrently, so the
+    total time is about one confirmation rather than one per name.
+    
+    Args:
+        registrations: (wallet, basename) pairs
+        amount (float): Amount of ETH to pay per registration (default 0.002)
+    
+    Returns:
+        List[str]: A status message per registration, in input order
+    """
+    results: List[Optional[str]] = [None] * len(registrations)
+    if not registrations:
+        return []
+    by_wallet: Dict[str, List[int]] = {}
+    for index, (wallet, _) in enumerate(registrations):
+        by_wallet.setdefault(wallet.id, []).append(index)
+    submitted: Dict[int, tuple] = {}
+
+    def submit(indices: List[int]):
+        for index in indices:
+            wallet, basename = registrations[index]
+            try:
+                submitted[index] = _submit_registration(wallet, basename, amount)
+            except Exception as e:
+                results[index] = f"Error registering basename {basename}: {str(e)}"
+
+    def wait(index: int):
+        invocation, basename, address_id = submitted[index]
+        try:
+            invocation.wait()
+            results[index] = f"Successfully registered basename {basename} for address {address_id}"
+        except Exception as e:
+            results[index] = f"Error registering basename {basename}: {str(e)}"
+
+    workers = max(1, min(BASENAME_REGISTRATION_WORKERS, len(registrations)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(submit, by_wallet.values()))
+        list(pool.map(wait, list(submitted)))
+    return results
+
+# Functions the converter may assign to tasks. Read-only: shared by every concurrent conversion.
+FUNCTION_CATALOG = MappingProxyType({
+    "create_token": "Create a new ERC-20 token with a specified name, symbol, and initial supply.",
+    "transfer_asset": "Transfer an asset to a specific address, checking balances and handling gasless transfers.",
+    "get_balance": "Get the balance of a specific asset in the agent's wallet.",
+    "request_eth_from_faucet": "Request ETH from the Base Sepolia testnet faucet.",
+    # "generate_art": "Generate art using DALL-E based on a text prompt.",
+    "deploy_nft": "Deploy an ERC-721 NFT contract with a specified name, symbol, and base URI.",
+    "mint_nft": "Mint an NFT to a specified address from a given contract.",
+    "swap_assets": "Swap one asset for another using the trade function, available only on Base Mainnet.",
+    "check_content_access": "Check whether a user has access to a piece of content on the Web3Bridge contract.",
+    "get_creator_content": "List the content a creator has uploaded to the Web3Bridge contract.",
+    "get_user_profile": "Get a user's registered username and reputation on the Web3Bridge contract.",
+    "get_nft_metadata": "Get the IPFS metadata hash uploaded for an NFT.",
+    # "create_register_contract_method_args": "Create registration arguments for Basenames.",
+    "register_basename": "Register a basename for the agent's wallet."
+})
+
+CONVERTER_DESCRIPTION = (
+    "You are a highly skilled web3 developer with expertise in transitioning web2 applications to web3."
+    "Your role is to critically assess the web2 application and recommend essential web3 functionalities only when they are truly needed."
+)
+
+CONVERTER_INSTRUCTIONS = (
+    "You will receive a detailed description of a web2 application.",
+    f"The current functionalities you can provide are:\n{dict(FUNCTION_CATALOG)}",
+    "Evaluate the provided functions and select only those that are necessary for enhancing the web2 application with web3 capabilities.",
+    "Keep in mind that you need to give different tasks which can be implemented to bring web3 and the list should contain all the funtions needed to do the task."
+    "For each task, list the necessary functions required to accomplish it.",
+    "If a task requires only one function, provide just that function's name in the list.",
+    "If a task needs the result of earlier tasks (e.g. minting needs the deployed contract's address), list their zero-based indices in depends_on; leave it empty for independent tasks.",
+    "For each recommended function, provide a clear justification for its necessity and explain how it can be effectively integrated into the web3 application.",
+)
+
+
+class PlannedTask:
+    """One immutable task of a ConversionPlan."""
+
+    __slots__ = ("task", "flow", "functions", "depends_on")
+
+    def __init__(self, task: str, flow: str, functions: Tuple[str, ...], depends_on: Tuple[int, ...]):
+        object.__setattr__(self, "task", task)
+        object.__setattr__(self, "flow", flow)
+        object.__setattr__(self, "functions", functions)
+        object.__setattr__(self, "depends_on", depends_on)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("PlannedTask is immutable")
+
+    def to_dict(self) -> dict:
+        return {"task": self.task, "flow": self.flow, "functions": list(self.functions),
+                "depends_on": list(self.depends_on)}
+
+
+class ConversionPlan:
+    """The converter's answer for one prompt: an immutable tuple of tasks."""
+
+    __slots__ = ("tasks",)
+
+    def __init__(self, tasks: Tuple[PlannedTask, ...]):
+        object.__setattr__(self, "tasks", tasks)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ConversionPlan is immutable")
+
+    def __iter__(self):
+        return iter(self.tasks)
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+    def __getitem__(self, index: int) -> PlannedTask:
+        return self.tasks[index]
+
+    @property
+    def functions(self) -> Tuple[Tuple[str, ...], ...]:
+        """Function names per task, the shape the old `Web3Converter.functions` attribute had after run()."""
+        return tuple(task.functions for task in self.tasks)
+
+
 class Web3Converter:
-    def __init__(self):
-        self.functions = {
-            "create_token": "Create a new ERC-20 token with a specified name, symbol, and initial supply.",
-            "transfer_asset": "Transfer an asset to a specific address, checking balances and handling gasless transfers.",
-            "get_balance": "Get the balance of a specific asset in the agent's wallet.",
-            "request_eth_from_faucet": "Request ETH from the Base Sepolia testnet faucet.",
-            # "generate_art": "Generate art using DALL-E based on a text prompt.",
-            "deploy_nft": "Deploy an ERC-721 NFT contract with a specified name, symbol, and base URI.",
-            "mint_nft": "Mint an NFT to a specified address from a given contract.",
-            "swap_assets": "Swap one asset for another using the trade function, available only on Base Mainnet.",
-            # "create_register_contract_method_args": "Create registration arguments for Basenames.",
-            # "register_basename": "Register a basename for the agent's wallet."
-        }
-        self.converter = Agent(
-            model=Gemini(model='gemini-2.0-flash-exp', api_key=os.getenv("GEMINI_API_KEY")),
-            description=(
-                "You are a highly skilled web3 developer with expertise in transitioning web2 applications to web3."
-                "Your role is to critically assess the web2 application and recommend essential web3 functionalities only when they are truly needed."
-            ),
-            instructions=[
-                "You will receive a detailed description of a web2 application.",
-                f"The current functionalities you can provide are:\n{self.functions}",
-                "Evaluate the provided functions and select only those that are necessary for enhancing the web2 application with web3 capabilities.",
-                "Keep in mind that you need to give different tasks which can be implemented to bring web3 and the list should contain all the funtions needed to do the task."
-                "For each task, list the necessary functions required to accomplish it.",
-                "If a task requires only one function, provide just that function's name in the list.",
-                "For each recommended function, provide a clear justification for its necessity and explain how it can be effectively integrated into the web3 application.",
-            ],
+    """
+    Turns a web2 app description into a plan of web3 tasks.
+
+    Stateless: every call builds its own model agent (phi agents keep per-run
+    memory) and returns a new ConversionPlan, so one converter can serve any
+    number of threads or tasks at once without locking.
+    """
+
+    functions = FUNCTION_CATALOG
+
+    def _agent(self) -> Agent:
+        return Agent(
+            model=gemini_model(),
+            description=CONVERTER_DESCRIPTION,
+            instructions=list(CONVERTER_INSTRUCTIONS),
             response_model=Functions,
             debug_mode=True
         )
 
+    def plan(self, user_prompt: str) -> ConversionPlan:
+        run: RunResponse = self._agent().run(user_prompt)
+        tasks = []
+        for index, funcs in enumerate(run.content.functions):
+            tasks.append(PlannedTask(
+                task=funcs.task,
+                flow=funcs.flow,
+                functions=tuple(funcs.function),
+                # Only backward edges, so a bad model answer can't produce a cycle.
+                depends_on=tuple(sorted({dep for dep in funcs.depends_on if 0 <= dep < index})),
+            ))
+        return ConversionPlan(tuple(tasks))
+
+    # Older name, kept for callers; it now returns the plan instead of storing it.
+    run = plan
 
-    def run(self, user_prompt):
-        run: RunResponse = self.converter.run(user_prompt)
-        self.functions = []
-        for funcs in run.content.functions:
-            tool = []
-            for func in funcs.function:
-                tool.append(func)
-            self.functions.append(tool)
 
+web3_converter = Web3Converter()
@@ -1,14 +1,17 @@
-from .converter_agent import Web3Converter
+from .converter_agent import web3_converter, register_basenames
 from .onchain_agent import OnChainAgents, load_agent, ask_agent
-from typing import List, Optional
+from typing import List, Optional, Sequence, Tuple
+from ..services.log_service import get_logger
+
+logger = get_logger(__name__)
 
 class Web3AgentManager:
     def __init__(self, user_id: str):
         self.user_id = user_id
-        self.web3_converter = Web3Converter()
+        # Stateless and shared by every manager; it returns each plan instead of storing it.
+        self.web3_converter = web3_converter
         self.agents: List[OnChainAgents] = []
         self._instance_id = id(self)
-        print(f"Initialized Web3AgentManager with ID: {self._instance_id}")
         
     def initialize_agents(self, function_names: List[str], wallet_id: Optional[str] = None) -> OnChainAgents:
         """Initialize agents based on wallet_id, function_names, and optionally wallet_address"""
@@ -16,57 +19,73 @@ class Web3AgentManager:
             # Load existing agent using wallet_address
             agent = load_agent(wallet_id=wallet_id, functions=function_names)
             agent.wallet_id = wallet_id
-            print(f"Initialized existing agent with wallet address: {wallet_id}")
         else:
             # Create a new agent
             agent = load_agent(functions=function_names)
-            print(f"Initialized new agent with wallet ID: {wallet_id} and functions: {function_names}")
+            logger.info("web3_agent_initialized", wallet_id=agent.wallet_id, functions=function_names)
 
         return agent
 
     def create_agents(self, prompt: str) -> List[OnChainAgents]:
         """Create agents based on the prompt"""
         try:
-            print(f"Creating agents with manager {self._instance_id}")
-            self.web3_converter.run(prompt)
+            plan = self.web3_converter.plan(prompt)
+            functions = [list(task.functions) for task in plan]
             agent_counter = 1
             
-            functions = self.web3_converter.functions
-            print(f"\nAvailable functions for manager {self._instance_id}:", functions)
-            
-            # Clear existing agents
-            self.agents = []
+            logger.debug("converter_plan", manager=self._instance_id, functions=functions)
             
             # Create a list to store all created agents
             created_agents = []
+            # Plan task index -> index in created_agents, to remap dependencies
+            # when a task's agent could not be created.
+            positions = {}
             
-            for func_list in functions:
+            for task_index, func_list in enumerate(functions):
                 try:
                     if isinstance(func_list, list):
                         agent_name = f"agent{agent_counter}"
                         # Create a new agent and append it to the list
                         agent = self.initialize_agents(function_names=func_list)
+                        step = plan[task_index]
+                        agent.task = step.task
+                        agent.flow = step.flow
+                        agent.depends_on = [positions[dep] for dep in step.depends_on if dep in positions]
+                        positions[task_index] = len(created_agents)
                         created_agents.append(agent)
                         agent_counter += 1
                 except Exception as e:
-                    print(f"Error creating agent: {str(e)}")
+                    logger.error("web3_agent_create_failed", manager=self._instance_id, error=str(e))
                     continue
             
-            # Update the class's agents list with all created agents
+            # Publish the new list in one assignment; return our own list, since a
+            # concurrent call for the same user may publish after us.
             self.agents = created_agents
             
-            print(f"\nManager {self._instance_id} created {len(self.agents)} agents")
-            return self.agents
+            logger.info("web3_agents_ready", manager=self._instance_id, count=len(created_agents))
+            return created_agents
             
         except Exception as e:
-            print(f"Error in create_agents: {str(e)}")
+            logger.error("create_agents_failed", manager=self._instance_id, error=str(e))
             raise
     
-    def run_agent(self, functions:List[str], wallet_id: str, agent_index: int, prompt: str) -> str:
+    def run_agent(self, functions:List[str], wallet_id: str, agent_index: int, prompt: str,
+                  raise_errors: bool = False) -> str:
         """Run a specific agent with the given prompt"""
         agent = self.initialize_agents(function_names=functions, wallet_id=wallet_id)            
-        return ask_agent(agent, prompt)
+        return ask_agent(agent, prompt, raise_errors=raise_errors)
     
+    def register_basenames(self, registrations: Sequence[Tuple[str, str]], amount: float = 0.002) -> List[str]:
+        """Register (wallet_id, basename) pairs in one pipelined batch; one status message per pair"""
+        wallets = {}
+        for wallet_id, _ in registrations:
+            if wallet_id not in wallets:
+                wallets[wallet_id] = OnChainAgents(wallet_id=wallet_id).wallet
+        results = register_basenames([(wallets[wallet_id], basename) for wallet_id, basename in registrations], amount)
+        logger.info("basenames_registered", manager=self._instance_id, count=len(results),
+                    failed=sum(not result.startswith("Successfully") for result in results))
+        return results
+
     def get_agents(self) -> List[OnChainAgents]:
         """Get all created agents"""
         return self.agents
\ No newline at end of file
@@ -1,16 +1,23 @@
 from dotenv import load_dotenv
 from cdp import *
-import os
-import json
-from phi.model.google import Gemini
 from phi.agent import Agent, RunResponse
 from cdp.errors import UnsupportedAssetError
 from typing import Optional, List, Union
 from decimal import Decimal
 from pydantic import BaseModel
+from ..services.log_service import get_logger
+from ..services.keystore import load_wallet_record, save_wallet_record
+from ..services.cdp_service import ensure_cdp_configured, fetch_balance
+from ..services.client_pool import gemini_model
+from ..services.intent_router import intent_router
+from ..services.event_indexer import event_store
+from ..services.wallet_pool import wallet_pool
+from .converter_agent import register_basename as register_wallet_basename
 
 load_dotenv()
 
+logger = get_logger(__name__)
+
 # # Function to get the balance of a specific asset
 # def get_balance(asset_id):
 #     """
@@ -26,29 +33,6 @@ load_dotenv()
 #     return f"Current balance of {asset_id}: {balance}"
 
 
-def configure_cdp():
-    try:
-        API_KEY_NAME = os.environ.get("CDP_API_KEY_NAME")
-        PRIVATE_KEY = os.environ.get("CDP_PRIVATE_KEY", "")
-        
-        if not API_KEY_NAME or not PRIVATE_KEY:
-            raise ValueError("CDP credentials not found in environment variables")
-            
-        # Clean up private key - remove any extra quotes and properly handle newlines
-        PRIVATE_KEY = PRIVATE_KEY.strip('"').replace('\\n', '\n')
-        
-        print("Configuring CDP with:")
-        print(f"API Key Name: {API_KEY_NAME}")
-        print(f"Private Key Length: {len(PRIVATE_KEY)}")
-        
-        Cdp.configure(API_KEY_NAME, PRIVATE_KEY)
-        return True
-    except Exception as e:
-        print(f"Error configuring CDP: {str(e)}")
-        return False
-
-cdp_configured = configure_cdp()    
-
 class OnChainAgents:
     def __init__(self, wallet_id: Optional[str] = None):
         """
@@ -58,20 +42,30 @@ class OnChainAgents:
         Args:
             wallet_id: Optional ID of existing wallet to load
         """
-        if not cdp_configured:
+        if not ensure_cdp_configured():
             raise ValueError("CDP configuration failed. Check your credentials.")
         
-        self.WalletStorage = "wallet_storage"
-        os.makedirs(self.WalletStorage, exist_ok=True)
-        
-        # Initialize wallet
+        # Initialize wallet. Only freshly created wallets are marked dirty, so
+        # loading an existing wallet performs no export or file writes.
         self.wallet_id = wallet_id
+        self._dirty = False
+        # Filled in by Web3AgentManager.create_agents from the converter's plan.
+        self.task: Optional[str] = None
+        self.flow: Optional[str] = None
+        self.depends_on: List[int] = []
         self.wallet = self._initialize_wallet(wallet_id)
-        
-        # Save wallet data after initialization
-        if self.wallet:
+        self.persist()
+
+    def mark_dirty(self):
+        """Flag the wallet as changed so the next persist() writes it out."""
+        self._dirty = True
+
+    def persist(self):
+        """Export and save the wallet if it changed since it was loaded."""
+        if self.wallet and self._dirty:
             wallet_data = self.wallet.export_data()
             self._save_wallet(wallet_data)
+            self._dirty = False
     
     def _initialize_wallet(self, wallet_id: Optional[str] = None) -> Wallet:
         """Initialize wallet based on wallet_id or create new one"""
@@ -85,76 +79,53 @@ class OnChainAgents:
                         seed=wallet_data['seed']
                     )
                     wallet = Wallet.import_data(data)
-                    print(f"Loaded existing wallet: {wallet_id}")
                     return wallet
                 except Exception as e:
-                    print(f"Error importing wallet data: {str(e)}")
+                    logger.error("wallet_import_failed", wallet_id=wallet_id, error=str(e))
         
+        # Take a pre-created wallet; pooled wallets are already saved to the keystore.
+        claimed = wallet_pool.claim()
+        if claimed is not None:
+            self.wallet_id, wallet = claimed
+            logger.info("wallet_claimed_from_pool", wallet_id=self.wallet_id)
+            return wallet
+
         # Create new wallet if no wallet_id or wallet not found
         try:
             wallet = Wallet.create()
             wallet_data = wallet.export_data()
             self.wallet_id = wallet_data.wallet_id
-            print(f"Created new wallet: {self.wallet_id}")
+            self._dirty = True
+            logger.info("wallet_created", wallet_id=self.wallet_id)
             return wallet
         except Exception as e:
-            print(f"Error creating new wallet: {str(e)}")
+            logger.error("wallet_create_failed", error=str(e))
             raise
 
     def _load_wallet(self, wallet_id: str) -> Optional[dict]:
-        """Load wallet data from storage"""
-        file_path = os.path.join(self.WalletStorage, f"{wallet_id}.json")
+        """Load wallet data from the keystore"""
         try:
-            if os.path.exists(file_path):
-                with open(file_path, 'r') as file:
-                    data = json.load(file)
-                    print(f"Loaded wallet data for {wallet_id}")
-                    return data
-            else:
-                print(f"No wallet data found for ID: {wallet_id}")
+            data = load_wallet_record(wallet_id)
+            if data:
+                return data
+            logger.warning("wallet_not_found", wallet_id=wallet_id)
         except Exception as e:
-            print(f"Error loading wallet data: {str(e)}")
+            logger.error("wallet_load_failed", wallet_id=wallet_id, error=str(e))
         return None
     
     def _get_wallet_address(self):
         return self.wallet.default_address.address_id
     
     def _save_wallet(self, wallet_data: WalletData):
-        """Save wallet data and update registry"""
+        """Save wallet data as an encrypted keystore record"""
         try:
-            # Save wallet data
-            file_path = os.path.join(self.WalletStorage, f"{wallet_data.wallet_id}.json")
-            with open(file_path, 'w') as file:
-                json.dump(wallet_data.to_dict(), file)
-            
-            # Save encrypted seed
-            seed_file = os.path.join(self.WalletStorage, f"{wallet_data.wallet_id}_seed.json")
-            self.wallet.save_seed(seed_file, encrypt=True)
-            
-            # Update registry
-            self._update_wallet_registry(wallet_data.wallet_id)
-            print(f"Wallet {wallet_data.wallet_id} saved successfully")
+            save_wallet_record(wallet_data, self._get_wallet_address())
+            logger.debug("wallet_saved", wallet_id=wallet_data.wallet_id)
             
         except Exception as e:
-            print(f"Error saving wallet data: {str(e)}")
+            logger.error("wallet_save_failed", wallet_id=wallet_data.wallet_id, error=str(e))
             raise
 
-    def _update_wallet_registry(self, wallet_id: str):
-        """Update the registry of wallet IDs"""
-        registry_file = os.path.join(self.WalletStorage, "wallet_registry.txt")
-        try:
-            existing_ids = set()
-            if os.path.exists(registry_file):
-                with open(registry_file, 'r') as file:
-                    existing_ids = set(file.read().splitlines())
-            
-            if wallet_id not in existing_ids:
-                with open(registry_file, 'a') as file:
-                    file.write(f"{wallet_id}\n")
-                print(f"Added {wallet_id} to registry")
-        except Exception as e:
-            print(f"Error updating registry: {str(e)}")
-
 def load_agent(wallet_id: Optional[str] = None, functions: Optional[List[str]] = None) -> OnChainAgents:
     """
     Load or create an OnChainAgent and equip it with specified functions.
@@ -183,9 +154,7 @@ def load_agent(wallet_id: Optional[str] = None, functions: Optional[List[str]] =
             Returns:
             str: A message confirming the token creation with details
             """
-            print(type(initial_supply))
             initial_supply = int(initial_supply)
-            print(type(initial_supply))
             deployed_contract = agent.wallet.deploy_token(name, symbol, initial_supply)
             deployed_contract.wait()
             return f"Token {name} ({symbol}) created with initial supply of {initial_supply} and contract address {deployed_contract.contract_address}"
@@ -247,7 +216,7 @@ def load_agent(wallet_id: Optional[str] = None, functions: Optional[List[str]] =
             Returns:
             str: A message showing the current balance of the specified asset.
             """
-            balance = agent.wallet.balance(asset_id)
+            balance = fetch_balance(agent.wallet, asset_id)
             return f"Current balance of {asset_id}: {balance}"
 
         # Function to request ETH from the faucet (testnet only)
@@ -366,6 +335,83 @@ def load_agent(wallet_id: Optional[str] = None, functions: Optional[List[str]] =
                 return f"Successfully swapped {amount} {from_asset_id} for {to_asset_id}"
             except Exception as e:
                 return f"Error swapping assets: {str(e)}"
+
+        # Function to register a basename for the agent's wallet
+        def register_basename(basename: str, amount: float = 0.002):
+            """
+            Register a basename for the agent's wallet.
+            
+            Parameters:
+            basename (str): The basename to register (e.g. "myname.base.eth" or "myname.basetest.eth")
+            amount (float): Amount of ETH to pay for registration (default 0.002)
+            
+            Returns:
+            str: Status message about the basename registration
+            """
+            return register_wallet_basename(agent.wallet, basename, amount)
+
+        # Lookups answered from the local index of Web3Bridge / EnhancedNFT events
+        def check_content_access(content_id: int, user_address: str):
+            """
+            Check whether a user has access to a piece of content on the Web3Bridge contract.
+            
+            Parameters:
+            content_id (int): ID of the content
+            user_address (str): Address of the user
+            
+            Returns:
+            str: Whether the user has access
+            """
+            if event_store.has_access(content_id, user_address):
+                return f"{user_address} has access to content {content_id}"
+            return f"{user_address} does not have access to content {content_id} (as of the last indexed block)"
+
+        def get_creator_content(creator_address: str):
+            """
+            List the content a creator has uploaded to the Web3Bridge contract, newest first.
+            
+            Parameters:
+            creator_address (str): Address of the creator
+            
+            Returns:
+            str: The content IDs and IPFS hashes uploaded by the creator
+            """
+            contents = event_store.contents_by_creator(creator_address)
+            if not contents:
+                return f"No content uploaded by {creator_address} has been indexed"
+            lines = [f"content {item['content_id']}: ipfs {item['ipfs_hash']} (block {item['block']})" for item in contents]
+            return f"Content uploaded by {creator_address}:\n" + "\n".join(lines)
+
+        def get_user_profile(user_address: str):
+            """
+            Get a user's registered username and reputation on the Web3Bridge contract.
+            
+            Parameters:
+            user_address (str): Address of the user
+            
+            Returns:
+            str: The user's username and reputation
+            """
+            profile = event_store.user_profile(user_address)
+            if profile is None:
+                return f"{user_address} is not a registered user"
+            return f"{user_address} is registered as {profile['username']} with reputation {profile['reputation']}"
+
+        def get_nft_metadata(token_id: int, contract_address: Optional[str] = None):
+            """
+            Get the IPFS metadata hash uploaded for an NFT.
+            
+            Parameters:
+            token_id (int): ID of the token
+            contract_address (str): Optional address of the NFT contract
+            
+            Returns:
+            str: The token's IPFS metadata hash
+            """
+            ipfs_hash = event_store.nft_metadata(token_id, contract_address)
+            if ipfs_hash is None:
+                return f"No metadata has been uploaded for token {token_id}"
+            return f"Metadata of token {token_id}: ipfs {ipfs_hash}"
             
         # Define available tools
         available_tools = {
@@ -376,6 +422,11 @@ def load_agent(wallet_id: Optional[str] = None, functions: Optional[List[str]] =
             'mint_nft': mint_nft,
             'swap_assets': swap_assets,
             'create_token': create_token,
+            'register_basename': register_basename,
+            'check_content_access': check_content_access,
+            'get_creator_content': get_creator_content,
+            'get_user_profile': get_user_profile,
+            'get_nft_metadata': get_nft_metadata,
             # Add other tools as needed
         }
         
@@ -386,32 +437,30 @@ def load_agent(wallet_id: Optional[str] = None, functions: Optional[List[str]] =
                 if func_name in available_tools:
                     tool_list.append(available_tools[func_name])
                 else:
-                    print(f"Warning: Function {func_name} not found")
+                    logger.warning("unknown_function", function=func_name)
             
             # Create the agent with the tools
             agent.function_names = functions
             agent.agent = Agent(
-                model=Gemini(
-                    model="gemini-2.0-flash-exp",
-                    api_key=os.environ.get("GEMINI_API_KEY")
-                ),
+                model=gemini_model(),
                 tools=tool_list
             )
-            print(f"Agent equipped with functions: {functions}")
+            logger.debug("agent_equipped", wallet_id=agent.wallet_id, functions=functions)
         
         return agent
         
     except Exception as e:
-        print(f"Error loading agent: {str(e)}")
+        logger.error("load_agent_failed", wallet_id=wallet_id, error=str(e))
         raise
 
-def ask_agent(agent: OnChainAgents, prompt: str) -> str:
+def ask_agent(agent: OnChainAgents, prompt: str, raise_errors: bool = False) -> str:
     """
     Run an agent with a prompt
     
     Args:
         agent: The OnChainAgent to run
         prompt: The prompt to run the agent with
+        raise_errors: Re-raise failures instead of returning them as the reply
     
     Returns:
         str: The agent's response
@@ -419,9 +468,21 @@ def ask_agent(agent: OnChainAgents, prompt: str) -> str:
     try:
         if not hasattr(agent, 'agent'):
             raise ValueError("Agent not initialized with functions")
+        # Answer plain address questions, and balance questions for agents that
+        # have get_balance, straight from the wallet.
+        intent = intent_router.classify(prompt)
+        if intent is not None:
+            if intent.kind == "balance" and "get_balance" not in agent.function_names:
+                intent_router.record_miss()
+            else:
+                reply = intent_router.answer(intent, agent.wallet)
+                if reply is not None:
+                    return reply
         response: RunResponse = agent.agent.run(prompt)
         return response.content
     except Exception as e:
+        if raise_errors:
+            raise
         return f"Error running agent: {str(e)}"
     
 # agent = load_agent(functions=["get_balance"])
@@ -0,0 +1,184 @@
+import asyncio
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from ..services.log_service import get_logger
+
+logger = get_logger(__name__)
+
+# Outputs of dependencies are quoted into the dependent's prompt up to this length.
+MAX_DEPENDENCY_CHARS = 2000
+
+
+class PlanError(ValueError):
+    """Raised when a plan's dependencies are invalid (unknown step or cycle)."""
+
+
+class PlanStep:
+    __slots__ = ("index", "name", "task", "flow", "functions", "wallet_id", "depends_on")
+
+    def __init__(self, index: int, name: str, functions: List[str], wallet_id: str,
+                 task: Optional[str] = None, flow: Optional[str] = None,
+                 depends_on: Sequence[int] = ()):
+        self.index = index
+        self.name = name
+        self.task = task
+        self.flow = flow
+        self.functions = list(functions)
+        self.wallet_id = wallet_id
+        self.depends_on = sorted(set(depends_on))
+
+    def to_dict(self) -> dict:
+        return {"step": self.index, "name": self.name, "task": self.task,
+                "functions": self.functions, "depends_on": self.depends_on}
+
+
+def topological_levels(steps: Sequence[PlanStep]) -> List[List[int]]:
+    """
+    Group step indices into levels: every step's dependencies are in earlier
+    levels, so the steps of one level can all run at once. Raises PlanError on
+    unknown dependencies or cycles.
+    """
+    by_index = {step.index: step for step in steps}
+    indegree = {}
+    dependents: Dict[int, List[int]] = {index: [] for index in by_index}
+    for step in steps:
+        for dep in step.depends_on:
+            if dep not in by_index:
+                raise PlanError(f"Step {step.index} depends on unknown step {dep}")
+            if dep == step.index:
+                raise PlanError(f"Step {step.index} depends on itself")
+            dependents[dep].append(step.index)
+        indegree[step.index] = len(step.depends_on)
+    levels = []
+    ready = sorted(index for index, degree in indegree.items() if degree == 0)
+    placed = 0
+    while ready:
+        levels.append(ready)
+        placed += len(ready)
+        following = []
+        for index in ready:
+            for dependent in dependents[index]:
+                indegree[dependent] -= 1
+                if indegree[dependent] == 0:
+                    following.append(dependent)
+        ready = sorted(following)
+    if placed != len(by_index):
+        stuck = sorted(index for index, degree in indegree.items() if degree > 0)
+        raise PlanError(f"Plan has a dependency cycle through steps {stuck}")
+    return levels
+
+
+def step_prompt(goal: str, step: PlanStep, outputs: Dict[int, str], steps: Dict[int, PlanStep]) -> str:
+    """The prompt one agent receives: the overall goal, its own task and its dependencies' results."""
+    parts = [goal]
+    if step.task:
+        parts.append(f"Your task: {step.task}")
+    if step.flow:
+        parts.append(f"How to do it: {step.flow}")
+    if step.depends_on:
+        lines = []
+        for dep in step.depends_on:
+            label = steps[dep].task or steps[dep].name
+            lines.append(f"- Step {dep} ({label}): {outputs[dep][:MAX_DEPENDENCY_CHARS]}")
+        parts.append("Results of the steps this one depends on:\n" + "\n".join(lines))
+    return "\n\n".join(parts)
+
+
+async def execute_plan(goal: str, steps: Sequence[PlanStep],
+                       run_step: Callable[[PlanStep, str], Awaitable[str]],
+                       max_parallel: int = 4) -> AsyncIterator[dict]:
+    """
+    Run a plan's steps as a dependency graph, yielding an event per state change.
+
+    A step starts as soon as all of its dependencies have succeeded, with at
+    most `max_parallel` steps in flight, and receives their outputs in its
+    prompt. If a step fails, everything downstream of it is skipped while
+    independent branches carry on. Events, in order of occurrence:
+
+        {"event": "plan", "steps": [...], "levels": [[0, 1], [2]]}
+        {"event": "started", "step": 0, "name": ..., "queued_ms": ...}
+        {"event": "finished", "step": 0, "status": "ok" | "failed", "output" | "error": ..., "elapsed_ms": ...}
+        {"event": "skipped", "step": 2, "reason": "dependency 0 failed"}
+        {"event": "done", "ok": 2, "failed": 0, "skipped": 0, "elapsed_ms": ..., "sequential_ms": ...}
+
+    `sequential_ms` is the sum of step times, i.e. what running them one after
+    another would have taken. Raises PlanError before yielding if the graph is
+    invalid.
+    """
+    levels = topological_levels(steps)
+    by_index = {step.index: step for step in steps}
+    waiting = {step.index: set(step.depends_on) for step in steps}
+    dependents: Dict[int, List[int]] = {index: [] for index in by_index}
+    for step in steps:
+        for dep in step.depends_on:
+            dependents[dep].append(step.index)
+
+    yield {"event": "plan", "steps": [step.to_dict() for step in steps], "levels": levels}
+
+    start = time.perf_counter()
+    outputs: Dict[int, str] = {}
+    status: Dict[int, str] = {}
+    step_ms = 0.0
+    ready = [index for index, deps in waiting.items() if not deps]
+    ready_at = {index: start for index in ready}
+    running: Dict[asyncio.Task, int] = {}
+
+    async def timed(step: PlanStep, prompt: str):
+        began = time.perf_counter()
+        try:
+            return await run_step(step, prompt), None, began
+        except Exception as e:
+            return None, e, began
+
+    try:
+        while ready or running:
+            while ready and len(running) < max_parallel:
+                index = ready.pop(0)
+                step = by_index[index]
+                prompt = step_prompt(goal, step, outputs, by_index)
+                running[asyncio.ensure_future(timed(step, prompt))] = index
+                yield {"event": "started", "step": index, "name": step.name,
+                       "queued_ms": round((time.perf_counter() - ready_at[index]) * 1000, 1)}
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=running.get):
+                index = running.pop(task)
+                output, error, began = task.result()
+                finished = time.perf_counter()
+                elapsed = (finished - began) * 1000
+                step_ms += elapsed
+                if error is None:
+                    status[index] = "ok"
+                    outputs[index] = output
+                    yield {"event": "finished", "step": index, "status": "ok", "output": output,
+                           "elapsed_ms": round(elapsed, 1)}
+                    for dependent in dependents[index]:
+                        waiting[dependent].discard(index)
+                        if not waiting[dependent] and dependent not in status:
+                            ready.append(dependent)
+                            ready_at[dependent] = finished
+                else:
+                    status[index] = "failed"
+                    logger.warning("plan_step_failed", step=index, error=str(error))
+                    yield {"event": "finished", "step": index, "status": "failed", "error": str(error),
+                           "elapsed_ms": round(elapsed, 1)}
+                    # Skip everything downstream of the failure.
+                    pending = [(dependent, index) for dependent in dependents[index]]
+                    while pending:
+                        dependent, cause = pending.pop()
+                        if dependent in status:
+                            continue
+                        status[dependent] = "skipped"
+                        yield {"event": "skipped", "step": dependent, "reason": f"dependency {cause} failed"}
+                        pending.extend((following, dependent) for following in dependents[dependent])
+    finally:
+        # Client went away or the caller stopped iterating: don't leave agents running unobserved.
+        for task in running:
+            task.cancel()
+
+    counts = {"ok": 0, "failed": 0, "skipped": 0}
+    for value in status.values():
+        counts[value] += 1
+    elapsed = (time.perf_counter() - start) * 1000
+    logger.info("plan_executed", steps=len(steps), levels=len(levels), elapsed_ms=round(elapsed, 1), **counts)
+    yield {"event": "done", **counts, "elapsed_ms": round(elapsed, 1), "sequential_ms": round(step_ms, 1)}
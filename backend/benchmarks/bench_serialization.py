@@ -0,0 +1,124 @@
+"""
+Microbenchmark for the serialization backends in app/services/serialization.py.
+
+Encodes and decodes payloads shaped like the ones the backend actually
+persists and serves, with every backend that is installed, and prints the
+time per operation and encoded size. Run from the backend directory:
+
+    python benchmarks/bench_serialization.py [--repeat 5]
+"""
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services import serialization  # noqa: E402
+
+random.seed(7)
+
+
+def _hex(n: int) -> str:
+    return "".join(random.choice("0123456789abcdef") for _ in range(n))
+
+
+def _text(words: int) -> str:
+    return " ".join("".join(random.choice(string.ascii_lowercase) for _ in range(random.randint(2, 9)))
+                    for _ in range(words))
+
+
+def agent_config() -> dict:
+    """DB/{address}.json as written by ChatbotAnalyzer.save_to_json."""
+    return {
+        "Tools": ["Exa", "Calculator", "Wikipedia"],
+        "Personality": _text(120),
+        "Instructions": _text(200),
+        "Concepts": [_text(2) for _ in range(8)],
+    }
+
+
+def wallet_record() -> dict:
+    """Keystore wallet record (exported WalletData plus default address)."""
+    return {"wallet_id": f"{_hex(8)}-{_hex(4)}-{_hex(4)}-{_hex(4)}-{_hex(12)}", "seed": _hex(64),
+            "network_id": "base-sepolia", "default_address_id": f"0x{_hex(40)}"}
+
+
+def conversation(turns: int) -> list:
+    """One wallet's turns in conversations.json."""
+    return [{"id": i + 1, "question": _text(15), "answer": _text(180), "timestamp": time.time()}
+            for i in range(turns)]
+
+
+def mapping(entries: int) -> dict:
+    """map.json: NFT hash -> wallet ID."""
+    return {f"0x{_hex(64)}": f"{_hex(8)}-{_hex(4)}-{_hex(4)}-{_hex(4)}-{_hex(12)}" for _ in range(entries)}
+
+
+def user_agents(agents: int) -> dict:
+    """The /aigent/user-agents/{user_id} response."""
+    return {"user_id": f"0x{_hex(40)}", "agents": [{
+        "nft_hash": f"0x{_hex(64)}", "wallet_id": _hex(32), "is_creator": True, "members": [],
+        "conversation": _text(60), "parsed_conversation": conversation(10), "total_conversations": 10,
+        "prev_cursor": None, "address": f"0x{_hex(40)}",
+        "personality": {"description": _text(120), "concepts": [_text(2)] * 5, "tools": ["Exa"]},
+    } for _ in range(agents)]}
+
+
+def journal_record() -> dict:
+    """A single conversation append line in conversations.json.journal."""
+    return {"op": "append", "k": _hex(32), "v": conversation(1)[0], "max": 1000}
+
+
+PAYLOADS = {
+    "journal_record": journal_record(),
+    "wallet_record": wallet_record(),
+    "agent_config": agent_config(),
+    "conversation_100": conversation(100),
+    "user_agents_20": user_agents(20),
+    "mapping_5000": mapping(5000),
+}
+
+
+def available_backends():
+    backends = {}
+    for name, loader in serialization._LOADERS.items():
+        try:
+            dumps, loads, _ = loader()
+        except ImportError:
+            continue
+        backends[name] = (dumps, loads)
+    # What the app did before: json with indent=4 on disk.
+    backends["json_indent4"] = (lambda obj, pretty=False: json.dumps(obj, indent=4).encode(), json.loads)
+    return backends
+
+
+def bench(fn, repeat: int) -> float:
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    backends = available_backends()
+    print(f"selected backend: {serialization.BACKEND}; measured: {', '.join(backends)}\n")
+    print(f"{'payload':<18}{'backend':<14}{'bytes':>10}{'encode us':>12}{'decode us':>12}")
+    for payload_name, payload in PAYLOADS.items():
+        for backend_name, (dumps, loads) in backends.items():
+            encoded = dumps(payload, False)
+            encode = bench(lambda: dumps(payload, False), args.repeat)
+            decode = bench(lambda: loads(encoded), args.repeat)
+            print(f"{payload_name:<18}{backend_name:<14}{len(encoded):>10}{encode * 1e6:>12.1f}{decode * 1e6:>12.1f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
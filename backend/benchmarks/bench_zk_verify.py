@@ -0,0 +1,100 @@
+"""
+Throughput benchmark for Groth16 proof verification in app/services/groth16.py.
+
+Builds a synthetic verification key and valid proofs from known trapdoors (no
+circuit or snarkjs needed), then reports proofs per second for one-by-one
+verification, a single randomized batch, and batches split over a process
+pool. Run from the backend directory:
+
+    python benchmarks/bench_zk_verify.py [--proofs 16] [--public 2] [--workers 4]
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from py_ecc.optimized_bn128 import G1, G2, curve_order, multiply, normalize  # noqa: E402
+
+from app.services import groth16  # noqa: E402
+
+
+def _g1(scalar: int) -> list:
+    x, y = normalize(multiply(G1, scalar))
+    return [str(x.n), str(y.n), "1"]
+
+
+def _g2(scalar: int) -> list:
+    x, y = normalize(multiply(G2, scalar))
+    return [[str(x.coeffs[0]), str(x.coeffs[1])], [str(y.coeffs[0]), str(y.coeffs[1])], ["1", "0"]]
+
+
+def synthetic(n_public: int, n_proofs: int, seed: int = 7):
+    """
+    A snarkjs-format key and proofs that satisfy
+    e(A, B) = e(alpha, beta) e(vk_x, gamma) e(C, delta), built by choosing every
+    discrete log and solving for C's.
+    """
+    rng = random.Random(seed)
+    alpha, beta, gamma, delta = (rng.randrange(1, curve_order) for _ in range(4))
+    ic = [rng.randrange(1, curve_order) for _ in range(n_public + 1)]
+    vkey = {"protocol": "groth16", "curve": "bn128", "nPublic": n_public, "vk_alpha_1": _g1(alpha),
+            "vk_beta_2": _g2(beta), "vk_gamma_2": _g2(gamma), "vk_delta_2": _g2(delta),
+            "IC": [_g1(scalar) for scalar in ic]}
+    items = []
+    for _ in range(n_proofs):
+        public = [rng.randrange(curve_order) for _ in range(n_public)]
+        vk_x = (ic[0] + sum(x * c for x, c in zip(public, ic[1:]))) % curve_order
+        a, b = rng.randrange(1, curve_order), rng.randrange(1, curve_order)
+        c = (a * b - alpha * beta - vk_x * gamma) * pow(delta, -1, curve_order) % curve_order
+        proof = {"pi_a": _g1(a), "pi_b": _g2(b), "pi_c": _g1(c), "protocol": "groth16", "curve": "bn128"}
+        items.append((proof, [str(x) for x in public]))
+    return vkey, items
+
+
+def timed(label: str, count: int, fn):
+    start = time.perf_counter()
+    results = fn()
+    elapsed = time.perf_counter() - start
+    assert all(result is None for result in results), results
+    print(f"{label:<34}{count:>7}{elapsed:>10.2f}{count / elapsed:>12.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--proofs", type=int, default=16)
+    parser.add_argument("--public", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    print(f"generating {args.proofs} proofs with {args.public} public signals...")
+    vkey, items = synthetic(args.public, args.proofs)
+    fingerprint = "bench"
+    start = time.perf_counter()
+    groth16.prepared_key(fingerprint, vkey)
+    print(f"key preparation (once per process): {time.perf_counter() - start:.2f}s\n")
+
+    print(f"{'mode':<34}{'proofs':>7}{'seconds':>10}{'proofs/s':>12}")
+    sample = items[:max(1, min(len(items), 4))]
+    timed("one by one", len(sample),
+          lambda: [result for item in sample for result in groth16.verify_chunk(fingerprint, vkey, [item])])
+    timed("single batch", len(items), lambda: groth16.verify_chunk(fingerprint, vkey, items))
+    if args.workers > 1:
+        size = math.ceil(len(items) / args.workers)
+        chunks = [items[i:i + size] for i in range(0, len(items), size)]
+        with ProcessPoolExecutor(args.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            # Warm the workers so key preparation isn't counted.
+            list(pool.map(groth16.verify_chunk, [fingerprint] * args.workers, [vkey] * args.workers,
+                          [items[:1]] * args.workers))
+            timed(f"batches over {args.workers} processes", len(items),
+                  lambda: [result for part in pool.map(groth16.verify_chunk, [fingerprint] * len(chunks),
+                                                       [vkey] * len(chunks), chunks) for result in part])
+
+
+if __name__ == "__main__":
+    main()
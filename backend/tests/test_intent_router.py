@@ -0,0 +1,52 @@
+import pytest
+
+pytest.importorskip("cdp")
+
+from app.services.intent_router import IntentRouter  # noqa: E402
+
+
+@pytest.fixture
+def router():
+    return IntentRouter("test")
+
+
+@pytest.mark.parametrize("prompt", [
+    "What is a balance sheet?",
+    "How do I balance my diet?",
+    "What is my balance sheet?",
+    "Can you help me balance work and life?",
+    "What is your email address?",
+    "what is my IP address?",
+    "What's your home address?",
+    "Tell me the address of the Eiffel Tower",
+    "How much do you have in common with Bitcoin?",
+    "How much ETH and USDC do you have?",
+    "Send 1 eth to my wallet address",
+])
+def test_unrelated_prompts_go_to_the_model(router, prompt):
+    assert router.classify(prompt) is None
+
+
+@pytest.mark.parametrize("prompt, asset", [
+    ("What is your balance?", "eth"),
+    ("what's my USDC balance?", "usdc"),
+    ("wallet balance", "eth"),
+    ("Check the wallet's balance", "eth"),
+    ("How much ETH do you have?", "eth"),
+    ("how much usdc is in your wallet", "usdc"),
+    ("What is the balance of your wallet?", "eth"),
+])
+def test_wallet_balance_questions(router, prompt, asset):
+    intent = router.classify(prompt)
+    assert intent is not None and intent.kind == "balance" and intent.asset_id == asset
+
+
+@pytest.mark.parametrize("prompt", [
+    "What is your wallet address?",
+    "show me your ETH address",
+    "Give me the address of your wallet",
+    "wallet address?",
+])
+def test_wallet_address_questions(router, prompt):
+    intent = router.classify(prompt)
+    assert intent is not None and intent.kind == "address"
@@ -7,6 +7,7 @@ const API_URL = 'http://localhost:8080/aigent';
 interface ConvoHistoryOptions {
   limit?: number;
   offset?: number;
+  cursor?: string;  // next_cursor / prev_cursor from a previous page
 }
 
 export interface CreateAgentParams {